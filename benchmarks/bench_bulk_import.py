@@ -0,0 +1,61 @@
+"""
+批量导入吞吐量基准
+
+用benchmarks.datasets生成JSONL格式的合成用户(明文密码)，分两部分测量:
+工作进程中的解析、校验和密码哈希(按IMPORT_ITERATIONS)在单核上的吞吐量，与目标
+(8核每秒20万行，即每核每秒2.5万行)比较；以及bulk_register导入到新UserStore的端到端吞吐量
+(其中查重和加入存储在主进程中串行执行)。最后检查导入的密码可以验证。在仓库根目录运行:
+
+    python -m benchmarks.bench_bulk_import [--rows 200000] [--workers 8]
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.datasets import PASSWORD, iter_users
+from user_bulk_import import _validate_chunk, bulk_register
+from user_management_full import UserStore
+from user_password import IMPORT_ITERATIONS, hasher
+
+# 目标吞吐量: 8核每秒20万行
+TARGET_ROWS_PER_SECOND = 200000
+TARGET_CORES = 8
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入吞吐量基准')
+    parser.add_argument('--rows', type=int, default=200000, help='导入行数(默认200000)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='校验进程数(默认为CPU核数)')
+    args = parser.parse_args()
+
+    rows = []
+    for user in iter_users(args.rows):
+        del user['id']
+        rows.append(json.dumps(user, ensure_ascii=False))
+    print(f"{args.rows}行JSONL, {args.workers}个工作进程, 导入哈希迭代次数{IMPORT_ITERATIONS}")
+
+    # 单核上工作进程的处理速度
+    sample = rows[:min(len(rows), 50000)]
+    start = time.perf_counter()
+    _validate_chunk((1, None, sample))
+    per_core = len(sample) / (time.perf_counter() - start)
+    target = TARGET_ROWS_PER_SECOND / TARGET_CORES
+    print(f"校验和哈希: 每核{per_core:.0f}行/秒 (目标每核{target:.0f}行/秒, "
+          f"{'达到' if per_core >= target else '未达到'})")
+
+    store = UserStore()
+    start = time.perf_counter()
+    result = bulk_register(store, rows, processes=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"端到端: 用时{elapsed:.2f}秒, {result['total'] / elapsed:.0f}行/秒, "
+          f"成功{len(result['accepted'])}行, 失败{len(result['errors'])}行")
+
+    user = result['accepted'][0]
+    if not hasher.verify(PASSWORD, user['password']) or not hasher.needs_rehash(user['password']):
+        raise SystemExit('导入的密码哈希无法验证或不会在登录时升级')
+    print("检查通过: 导入的密码可以验证，首次登录时升级为完整迭代次数")
+
+
+if __name__ == '__main__':
+    main()
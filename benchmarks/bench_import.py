@@ -0,0 +1,44 @@
+"""
+导入与命令行启动耗时基准
+
+每个场景在新的解释器进程中运行，记录进程总耗时。导入user_management_full
+不再加载测试数据，只在第一次访问用户数据时才加载。在仓库根目录运行:
+
+    python -m benchmarks.bench_import
+"""
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('python -c pass', [sys.executable, '-c', 'pass']),
+    ('user_cli.py --help', [sys.executable, 'user_cli.py', '--local', '--help']),
+    ('import user_management_full', [sys.executable, '-c', 'import user_management_full']),
+    ('from ... import is_valid_email',
+     [sys.executable, '-c', 'from user_management_full import is_valid_email; is_valid_email("a@b.com")']),
+    ('首次访问用户数据',
+     [sys.executable, '-c', 'from user_management_full import count_adults; count_adults()']),
+]
+
+
+def bench(argv, repeat):
+    # 返回多次运行中最短的毫秒数
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(repeat=10):
+    print(f"{'场景':<34}{'耗时(ms)':>10}")
+    for name, argv in CASES:
+        print(f"{name:<34}{bench(argv, repeat):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
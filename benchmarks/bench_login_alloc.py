@@ -0,0 +1,82 @@
+"""
+登录响应的内存分配基准
+
+对比原先每次登录复制用户字典并删除密码的做法与UserRecord缓存的只读视图:
+每次登录新分配的内存块数和字节数(tracemalloc)、构造响应的耗时，以及存储全部用户
+时普通字典与UserRecord的内存占用。在仓库根目录运行:
+
+    python -m benchmarks.bench_login_alloc [用户数] [登录次数]
+"""
+import sys
+import time
+import tracemalloc
+
+from benchmarks.datasets import iter_users
+from user_record import UserRecord
+
+
+def copy_response(user):
+    # 原先的做法: 每次登录复制整个用户字典再删除密码
+    user_data = user.copy()
+    user_data.pop('password')
+    return {'success': True, 'message': '登录成功', 'user': user_data}
+
+
+def view_response(user):
+    return {'success': True, 'message': '登录成功', 'user': user.public}
+
+
+def allocations(respond, users, logins):
+    # 返回每次登录平均分配的(内存块数, 字节数)，响应保留到测量结束，避免被立即回收后复用
+    responses = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(logins):
+        responses.append(respond(users[i % len(users)]))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = [s for s in after.compare_to(before, 'filename') if s.size_diff > 0]
+    blocks = sum(s.count_diff for s in stats)
+    size = sum(s.size_diff for s in stats)
+    # 扣除保存响应的列表本身
+    size -= sys.getsizeof(responses)
+    return blocks / logins, size / logins
+
+
+def timed(respond, users, logins, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(logins):
+            respond(users[i % len(users)])
+        best = min(best, time.perf_counter() - start)
+    return best / logins * 1e9
+
+
+def footprint(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main(count=10000, logins=100000):
+    dicts = list(iter_users(count))
+    # 两种容器引用同一批字段值，只比较容器本身的开销
+    _, dict_size = footprint(lambda: [dict(user) for user in dicts])
+    records, record_size = footprint(lambda: [UserRecord(user) for user in dicts])
+    print(f"{count}个用户(不含共享的字段值): 字典{dict_size / count:.0f}字节/用户, "
+          f"UserRecord{record_size / count:.0f}字节/用户")
+
+    # 让每个用户的视图先创建好，测量的是稳定状态下的重复登录
+    for record in records:
+        record.public
+    for name, respond, users in (('复制字典', copy_response, dicts), ('只读视图', view_response, records)):
+        blocks, size = allocations(respond, users, logins)
+        ns = timed(respond, users, logins)
+        print(f"{name}: 每次登录分配{blocks:.1f}块/{size:.0f}字节, 构造响应{ns:.0f}纳秒")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,79 @@
+"""
+n-gram搜索索引的建索引耗时与查询延迟基准
+
+生成合成用户(拼音/英文用户名和中文姓名)，对比线性扫描与NgramIndex的
+子串、前缀查询和中文用户名计数，并用线性扫描结果校验索引结果。在仓库根目录运行:
+
+    python -m benchmarks.bench_search [用户数]
+"""
+import random
+import sys
+import time
+
+from user_search import NgramIndex, SEARCH_FIELDS, contains_cjk
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂'
+SYLLABLES = ['li', 'wang', 'zhang', 'liu', 'chen', 'yang', 'huang', 'zhao', 'wu', 'zhou',
+             'ming', 'fang', 'jing', 'qiang', 'lei', 'jun', 'yong', 'tao', 'chao', 'ping']
+
+
+def make_users(count, seed=42):
+    rng = random.Random(seed)
+    users = []
+    for i in range(count):
+        name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN) for _ in range(rng.randint(1, 2)))
+        if rng.random() < 0.1:
+            username = name + str(rng.randint(0, 999))
+        else:
+            username = ''.join(rng.choice(SYLLABLES) for _ in range(2)) + str(i)
+        nickname = rng.choice(SYLLABLES).capitalize() + str(rng.randint(0, 99)) if rng.random() < 0.3 else None
+        users.append({'id': i + 1, 'username': username, 'name': name, 'nickname': nickname})
+    return users
+
+
+def linear_search(users, query, prefix):
+    query = query.lower()
+    result = []
+    for user in users:
+        values = [str(user.get(field) or '').lower() for field in SEARCH_FIELDS]
+        if any(v.startswith(query) if prefix else query in v for v in values):
+            result.append(user)
+    return result
+
+
+def timed(func, repeat=20):
+    # 返回(结果, 最短耗时毫秒)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main(count=1000000):
+    users = make_users(count)
+    start = time.perf_counter()
+    index = NgramIndex(users)
+    print(f"{count}个用户, 建索引用时{time.perf_counter() - start:.1f}秒")
+
+    queries = [('wangli12345', False), ('张伟', False), ('芳', False), ('zhao99', True), ('刘', True),
+               ('ngmi', False)]
+    print(f"{'查询':<16}{'模式':<6}{'结果数':>8}{'线性扫描(ms)':>14}{'索引(ms)':>10}")
+    for query, prefix in queries:
+        expected, linear_ms = timed(lambda: linear_search(users, query, prefix), repeat=1)
+        found, index_ms = timed(lambda: index.search(query, prefix=prefix, limit=None), repeat=5)
+        assert sorted(u['id'] for u in found) == sorted(u['id'] for u in expected), query
+        _, limited_ms = timed(lambda: index.search(query, prefix=prefix))
+        print(f"{query:<16}{'前缀' if prefix else '子串':<6}{len(found):>8}{linear_ms:>14.1f}"
+              f"{index_ms:>10.3f}  (前20个: {limited_ms:.3f}ms)")
+
+    expected, linear_ms = timed(lambda: sum(contains_cjk(u['username']) for u in users), repeat=1)
+    found, index_ms = timed(index.count_cjk_usernames)
+    assert found == expected
+    print(f"{'中文用户名计数':<16}{'':<6}{found:>8}{linear_ms:>14.1f}{index_ms:>10.3f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
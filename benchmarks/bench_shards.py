@@ -0,0 +1,72 @@
+"""
+分片用户存储在1、2、4、8个分片下的性能对比
+
+对每种分片数测量: 加载耗时、统计查询(扇出合并)延迟、单线程登录延迟(首次登录包含明文密码迁移为哈希)，
+以及多线程并发登录吞吐(使用PBKDF2哈希密码，哈希计算分散在各分片进程中)。
+在仓库根目录运行:
+
+    python -m benchmarks.bench_shards [用户数]
+"""
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 降低基准中的哈希成本，使并发登录测试在合理时间内完成
+os.environ.setdefault('USER_PASSWORD_ITERATIONS', '20000')
+
+from benchmarks.datasets import PASSWORD, iter_users  # noqa: E402
+from user_password import hash_password  # noqa: E402
+from user_shard import ShardedUserStore  # noqa: E402
+
+SHARD_COUNTS = (1, 2, 4, 8)
+# 使用哈希密码、参与并发登录测试的用户数
+HASHED_USERS = 400
+
+
+def make_users(count):
+    users = list(iter_users(count))
+    for user in users[:HASHED_USERS]:
+        user['password'] = hash_password(PASSWORD)
+    return users
+
+
+def bench(shards, users):
+    with ShardedUserStore(shards) as store:
+        start = time.perf_counter()
+        store.load(users)
+        load_s = time.perf_counter() - start
+
+        stats_ms = []
+        for _ in range(20):
+            start = time.perf_counter()
+            store.stats()
+            stats_ms.append((time.perf_counter() - start) * 1000)
+
+        login_ms = []
+        for user in users[HASHED_USERS:HASHED_USERS + 1000]:
+            start = time.perf_counter()
+            assert store.login(user['username'], PASSWORD)['success']
+            login_ms.append((time.perf_counter() - start) * 1000)
+
+        hashed = [user['username'] for user in users[:HASHED_USERS]]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=shards * 2) as pool:
+            results = list(pool.map(lambda name: store.login(name, PASSWORD)['success'], hashed))
+        assert all(results)
+        hashed_rate = len(hashed) / (time.perf_counter() - start)
+    return load_s, statistics.median(stats_ms), statistics.median(login_ms), hashed_rate
+
+
+def main(count=200000):
+    users = make_users(count)
+    print(f"{count}个用户, CPU核数{os.cpu_count()}")
+    print(f"{'分片数':<8}{'加载(秒)':>10}{'统计(ms)':>10}{'登录p50(ms)':>14}{'哈希登录(次/秒)':>18}")
+    for shards in SHARD_COUNTS:
+        load_s, stats_ms, login_ms, hashed_rate = bench(shards, users)
+        print(f"{shards:<8}{load_s:>10.2f}{stats_ms:>10.2f}{login_ms:>14.3f}{hashed_rate:>18.0f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
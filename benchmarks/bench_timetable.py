@@ -0,0 +1,106 @@
+"""
+scsnew排课求解器的规模测试
+
+生成指定数量的课程、教室和教师(每门课随机上课人数，教室随机容量)，
+测量solve_timetable的耗时，并检查结果: 教师和教室没有重复占用、教室容量足够、
+每门课要么排上要么给出原因。--baseline同时运行原先逐门课打乱时间段和教室、
+嵌套循环查找的贪心做法作对比(规模大时很慢)。在仓库根目录运行:
+
+    python -m benchmarks.bench_timetable [--courses 10000] [--classrooms 1000] [--teachers 1500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scsnew'))
+
+from utils.data_generator import generate_time_slots  # noqa: E402
+from utils.timetable import solve_timetable  # noqa: E402
+
+
+def make_problem(courses, classrooms, teachers, seed=42):
+    rng = random.Random(seed)
+    rooms = [{'id': f'R{i:04d}', 'capacity': rng.randint(30, 120)} for i in range(classrooms)]
+    items = [{'name': f'课程{i:05d}', 'teacher_id': f'T{rng.randrange(teachers):04d}',
+              'class_size': rng.randint(20, 120)} for i in range(courses)]
+    return items, rooms
+
+
+def greedy_baseline(courses, classrooms, time_slots):
+    # 原先的generate_schedules: 每门课打乱全部时间段和教室，用集合检查占用，不考虑容量
+    time_slots = list(time_slots)
+    classroom_ids = [c['id'] for c in classrooms]
+    teacher_occupied = {}
+    classroom_occupied = {c['id']: set() for c in classrooms}
+    schedules = []
+    for course in courses:
+        occupied = teacher_occupied.setdefault(course['teacher_id'], set())
+        random.shuffle(time_slots)
+        random.shuffle(classroom_ids)
+        for slot in time_slots:
+            key = (slot['day_of_week'], slot['start_time'])
+            if key in occupied:
+                continue
+            room = next((r for r in classroom_ids if key not in classroom_occupied[r]), None)
+            if room is not None:
+                occupied.add(key)
+                classroom_occupied[room].add(key)
+                schedules.append(course['name'])
+                break
+    return schedules
+
+
+def check(result, courses, classrooms):
+    problems = []
+    capacity = {room['id']: room['capacity'] for room in classrooms}
+    size = {course['name']: course['class_size'] for course in courses}
+    teacher_slots = Counter((s['teacher_id'], s['day_of_week'], s['start_time']) for s in result['schedules'])
+    room_slots = Counter((s['classroom'], s['day_of_week'], s['start_time']) for s in result['schedules'])
+    problems += [f'教师重复占用: {key}' for key, n in teacher_slots.items() if n > 1]
+    problems += [f'教室重复占用: {key}' for key, n in room_slots.items() if n > 1]
+    problems += [f"{s['course_id']}的教室容量不足" for s in result['schedules']
+                 if capacity[s['classroom']] < size[s['course_id']]]
+    if len(result['schedules']) + len(result['unplaced']) != len(courses):
+        problems.append('排课数加未排课数不等于课程数')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='scsnew排课求解器规模测试')
+    parser.add_argument('--courses', type=int, default=10000, help='课程数(默认10000)')
+    parser.add_argument('--classrooms', type=int, default=1000, help='教室数(默认1000)')
+    parser.add_argument('--teachers', type=int, default=1500, help='教师数(默认1500)')
+    parser.add_argument('--baseline', action='store_true', help='同时运行原先的贪心做法')
+    args = parser.parse_args()
+
+    time_slots = generate_time_slots()
+    courses, classrooms = make_problem(args.courses, args.classrooms, args.teachers)
+    print(f"{args.courses}门课程, {args.classrooms}间教室, {args.teachers}名教师, {len(time_slots)}个时间段")
+
+    start = time.perf_counter()
+    result = solve_timetable(courses, classrooms, time_slots, seed=0)
+    elapsed = time.perf_counter() - start
+    print(f"solve_timetable: {elapsed:.2f}秒, 排上{len(result['schedules'])}门, 未排{len(result['unplaced'])}门")
+    for reason, count in Counter(item['reason'] for item in result['unplaced']).most_common(5):
+        print(f"  {reason}: {count}")
+
+    if args.baseline:
+        random.seed(0)
+        start = time.perf_counter()
+        placed = greedy_baseline(courses, classrooms, time_slots)
+        print(f"原贪心做法: {time.perf_counter() - start:.2f}秒, 排上{len(placed)}门(不检查容量)")
+
+    problems = check(result, courses, classrooms)
+    if problems:
+        print(f"发现{len(problems)}个问题:")
+        for problem in problems[:20]:
+            print(f"- {problem}")
+        sys.exit(1)
+    print("检查通过: 没有重复占用，教室容量足够")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+校验函数单次调用耗时的微基准
+
+对比原先每次调用都传入模式字符串的re.match/re.search实现与
+user_validators中的预编译规则。在仓库根目录运行:
+
+    python -m benchmarks.bench_validators
+"""
+import re
+import timeit
+
+from user_validators import validators
+
+
+def old_is_valid_username(username):
+    pattern = r'^\w{4,20}$'
+    return re.match(pattern, username) is not None
+
+
+def old_is_valid_email(email):
+    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return re.match(pattern, email) is not None
+
+
+def old_is_strong_password(password):
+    if len(password) < 8:
+        return False
+    if not re.search(r'[a-z]', password):
+        return False
+    if not re.search(r'[A-Z]', password):
+        return False
+    if not re.search(r'[0-9]', password):
+        return False
+    return True
+
+
+def old_validate_phone(phone):
+    return re.match(r'^1[3-9]\d{9}$', phone) is not None
+
+
+CASES = [
+    ('username', old_is_valid_username, 'username', ['liming', 'wangli88', 'ab', '张伟_2024']),
+    ('email', old_is_valid_email, 'email', ['liming@163.com', 'wangli88@qq.com', 'bad@', 'x@y.z']),
+    ('strong_password', old_is_strong_password, 'strong_password',
+     ['simple_password', 'NormalPa55word', 'Passw0rd', 'short1A', 'ALLUPPER123']),
+    ('cn_mobile', old_validate_phone, 'cn_mobile', ['13812345678', '12345678901', '1381234']),
+]
+
+
+def bench(func, values, number):
+    # 返回每次调用的纳秒数
+    timer = timeit.Timer(lambda: [func(v) for v in values])
+    loops = min(timer.repeat(repeat=5, number=number))
+    return loops / (number * len(values)) * 1e9
+
+
+def main(number=20000):
+    print(f"{'规则':<18}{'原实现(ns)':>12}{'新实现(ns)':>12}{'加速比':>8}")
+    for name, old_func, rule, values in CASES:
+        new_func = validators.get(rule)
+        assert [old_func(v) for v in values] == [new_func(v) for v in values], name
+        old_ns = bench(old_func, values, number)
+        new_ns = bench(new_func, values, number)
+        print(f"{name:<18}{old_ns:>12.0f}{new_ns:>12.0f}{old_ns / new_ns:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
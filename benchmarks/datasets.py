@@ -0,0 +1,75 @@
+"""
+生成2-mocked-users.json格式的合成用户数据
+
+用户名、邮箱和手机号由序号派生，保证唯一；其他字段按固定种子随机生成，
+同样的参数总是得到同样的数据。
+"""
+import json
+import random
+from typing import Dict, Iterator
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂'
+SYLLABLES = ['li', 'wang', 'zhang', 'liu', 'chen', 'yang', 'huang', 'zhao', 'wu', 'zhou',
+             'ming', 'fang', 'jing', 'qiang', 'lei', 'jun', 'yong', 'tao', 'chao', 'ping']
+DOMAINS = ['163.com', 'qq.com', 'gmail.com', '126.com', 'sina.com', 'outlook.com', 'foxmail.com',
+           'hotmail.com', 'yahoo.com', 'aliyun.com']
+CITIES = ['北京海淀区', '上海浦东新区', '广州天河区', '深圳南山区', '杭州西湖区', '成都武侯区']
+COMPANIES = ['中国石油', '阿里巴巴', '腾讯', '百度', '华为', '字节跳动', '京东', '美团']
+# 合成用户的统一明文密码
+PASSWORD = 'BenchPass123'
+
+
+def iter_users(count: int, seed: int = 42) -> Iterator[Dict]:
+    """
+    逐个生成合成用户
+
+    Args:
+        count: 用户数
+        seed: 随机种子
+
+    Returns:
+        Iterator[Dict]: 用户字典，约10%的用户名为中文
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN) for _ in range(rng.randint(1, 2)))
+        if rng.random() < 0.1:
+            username = f'{name}{i}'
+        else:
+            username = f'{rng.choice(SYLLABLES)}{rng.choice(SYLLABLES)}{i}'
+        login_name = f'user{i}'
+        yield {
+            'id': i + 1,
+            'name': name,
+            'username': username,
+            'email': f'{login_name}@{rng.choice(DOMAINS)}',
+            'mobile': f'1{rng.randint(3, 9)}{i:09d}',
+            'age': rng.randint(8, 70),
+            'gender': rng.choice(('male', 'female')),
+            'address': rng.choice(CITIES),
+            'company': rng.choice(COMPANIES),
+            'password': PASSWORD
+        }
+
+
+def write_dataset(filename: str, count: int, seed: int = 42) -> str:
+    """
+    把合成用户写成JSON数组文件(每行一个用户，与2-mocked-users.json结构相同)
+
+    Args:
+        filename: 输出文件路径
+        count: 用户数
+        seed: 随机种子
+
+    Returns:
+        str: 输出文件路径
+    """
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for i, user in enumerate(iter_users(count, seed)):
+            if i:
+                f.write(',\n')
+            f.write(json.dumps(user, ensure_ascii=False))
+        f.write('\n]\n')
+    return filename
@@ -0,0 +1,328 @@
+"""
+用户管理库与命令行工具的基准测试套件
+
+为每个数据规模生成2-mocked-users.json格式的合成数据(缓存在benchmarks/data/)，
+在独立子进程中测量load_mocked_users、register_user、login、各统计函数和
+user_cli.py端到端命令，记录吞吐量、p50/p99延迟和峰值RSS，结果保存为JSON，
+可在两次提交之间对比。在仓库根目录运行:
+
+    python -m benchmarks.harness run --sizes 1k,100k -o before.json
+    python -m benchmarks.harness run --sizes 1k,100k -o after.json
+    python -m benchmarks.harness compare before.json after.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.datasets import PASSWORD, write_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+DEFAULT_SIZES = '1k,10k,100k,1m'
+# 子进程中新注册用户使用的PBKDF2迭代次数，降低后注册和首次登录不会淹没其他操作
+DEFAULT_ITERATIONS = 10000
+
+# 端到端测量的命令行(在user_cli.py之后追加)
+CLI_COMMANDS = [
+    ['--help'],
+    ['stats', 'age'],
+    ['stats', 'gender'],
+    ['stats', 'domain'],
+    ['stats', 'ch', '-t', 'count'],
+    ['search', 'zhang', '--prefix'],
+]
+
+
+def parse_size(text: str) -> int:
+    """
+    解析数据规模，支持k/m后缀
+
+    Args:
+        text: 如'1k'、'10m'或'5000'
+
+    Returns:
+        int: 行数
+
+    Raises:
+        ValueError: 当格式无效时
+    """
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    number = text[:-1] if scale != 1 else text
+    return int(float(number) * scale)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """按最近秩法计算百分位数"""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: List[float], rows: Optional[int] = None) -> Dict[str, float]:
+    """
+    汇总一组耗时(秒)
+
+    Args:
+        samples: 每次操作的耗时
+        rows: 每次操作处理的行数，给出时按行计算吞吐量
+
+    Returns:
+        Dict: count、total_s、throughput(次/秒或行/秒)、p50_ms、p99_ms
+    """
+    total = sum(samples)
+    work = len(samples) * (rows or 1)
+    return {
+        'count': len(samples),
+        'total_s': round(total, 6),
+        'throughput': round(work / total, 2) if total else None,
+        'p50_ms': round(percentile(samples, 50) * 1000, 4),
+        'p99_ms': round(percentile(samples, 99) * 1000, 4),
+    }
+
+
+def timed(func: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def dataset_path(size: int) -> str:
+    """返回(必要时生成)指定规模的合成数据文件"""
+    filename = os.path.join(DATA_DIR, f'users-{size}.json')
+    if not os.path.exists(filename):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"生成{size}行合成数据: {filename}", file=sys.stderr)
+        write_dataset(filename + '.tmp', size)
+        os.replace(filename + '.tmp', filename)
+    return filename
+
+
+def measure_library(filename: str, rows: int, ops: int, repeat: int) -> Dict:
+    """
+    在当前进程中测量用户管理库(由子进程调用)
+
+    Args:
+        filename: 数据文件
+        rows: 数据行数
+        ops: 注册和登录的操作次数
+        repeat: 每个统计函数的重复次数
+
+    Returns:
+        Dict: 操作名到汇总结果的映射
+    """
+    import user_management_full as m
+
+    results = {}
+    results['load_mocked_users'] = summarize(timed(lambda: m.load_mocked_users(filename), 1), rows)
+    m.user_store.wait_loaded()
+
+    register_samples = []
+    for i in range(ops):
+        start = time.perf_counter()
+        result = m.register_user(f'benchreg{i}', PASSWORD, f'benchreg{i}@example.com', '13800000000')
+        register_samples.append(time.perf_counter() - start)
+        assert result['success'], result
+    results['register_user'] = summarize(register_samples)
+
+    rng = random.Random(0)
+    usernames = [user['username'] for user in rng.sample(m.users[:rows], min(ops, rows))]
+    for name, label in (('login', '首次登录(含密码迁移)'), ('login_repeat', '重复登录')):
+        samples = []
+        for username in usernames:
+            start = time.perf_counter()
+            result = m.login(username, PASSWORD)
+            samples.append(time.perf_counter() - start)
+            assert result['success'], (label, username, result)
+        results[name] = summarize(samples)
+
+    stats_functions = {
+        'count_adults': m.count_adults,
+        'count_minors': m.count_minors,
+        'count_users_per_age_bucket': m.count_users_per_age_bucket,
+        'get_gender_distribution': m.get_gender_distribution,
+        'count_users_with_chinese_chars': m.count_users_with_chinese_chars,
+        'get_usernames_with_chinese': m.get_usernames_with_chinese,
+        'list_unique_domains': m.list_unique_domains,
+        'count_users_per_domain': m.count_users_per_domain,
+        'get_usernames_by_domain': lambda: m.get_usernames_by_domain('qq.com'),
+        'search_users': lambda: m.search_users('zhang', prefix=True),
+        'check_stats_consistency': m.check_stats_consistency,
+    }
+    for name, func in stats_functions.items():
+        # 第一次调用可能包含建索引等一次性开销，单独记录
+        results[f'{name}_first'] = summarize(timed(func, 1))
+        results[name] = summarize(timed(func, repeat))
+    return results
+
+
+def measure_cli(filename: str, repeat: int) -> Dict:
+    """
+    端到端测量user_cli.py命令(每次启动新进程，不经过守护进程)
+
+    Args:
+        filename: 数据文件
+        repeat: 每个命令的运行次数
+
+    Returns:
+        Dict: 命令到汇总结果的映射，附带子进程的峰值RSS
+    """
+    env = dict(os.environ, USER_DATA_FILE=filename)
+    results = {}
+    for args in CLI_COMMANDS:
+        samples = []
+        peak_kb = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            process = subprocess.Popen([sys.executable, 'user_cli.py', '--local'] + args, cwd=ROOT, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            _, status, usage = os.wait4(process.pid, 0)
+            samples.append(time.perf_counter() - start)
+            if os.waitstatus_to_exitcode(status) != 0:
+                raise RuntimeError(f"命令执行失败: user_cli.py {' '.join(args)}")
+            peak_kb = max(peak_kb, usage.ru_maxrss)
+        summary = summarize(samples)
+        summary['peak_rss_kb'] = peak_kb
+        results[' '.join(args)] = summary
+    return results
+
+
+def run_size(size: int, ops: int, repeat: int, cli_repeat: int, iterations: int) -> Dict:
+    """在独立子进程中测量一个数据规模，使峰值RSS只反映该规模"""
+    filename = dataset_path(size)
+    env = dict(os.environ, USER_PASSWORD_ITERATIONS=str(iterations))
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.harness', '_worker', filename, str(size), str(ops), str(repeat)],
+        cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE
+    ).stdout
+    result = json.loads(output)
+    result['cli'] = measure_cli(filename, cli_repeat) if cli_repeat else {}
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> None:
+    sizes = [parse_size(text) for text in args.sizes.split(',')]
+    report = {
+        'meta': {
+            'commit': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'password_iterations': args.iterations,
+        },
+        'sizes': {}
+    }
+    for size in sizes:
+        print(f"测量{size}行...", file=sys.stderr)
+        report['sizes'][str(size)] = run_size(size, args.ops, args.repeat, args.cli_repeat, args.iterations)
+        print_size(size, report['sizes'][str(size)])
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到{args.output}")
+
+
+def print_size(size: int, result: Dict) -> None:
+    print(f"\n== {size}行, 峰值RSS {result['peak_rss_kb'] / 1024:.1f}MB ==")
+    print(f"{'操作':<40}{'次数':>6}{'吞吐(/秒)':>14}{'p50(ms)':>12}{'p99(ms)':>12}")
+    for section in ('ops', 'cli'):
+        for name, item in result[section].items():
+            label = f'user_cli.py {name}' if section == 'cli' else name
+            throughput = f"{item['throughput']:.0f}" if item['throughput'] else '-'
+            print(f"{label:<40}{item['count']:>6}{throughput:>14}{item['p50_ms']:>12.3f}{item['p99_ms']:>12.3f}")
+
+
+def compare(args: argparse.Namespace) -> int:
+    with open(args.baseline, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"基线 {old['meta'].get('commit')} -> 当前 {new['meta'].get('commit')}, "
+          f"p50变慢超过{args.threshold:.0%}视为退化")
+
+    regressions = 0
+    for size, new_result in new['sizes'].items():
+        old_result = old['sizes'].get(size)
+        if old_result is None:
+            continue
+        old_rss, new_rss = old_result['peak_rss_kb'], new_result['peak_rss_kb']
+        print(f"\n== {size}行, 峰值RSS {old_rss / 1024:.1f}MB -> {new_rss / 1024:.1f}MB ==")
+        print(f"{'操作':<40}{'基线p50(ms)':>14}{'当前p50(ms)':>14}{'变化':>10}")
+        for section in ('ops', 'cli'):
+            for name, item in new_result[section].items():
+                before = old_result[section].get(name)
+                if before is None or not before['p50_ms']:
+                    continue
+                ratio = item['p50_ms'] / before['p50_ms'] - 1
+                flag = ''
+                if ratio > args.threshold:
+                    flag = '  退化'
+                    regressions += 1
+                label = f'user_cli.py {name}' if section == 'cli' else name
+                print(f"{label:<40}{before['p50_ms']:>14.3f}{item['p50_ms']:>14.3f}{ratio:>+10.1%}{flag}")
+    print(f"\n共{regressions}项退化")
+    return 1 if regressions else 0
+
+
+def worker(argv: List[str]) -> None:
+    # 子进程入口: 测量库函数并把结果以JSON输出到标准输出
+    filename, rows, ops, repeat = argv[0], int(argv[1]), int(argv[2]), int(argv[3])
+    with redirect_stdout(sys.stderr):
+        ops_result = measure_library(filename, rows, ops, repeat)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    json.dump({'peak_rss_kb': peak_kb, 'ops': ops_result}, sys.stdout)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['_worker']:
+        worker(argv[1:])
+        return 0
+
+    parser = argparse.ArgumentParser(description='用户管理基准测试套件')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='运行基准并保存JSON结果')
+    run_parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'数据规模列表(默认{DEFAULT_SIZES}，最大可到10m)')
+    run_parser.add_argument('--ops', type=int, default=200, help='注册和登录的操作次数(默认200)')
+    run_parser.add_argument('--repeat', type=int, default=20, help='每个统计函数的重复次数(默认20)')
+    run_parser.add_argument('--cli-repeat', type=int, default=3, help='每个命令行命令的运行次数，0表示跳过(默认3)')
+    run_parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS,
+                            help=f'PBKDF2迭代次数(默认{DEFAULT_ITERATIONS})')
+    run_parser.add_argument('-o', '--output', default='bench-results.json', help='结果文件路径')
+
+    compare_parser = subparsers.add_parser('compare', help='对比两次运行的结果')
+    compare_parser.add_argument('baseline', help='基线结果文件')
+    compare_parser.add_argument('current', help='当前结果文件')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='p50变慢超过该比例视为退化(默认0.1)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
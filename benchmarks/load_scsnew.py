@@ -0,0 +1,297 @@
+"""
+学生选课系统(scsnew)路由的并发压力测试: 同步pymongo与异步Motor对比
+
+在子进程中用uvicorn启动只包含学生路由的服务，以100个并发客户端持续请求
+(60%按学号查询、30%分页列表、10%登录)，分别测量两种数据库访问方式:
+
+    blocking  原先的做法: async路由中直接调用同步pymongo，每次数据库往返都阻塞事件循环
+    async     现在的做法: 路由await Motor，等待数据库期间事件循环继续处理其他请求
+
+默认使用进程内的模拟数据库(每次操作固定延迟--latency毫秒，模拟网络往返)，
+指定--mongo-uri时连接真实的mongod(数据写入临时库，测试结束后删除)。在仓库根目录运行:
+
+    python -m benchmarks.load_scsnew [--concurrency 100] [--duration 5] [--latency 2]
+    python -m benchmarks.load_scsnew --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.harness import percentile
+from benchmarks.load_user_service import Connection, free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCSNEW_DIR = os.path.join(ROOT, 'scsnew')
+MODES = ('blocking', 'async')
+# 真实mongod上使用的临时库
+LOAD_TEST_DB = 'student_course_system_loadtest'
+
+
+def make_students(count):
+    rng = random.Random(42)
+    students = []
+    for i in range(count):
+        students.append({
+            'username': f'stu{i:05d}', 'password': 'Password123', 'nickname': f'同学{i}',
+            'name': f'学生{i}', 'gender': rng.choice(['男', '女']), 'age': rng.randint(17, 25),
+            'phone': f'138{i:08d}', 'email': f'stu{i:05d}@example.com', 'address': '北京海淀区',
+            'student_id': f'S{i:06d}', 'department': '计算机学院', 'class_name': f'计科{i % 8 + 1}班',
+        })
+    return students
+
+
+class _Done:
+    # 已经得到结果的可等待对象: 同步调用在返回它之前已经阻塞了事件循环
+    def __init__(self, value):
+        self.value = value
+
+    def __await__(self):
+        return self.value
+        yield
+
+
+class MemoryCollection:
+    """模拟数据库中的一个集合，只支持压力测试用到的等值查询(学号和用户名有唯一索引)"""
+
+    INDEXED = ('student_id', 'username')
+
+    def __init__(self, docs):
+        self.docs = [dict(doc, _id=i + 1) for i, doc in enumerate(docs)]
+        self._indexes = {key: {doc[key]: doc for doc in self.docs} for key in self.INDEXED}
+
+    def find_one(self, query):
+        key = next((key for key in self.INDEXED if key in query), None)
+        candidates = [self._indexes[key].get(query[key])] if key else self.docs
+        return next((doc for doc in candidates
+                     if doc is not None and all(doc.get(k) == v for k, v in query.items())), None)
+
+    def find(self, skip, limit):
+        return self.docs[skip:skip + limit if limit else None]
+
+
+class MemoryCursor:
+    def __init__(self, collection, latency, blocking):
+        self._collection = collection
+        self._latency = latency
+        self._blocking = blocking
+        self._skip = 0
+        self._limit = 0
+
+    def skip(self, skip):
+        self._skip = skip
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def to_list(self, length=None):
+        docs = [dict(doc) for doc in self._collection.find(self._skip, self._limit)][:length]
+        if self._blocking:
+            time.sleep(self._latency)
+            return _Done(docs)
+
+        async def later():
+            await asyncio.sleep(self._latency)
+            return docs
+        return later()
+
+
+class SimulatedCollection:
+    """
+    带固定往返延迟的模拟集合
+
+    blocking为True时用time.sleep模拟同步pymongo(阻塞整个事件循环)，
+    否则用asyncio.sleep模拟Motor(只挂起当前请求)。接口与路由使用的Motor集合一致。
+    """
+
+    def __init__(self, collection: MemoryCollection, latency: float, blocking: bool):
+        self._collection = collection
+        self._latency = latency
+        self._blocking = blocking
+
+    def find_one(self, query):
+        doc = self._collection.find_one(query)
+        doc = dict(doc) if doc is not None else None
+        if self._blocking:
+            time.sleep(self._latency)
+            return _Done(doc)
+
+        async def later():
+            await asyncio.sleep(self._latency)
+            return doc
+        return later()
+
+    def find(self, *args):
+        return MemoryCursor(self._collection, self._latency, self._blocking)
+
+
+class BlockingMongoCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def skip(self, skip):
+        self._cursor = self._cursor.skip(skip)
+        return self
+
+    def limit(self, limit):
+        self._cursor = self._cursor.limit(limit)
+        return self
+
+    def to_list(self, length=None):
+        return _Done(list(self._cursor)[:length])
+
+
+class BlockingMongoCollection:
+    """把同步pymongo集合包装成路由使用的接口，调用时照常阻塞事件循环"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find_one(self, *args, **kwargs):
+        return _Done(self._collection.find_one(*args, **kwargs))
+
+    def insert_one(self, *args, **kwargs):
+        return _Done(self._collection.insert_one(*args, **kwargs))
+
+    def find(self, *args, **kwargs):
+        return BlockingMongoCursor(self._collection.find(*args, **kwargs))
+
+
+def serve(mode: str, port: int, students: int, latency: float, mongo_uri: str) -> None:
+    # 子进程入口: 启动只包含学生路由的服务，数据库依赖替换为指定的访问方式
+    sys.path.insert(0, SCSNEW_DIR)
+    import uvicorn
+    from fastapi import FastAPI
+    from routers import students as students_router
+
+    if mongo_uri:
+        if mode == 'blocking':
+            from pymongo import MongoClient
+            collection = BlockingMongoCollection(MongoClient(mongo_uri)[LOAD_TEST_DB]['students'])
+        else:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            collection = AsyncIOMotorClient(mongo_uri)[LOAD_TEST_DB]['students']
+    else:
+        collection = SimulatedCollection(MemoryCollection(make_students(students)), latency, mode == 'blocking')
+
+    app = FastAPI()
+    app.include_router(students_router.router)
+    app.dependency_overrides[students_router.get_students_collection] = lambda: collection
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def start_server(mode: str, args) -> tuple:
+    port = free_port()
+    command = [sys.executable, '-m', 'benchmarks.load_scsnew', '--serve', mode, '--port', str(port),
+               '--students', str(args.students), '--latency', str(args.latency)]
+    if args.mongo_uri:
+        command += ['--mongo-uri', args.mongo_uri]
+    process = subprocess.Popen(command, cwd=ROOT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/students/S000000', timeout=1):
+                return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('服务启动超时')
+
+
+async def client(port: int, students: int, deadline: float, latencies: list, errors: list,
+                 rng: random.Random) -> None:
+    conn = await Connection.open(port)
+    try:
+        while time.monotonic() < deadline:
+            choice = rng.random()
+            i = rng.randrange(students)
+            start = time.perf_counter()
+            if choice < 0.6:
+                status = await conn.request('GET', f'/students/S{i:06d}')
+            elif choice < 0.9:
+                status = await conn.request('GET', f'/students/?skip={i}&limit=20')
+            else:
+                status = await conn.request('POST', '/students/login',
+                                            {'username': f'stu{i:05d}', 'password': 'Password123'})
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        conn.close()
+
+
+async def run_load(port: int, students: int, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, students, deadline, latencies, errors, random.Random(i))
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': len(errors),
+    }
+
+
+def seed_mongo(mongo_uri: str, students: int) -> None:
+    from pymongo import MongoClient
+    collection = MongoClient(mongo_uri)[LOAD_TEST_DB]['students']
+    collection.drop()
+    collection.insert_many(make_students(students))
+    collection.create_index('student_id', unique=True)
+    collection.create_index('username', unique=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='scsnew路由同步/异步数据库访问压力测试')
+    parser.add_argument('--concurrency', type=int, default=100, help='并发客户端数(默认100)')
+    parser.add_argument('--duration', type=float, default=5, help='每种方式的持续秒数(默认5)')
+    parser.add_argument('--students', type=int, default=2000, help='学生数(默认2000)')
+    parser.add_argument('--latency', type=float, default=2, help='模拟数据库每次操作的延迟毫秒数(默认2)')
+    parser.add_argument('--mongo-uri', help='连接真实mongod，不指定时使用进程内模拟数据库')
+    parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.students, args.latency / 1000, args.mongo_uri)
+        return
+
+    if args.mongo_uri:
+        seed_mongo(args.mongo_uri, args.students)
+        backend = f'mongod({args.mongo_uri})'
+    else:
+        backend = f'模拟数据库(每次操作{args.latency:g}毫秒)'
+    print(f"{backend}, {args.concurrency}个并发客户端, 每种方式{args.duration:g}秒")
+    print(f"{'方式':<10}{'请求数':>10}{'请求/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'失败':>6}")
+    results = {}
+    try:
+        for mode in MODES:
+            server, port = start_server(mode, args)
+            try:
+                result = asyncio.run(run_load(port, args.students, args.concurrency, args.duration))
+            finally:
+                server.terminate()
+                server.wait()
+            results[mode] = result
+            print(f"{mode:<10}{result['requests']:>10}{result['rps']:>10.0f}"
+                  f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>6}")
+    finally:
+        if args.mongo_uri:
+            from pymongo import MongoClient
+            MongoClient(args.mongo_uri).drop_database(LOAD_TEST_DB)
+    print(f"异步/同步吞吐比: {results['async']['rps'] / results['blocking']['rps']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
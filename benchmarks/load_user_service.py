@@ -0,0 +1,149 @@
+"""
+用户管理HTTP服务的压力测试
+
+在子进程中用uvicorn启动user_service，分别以1、10、100个并发客户端持续发送请求，
+统计每秒请求数和p50/p99延迟。请求混合: 70%统计查询、25%登录、5%注册。
+每个客户端是一条保持连接的HTTP/1.1连接，直接用asyncio流收发，
+避免通用HTTP客户端在高并发下的自身开销影响结果。在仓库根目录运行(需要安装fastapi和uvicorn):
+
+    python -m benchmarks.load_user_service [--users 100000] [--duration 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.datasets import PASSWORD, iter_users, write_dataset
+from benchmarks.harness import DATA_DIR, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONCURRENCY = (1, 10, 100)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(data_file: str, port: int, iterations: int) -> subprocess.Popen:
+    env = dict(os.environ, USER_DATA_FILE=data_file, USER_PASSWORD_ITERATIONS=str(iterations))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'user_service:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=ROOT, env=env
+    )
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/stats/age', timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('服务启动超时')
+
+
+class Connection:
+    """一条保持连接的HTTP/1.1连接"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, port: int) -> 'Connection':
+        return cls(*await asyncio.open_connection('127.0.0.1', port))
+
+    async def request(self, method: str, path: str, body=None) -> int:
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        head = f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n'
+        if body is not None:
+            head += 'Content-Type: application/json\r\n'
+        self.writer.write(head.encode('ascii') + b'\r\n' + payload)
+        await self.writer.drain()
+        lines = (await self.reader.readuntil(b'\r\n\r\n')).split(b'\r\n')
+        length = next(int(line.split(b':')[1]) for line in lines if line.lower().startswith(b'content-length'))
+        await self.reader.readexactly(length)
+        return int(lines[0].split()[1])
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def client(port: int, usernames, deadline: float, latencies: list, counter: list,
+                 rng: random.Random) -> None:
+    conn = await Connection.open(port)
+    try:
+        while time.monotonic() < deadline:
+            choice = rng.random()
+            start = time.perf_counter()
+            if choice < 0.70:
+                status = await conn.request('GET', '/stats')
+            elif choice < 0.95:
+                status = await conn.request('POST', '/users/login',
+                                            {'username': rng.choice(usernames), 'password': PASSWORD})
+            else:
+                counter[1] += 1
+                name = f'load{os.getpid()}x{counter[1]}'
+                status = await conn.request('POST', '/users/register', {
+                    'username': name, 'password': PASSWORD, 'email': f'{name}@example.com', 'phone': '13800000000'})
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                counter[0] += 1
+    finally:
+        conn.close()
+
+
+async def run_level(port: int, usernames, concurrency: int, duration: float, counter: list) -> dict:
+    latencies = []
+    errors_before = counter[0]
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, usernames, deadline, latencies, counter, random.Random(i))
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': counter[0] - errors_before,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='用户管理HTTP服务压力测试')
+    parser.add_argument('--users', type=int, default=100000, help='合成用户数(默认100000)')
+    parser.add_argument('--duration', type=float, default=10, help='每个并发级别的持续秒数(默认10)')
+    parser.add_argument('--iterations', type=int, default=10000, help='服务使用的PBKDF2迭代次数(默认10000)')
+    args = parser.parse_args()
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    data_file = os.path.join(DATA_DIR, f'users-{args.users}.json')
+    if not os.path.exists(data_file):
+        write_dataset(data_file, args.users)
+    # 登录只使用前1000个用户，首轮迁移密码后后续登录走验证缓存
+    usernames = [user['username'] for user in iter_users(min(args.users, 1000))]
+
+    port = free_port()
+    server = start_server(data_file, port, args.iterations)
+    try:
+        counter = [0, 0]
+        print(f"{'并发数':<8}{'请求数':>10}{'请求/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'失败':>6}")
+        for concurrency in CONCURRENCY:
+            result = asyncio.run(run_level(port, usernames, concurrency, args.duration, counter))
+            print(f"{concurrency:<8}{result['requests']:>10}{result['rps']:>10.0f}"
+                  f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>6}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
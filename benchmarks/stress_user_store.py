@@ -0,0 +1,159 @@
+"""
+用户存储的并发压力测试
+
+32个线程同时注册、登录、修改密码和修改资料，结束后检查:
+    - 所有用户的id互不相同
+    - 多个线程争抢的同一用户名只注册成功一次
+    - 每个线程修改过的密码都能登录(没有被并发的密码迁移或修改覆盖)
+    - 多个线程同时修改同一用户的不同字段，所有修改都保留
+    - 增量维护的统计计数器、统计立方体与重新计算的结果一致
+    - 变更事件数与成功的写操作数一致
+
+在仓库根目录运行(任何一项检查失败时退出码为1):
+
+    python -m benchmarks.stress_user_store [线程数] [每线程用户数]
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# 降低哈希成本，让测试时间花在并发的存储操作上
+os.environ.setdefault('USER_PASSWORD_ITERATIONS', '1000')
+
+import user_management_full as m  # noqa: E402
+
+PASSWORD = 'StressPass123'
+NEW_PASSWORD = 'StressPass456'
+# 所有线程共同修改资料的用户数
+HOT_USERS = 4
+# 所有线程争抢注册的用户名数
+CONTESTED = 20
+
+
+def worker(index, per_thread, barrier, results):
+    ok = Counter()
+    failures = []
+    barrier.wait()
+    for j in range(per_thread):
+        username = f'st{index:02d}_{j:04d}'
+        result = m.register_user(username, PASSWORD, f'{username}@stress{j % 7}.com', '13800000000',
+                                 age=(index + j) % 70, gender='male' if j % 2 else 'female')
+        if not result['success']:
+            failures.append(f'注册{username}失败: {result["message"]}')
+            continue
+        ok['register'] += 1
+
+        contested = f'contested_{j % CONTESTED:02d}'
+        if m.register_user(contested, PASSWORD, 'c@stress.com', '13900000000')['success']:
+            ok['register'] += 1
+            ok['contested'] += 1
+
+        if not m.login(username, PASSWORD)['success']:
+            failures.append(f'{username}注册后登录失败')
+        result = m.change_password(username, PASSWORD, NEW_PASSWORD)
+        if result['success']:
+            ok['update'] += 1
+        else:
+            failures.append(f'{username}修改密码失败: {result["message"]}')
+
+        # 每个线程只写自己的字段，并发修改同一用户时不应互相覆盖
+        hot = f'hot_user_{j % HOT_USERS}'
+        if m.update_user_profile(hot, **{f'thread_{index:02d}': j, 'age': j % 90})['success']:
+            ok['update'] += 1
+    results[index] = (ok, failures)
+
+
+def main(threads=32, per_thread=50):
+    m.user_store.wait_loaded()
+    for i in range(HOT_USERS):
+        m.register_user(f'hot_user_{i}', PASSWORD, f'hot{i}@stress.com', '13700000000')
+    # 让搜索索引和统计立方体在压力测试期间增量维护
+    m.user_store.search_index()
+    m.user_store.cube()
+    subscription = m.change_feed.subscribe(maxsize=0)
+    base_users = len(m.users)
+    # 原始数据中本来就有的同名用户不算并发问题
+    base_usernames = Counter(user['username'] for user in m.users)
+
+    # 缩短线程切换间隔，增加交错执行的机会
+    sys.setswitchinterval(1e-5)
+    barrier = threading.Barrier(threads)
+    results = {}
+    pool = [threading.Thread(target=worker, args=(i, per_thread, barrier, results)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    sys.setswitchinterval(0.005)
+
+    totals = Counter()
+    failures = []
+    for ok, errors in results.values():
+        totals.update(ok)
+        failures.extend(errors)
+
+    ids = Counter(user.get('id') for user in m.users)
+    duplicates = {user_id: count for user_id, count in ids.items() if count > 1}
+    if duplicates:
+        failures.append(f'重复的id: {duplicates}')
+
+    usernames = Counter(user['username'] for user in m.users) - base_usernames
+    repeated = {name: count for name, count in usernames.items() if count > 1}
+    if repeated:
+        failures.append(f'重复注册的用户名: {repeated}')
+    contested = min(per_thread, CONTESTED)
+    if totals['contested'] != contested:
+        failures.append(f'争抢的用户名注册成功{totals["contested"]}次，应为{contested}次')
+    if len(m.users) != base_users + totals['register']:
+        failures.append(f'用户数{len(m.users)}与成功注册数{base_users + totals["register"]}不一致')
+
+    for i in range(threads):
+        for j in range(per_thread):
+            username = f'st{i:02d}_{j:04d}'
+            if not m.login(username, NEW_PASSWORD)['success']:
+                failures.append(f'{username}的新密码丢失')
+
+    for k in range(HOT_USERS):
+        user = m.user_store.get(f'hot_user_{k}')
+        writers = {f'thread_{i:02d}' for i in range(threads) if any(j % HOT_USERS == k for j in range(per_thread))}
+        lost = writers - set(user)
+        if lost:
+            failures.append(f'hot_user_{k}丢失了{len(lost)}个线程的修改')
+
+    mismatches = m.check_stats_consistency()
+    if mismatches:
+        failures.append(f'统计计数器不一致: {mismatches}')
+    stale = m.user_store.cube().verify(m.users)
+    if stale:
+        failures.append(f'统计立方体不一致: {stale}')
+    missing = [u['username'] for u in m.users
+               if not any(found is u for found in m.search_users(u['username'], field='username', limit=len(m.users)))]
+    if missing:
+        failures.append(f'搜索索引缺少{len(missing)}个用户')
+
+    events = Counter()
+    while True:
+        event = subscription.get(timeout=0)
+        if event is None:
+            break
+        events[event['op']] += 1
+    subscription.close()
+    if events['register'] != totals['register'] or events['update'] != totals['update']:
+        failures.append(f'变更事件{dict(events)}与成功的写操作{dict(totals)}不一致')
+
+    print(f"{threads}个线程 x {per_thread}个用户: 用时{elapsed:.2f}秒, 注册{totals['register']}次, "
+          f"修改{totals['update']}次, 共{len(m.users)}个用户")
+    if failures:
+        print(f"发现{len(failures)}个问题:")
+        for failure in failures[:20]:
+            print(f"- {failure}")
+        sys.exit(1)
+    print("检查通过: id唯一、用户名唯一、没有丢失的修改、统计与索引一致")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -1,5 +1,8 @@
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure
 from pymongo.server_api import ServerApi
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -8,9 +11,14 @@ load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 DB_NAME = "student_course_system"
 
+# 同步客户端，供脚本和命令行工具使用
 client = MongoClient(MONGODB_URI, server_api=ServerApi('1'))
 db = client[DB_NAME]
 
+# 异步客户端(Motor)，供FastAPI路由使用，数据库往返期间不阻塞事件循环
+async_client = AsyncIOMotorClient(MONGODB_URI, server_api=ServerApi('1'))
+async_db = async_client[DB_NAME]
+
 # 集合名称
 STUDENTS_COLLECTION = "students"
 TEACHERS_COLLECTION = "teachers"
@@ -18,26 +26,64 @@ COURSES_COLLECTION = "courses"
 SCHEDULES_COLLECTION = "schedules"
 DEPARTMENTS_COLLECTION = "departments"
 CLASSROOMS_COLLECTION = "classrooms"
+# 服务进程租约(排课写入只能由一个进程负责)
+LEASES_COLLECTION = "service_leases"
 
-# 创建索引
-def create_indexes():
+logger = logging.getLogger(__name__)
+# 已有重复数据导致唯一索引无法创建的错误码
+DUPLICATE_KEY = 11000
+# 同样的键上已有选项不同的索引(如之前因重复数据改建的普通索引)的错误码
+INDEX_CONFLICT_CODES = (85, 86)
+
+# 索引定义: (集合, 键, 是否唯一)
+INDEXES = [
     # 学生集合索引
-    db[STUDENTS_COLLECTION].create_index("username", unique=True)
-    db[STUDENTS_COLLECTION].create_index("student_id", unique=True)
-    db[STUDENTS_COLLECTION].create_index("email", unique=True)
-    
+    (STUDENTS_COLLECTION, "username", True),
+    (STUDENTS_COLLECTION, "student_id", True),
+    (STUDENTS_COLLECTION, "email", True),
     # 教师集合索引
-    db[TEACHERS_COLLECTION].create_index("username", unique=True)
-    db[TEACHERS_COLLECTION].create_index("teacher_id", unique=True)
-    db[TEACHERS_COLLECTION].create_index("email", unique=True)
-    
+    (TEACHERS_COLLECTION, "username", True),
+    (TEACHERS_COLLECTION, "teacher_id", True),
+    (TEACHERS_COLLECTION, "email", True),
     # 课程集合索引
-    db[COURSES_COLLECTION].create_index("name")
-    
-    # 排课集合索引
-    db[SCHEDULES_COLLECTION].create_index("teacher_id")
-    db[SCHEDULES_COLLECTION].create_index("classroom")
-    db[SCHEDULES_COLLECTION].create_index([("day_of_week", 1), ("start_time", 1), ("end_time", 1)])
-
-# 调用创建索引
-create_indexes()
\ No newline at end of file
+    (COURSES_COLLECTION, "name", False),
+    # 排课集合索引: 同一教师、同一教室同一开始时间只能有一条排课。重叠检查由冲突索引负责，
+    # 排课只由持有写入租约的单个服务进程写入，唯一索引只兜底完全相同的开始时间
+    (SCHEDULES_COLLECTION, [("teacher_id", 1), ("day_of_week", 1), ("start_time", 1)], True),
+    (SCHEDULES_COLLECTION, [("classroom", 1), ("day_of_week", 1), ("start_time", 1)], True),
+    (SCHEDULES_COLLECTION, [("day_of_week", 1), ("start_time", 1), ("end_time", 1)], False),
+]
+
+def _fallback_index(collection: str, keys, error: OperationFailure) -> bool:
+    """
+    唯一索引创建失败时的处理，返回是否需要改建普通索引
+
+    已有数据中存在重复项时改建普通索引保证查询性能，已有同键的普通索引时保留它，
+    两种情况都记录警告，清理重复数据并删除普通索引后重启服务即可建立唯一索引。
+    其他错误照常抛出。
+    """
+    if error.code == DUPLICATE_KEY:
+        logger.warning("集合%s已有重复数据，无法创建唯一索引%s，改为普通索引: %s", collection, keys, error)
+        return True
+    if error.code in INDEX_CONFLICT_CODES:
+        logger.warning("集合%s在%s上已有非唯一索引，保留该索引: %s", collection, keys, error)
+        return False
+    raise error
+
+# 创建索引(同步，供脚本使用)
+def create_indexes():
+    for collection, keys, unique in INDEXES:
+        try:
+            db[collection].create_index(keys, unique=unique)
+        except OperationFailure as e:
+            if _fallback_index(collection, keys, e):
+                db[collection].create_index(keys)
+
+# 创建索引(异步，服务启动时调用)
+async def create_indexes_async():
+    for collection, keys, unique in INDEXES:
+        try:
+            await async_db[collection].create_index(keys, unique=unique)
+        except OperationFailure as e:
+            if _fallback_index(collection, keys, e):
+                await async_db[collection].create_index(keys)
@@ -1,12 +1,22 @@
-from fastapi import FastAPI, Depends
-from pymongo.collection import Collection
-from .database import db, STUDENTS_COLLECTION, TEACHERS_COLLECTION, COURSES_COLLECTION, SCHEDULES_COLLECTION, DEPARTMENTS_COLLECTION, CLASSROOMS_COLLECTION
+from fastapi import FastAPI, Depends, HTTPException, Query
+from .database import create_indexes_async
 from routers import students, teachers, courses, scheduling
-from utils.data_generator import generate_all_data
+from utils.seeding import start_seed_job, get_seed_job
 import uvicorn
 
 app = FastAPI(title="学生选课系统", description="基于FastAPI和MongoDB的学生选课系统API")
 
+@app.on_event("startup")
+async def startup():
+    # 服务启动时通过异步客户端创建索引，取得排课写入租约并载入排课冲突索引。
+    # 冲突索引在进程内存中，只能以单个worker运行，其他进程已持有租约时启动失败
+    await create_indexes_async()
+    await scheduling.start_writer()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await scheduling.stop_writer()
+
 # 包含路由
 app.include_router(students.router)
 app.include_router(teachers.router)
@@ -17,50 +27,26 @@ app.include_router(scheduling.router)
 async def root():
     return {"message": "欢迎使用学生选课系统API"}
 
-@app.post("/initialize-data")
-async def initialize_data():
-    """初始化数据端点 - 生成并插入测试数据"""
+@app.post("/initialize-data", status_code=202)
+async def initialize_data(students: int = Query(20000, ge=0), teachers: int = Query(200, ge=1)):
+    """初始化数据端点 - 在后台生成并插入测试数据，返回任务编号，通过进度端点查询结果"""
     try:
-        # 生成所有数据
-        data = generate_all_data()
-        
-        # 获取集合
-        students_collection = db[STUDENTS_COLLECTION]
-        teachers_collection = db[TEACHERS_COLLECTION]
-        courses_collection = db[COURSES_COLLECTION]
-        schedules_collection = db[SCHEDULES_COLLECTION]
-        departments_collection = db[DEPARTMENTS_COLLECTION]
-        classrooms_collection = db[CLASSROOMS_COLLECTION]
-        
-        # 清空现有数据
-        students_collection.delete_many({})
-        teachers_collection.delete_many({})
-        courses_collection.delete_many({})
-        schedules_collection.delete_many({})
-        departments_collection.delete_many({})
-        classrooms_collection.delete_many({})
-        
-        # 插入新数据
-        departments_collection.insert_many(data["departments"])
-        classrooms_collection.insert_many(data["classrooms"])
-        students_collection.insert_many(data["students"])
-        teachers_collection.insert_many(data["teachers"])
-        courses_collection.insert_many(data["courses"])
-        schedules_collection.insert_many(data["schedules"])
-        
-        return {
-            "message": "数据初始化成功",
-            "counts": {
-                "departments": len(data["departments"]),
-                "classrooms": len(data["classrooms"]),
-                "students": len(data["students"]),
-                "teachers": len(data["teachers"]),
-                "courses": len(data["courses"]),
-                "schedules": len(data["schedules"])
-            }
-        }
-    except (ValueError, KeyError, TypeError) as e:  # Replace with specific exceptions
-        return {"message": f"数据初始化失败: {str(e)}"}
+        job = start_seed_job(students=students, teachers=teachers)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "message": "数据初始化已开始",
+        "job_id": job.id,
+        "status_url": f"/initialize-data/{job.id}"
+    }
+
+@app.get("/initialize-data/{job_id}")
+async def initialize_data_progress(job_id: str):
+    """查询数据初始化任务的进度"""
+    job = get_seed_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="初始化任务不存在")
+    return job.to_dict()
 
 # if __name__ == "__main__":
 #     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
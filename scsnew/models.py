@@ -73,6 +73,7 @@ class CourseCreate(BaseModel):
     course_type: CourseType
     department: Optional[str] = None  # 对于专业必修课，指定所属院系
     class_names: Optional[List[str]] = None  # 对于专业必修课，指定适用的班级
+    class_size: Optional[int] = Field(None, ge=1)  # 上课人数，排课时教室容量不能小于它
 
 class Course(BaseModel):
     id: str
@@ -81,6 +82,7 @@ class Course(BaseModel):
     course_type: CourseType
     department: Optional[str] = None
     class_names: Optional[List[str]] = None
+    class_size: Optional[int] = None
     teacher_id: Optional[str] = None
     
     class Config:
@@ -106,6 +108,17 @@ class Schedule(BaseModel):
     class Config:
         from_attributes = True
 
+class ScheduleBulkItem(BaseModel):
+    index: int  # 在请求列表中的下标
+    accepted: bool
+    id: Optional[str] = None  # 接受时为新排课的编号
+    reason: Optional[str] = None  # 拒绝时的原因
+
+class ScheduleBulkResult(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[ScheduleBulkItem]
+
 class LoginRequest(BaseModel):
     username: str
     password: str
\ No newline at end of file
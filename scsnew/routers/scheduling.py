@@ -1,82 +1,228 @@
+import asyncio
+
+from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Depends
-from pymongo.collection import Collection
-from database import db, SCHEDULES_COLLECTION, CLASSROOMS_COLLECTION
-from models import Schedule, ScheduleCreate
-from typing import List
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from database import async_db, SCHEDULES_COLLECTION, CLASSROOMS_COLLECTION, LEASES_COLLECTION
+from models import Schedule, ScheduleCreate, ScheduleBulkItem, ScheduleBulkResult
+from utils.conflict_index import conflict_index, parse_range, format_time, ScheduleConflict
+from utils.writer_lease import WriterLease
+from typing import List, Optional, Tuple
 
 router = APIRouter(prefix="/schedules", tags=["scheduling"])
 
-def get_schedules_collection() -> Collection:
-    return db[SCHEDULES_COLLECTION]
+def get_schedules_collection() -> AsyncIOMotorCollection:
+    return async_db[SCHEDULES_COLLECTION]
+
+def get_classrooms_collection() -> AsyncIOMotorCollection:
+    return async_db[CLASSROOMS_COLLECTION]
+
+# 冲突类型对应的提示
+CONFLICT_MESSAGES = {
+    "teacher": "教师在该时间段已有其他课程安排",
+    "classroom": "教室在该时间段已被占用",
+}
+
+def _duplicate_message(key_pattern: dict) -> str:
+    # 唯一索引冲突(其他服务进程已在同一开始时间插入了排课)对应的提示
+    return CONFLICT_MESSAGES["teacher" if "teacher_id" in (key_pattern or {}) else "classroom"]
+
+# 延迟载入冲突索引和续期租约的锁，并发的首批请求只读取一次排课集合
+_load_lock = asyncio.Lock()
+# 冲突索引只在本进程内有效，排课只能由持有该租约的服务进程写入
+writer_lease = WriterLease("schedules-writer")
+
+def _invalidate_conflict_index() -> None:
+    # 租约曾经失效，其间其他进程可能写入过排课，下次写入前重新载入
+    conflict_index.loaded = False
+
+async def start_writer() -> None:
+    """
+    取得排课写入租约并载入冲突索引，之后定期续期(服务启动时调用)
 
-def get_classrooms_collection() -> Collection:
-    return db[CLASSROOMS_COLLECTION]
+    Raises:
+        RuntimeError: 其他服务进程正在写入排课(如以多个worker启动)
+    """
+    leases = async_db[LEASES_COLLECTION]
+    await writer_lease.acquire(leases)
+    await load_conflict_index()
+    writer_lease.keep(leases, _invalidate_conflict_index)
+
+async def stop_writer() -> None:
+    """释放排课写入租约(服务关闭时调用)"""
+    await writer_lease.release(async_db[LEASES_COLLECTION])
+
+async def load_conflict_index(collection: AsyncIOMotorCollection = None) -> int:
+    """从排课集合载入冲突索引(服务启动时调用)，返回载入的排课数"""
+    collection = collection if collection is not None else get_schedules_collection()
+    projection = {"teacher_id": 1, "classroom": 1, "day_of_week": 1, "start_time": 1, "end_time": 1}
+    # 读取期间其他请求确认或删除的排课由loading()合并，不会被读到的旧快照覆盖
+    with conflict_index.loading():
+        schedules = await collection.find({}, projection).to_list(length=None)
+        return conflict_index.load(schedules)
+
+def _writer_ready() -> bool:
+    # 租约剩余时间不足三分之一时先续期，留出余量让写入在租约到期前完成
+    return conflict_index.loaded and writer_lease.remaining() > writer_lease.seconds / 3
+
+async def _ensure_writer(collection: AsyncIOMotorCollection) -> None:
+    # 写排课前确认本进程持有租约且冲突索引已载入；启动时已完成时直接返回，
+    # 路由挂载在没有启动事件的应用上或续期任务未能及时续期时在这里补上
+    if _writer_ready():
+        return
+    async with _load_lock:
+        if _writer_ready():
+            return
+        if writer_lease.remaining() <= writer_lease.seconds / 3:
+            try:
+                if await writer_lease.acquire(async_db[LEASES_COLLECTION]):
+                    _invalidate_conflict_index()
+            except RuntimeError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+        if not conflict_index.loaded:
+            await load_conflict_index(collection)
 
 @router.post("/", response_model=Schedule)
 async def create_schedule(schedule: ScheduleCreate, 
-                         schedules_collection: Collection = Depends(get_schedules_collection),
-                         classrooms_collection: Collection = Depends(get_classrooms_collection)):
+                         schedules_collection: AsyncIOMotorCollection = Depends(get_schedules_collection),
+                         classrooms_collection: AsyncIOMotorCollection = Depends(get_classrooms_collection)):
+    try:
+        start, end = parse_range(schedule.start_time, schedule.end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     # 检查教室是否存在
-    classroom = classrooms_collection.find_one({"id": schedule.classroom})
+    classroom = await classrooms_collection.find_one({"id": schedule.classroom})
     if not classroom:
         raise HTTPException(status_code=404, detail="教室不存在")
     
-    # 检查时间冲突 - 同一教师同一时间不能上不同课程
-    teacher_conflict = schedules_collection.find_one({
-        "teacher_id": schedule.teacher_id,
-        "day_of_week": schedule.day_of_week,
-        "$or": [
-            {
-                "start_time": {"$lt": schedule.end_time},
-                "end_time": {"$gt": schedule.start_time}
-            }
-        ]
-    })
-    
-    if teacher_conflict:
-        raise HTTPException(status_code=400, detail="教师在该时间段已有其他课程安排")
-    
-    # 检查时间冲突 - 同一教室同一时间不能安排不同课程
-    classroom_conflict = schedules_collection.find_one({
-        "classroom": schedule.classroom,
-        "day_of_week": schedule.day_of_week,
-        "$or": [
-            {
-                "start_time": {"$lt": schedule.end_time},
-                "end_time": {"$gt": schedule.start_time}
-            }
-        ]
-    })
-    
-    if classroom_conflict:
-        raise HTTPException(status_code=400, detail="教室在该时间段已被占用")
+    await _ensure_writer(schedules_collection)
+
+    # 检查时间冲突(同一教师、同一教室同一时间只能有一门课)并预留时间段，防止并发请求在写入前同时通过检查
+    try:
+        token = conflict_index.reserve(schedule.teacher_id, schedule.classroom, schedule.day_of_week, start, end)
+    except ScheduleConflict as e:
+        raise HTTPException(status_code=400, detail=CONFLICT_MESSAGES[e.kind])
     
-    # 插入新排课
+    # 插入新排课，时间统一保存为补零的HH:MM
     schedule_dict = schedule.model_dump()
-    result = schedules_collection.insert_one(schedule_dict)
+    schedule_dict["start_time"] = format_time(start)
+    schedule_dict["end_time"] = format_time(end)
+    try:
+        result = await schedules_collection.insert_one(schedule_dict)
+    except DuplicateKeyError as e:
+        conflict_index.release(token)
+        raise HTTPException(status_code=400, detail=_duplicate_message((e.details or {}).get("keyPattern")))
+    except BaseException:
+        conflict_index.release(token)
+        raise
+    conflict_index.commit(token, str(result.inserted_id))
     
     # 返回创建的排课
-    created_schedule = schedules_collection.find_one({"_id": result.inserted_id})
-    created_schedule["id"] = str(created_schedule["_id"])
-    return created_schedule
+    schedule_dict["id"] = str(result.inserted_id)
+    return schedule_dict
+
+@router.post("/bulk", response_model=ScheduleBulkResult)
+async def create_schedules_bulk(schedules: List[ScheduleCreate],
+                                schedules_collection: AsyncIOMotorCollection = Depends(get_schedules_collection),
+                                classrooms_collection: AsyncIOMotorCollection = Depends(get_classrooms_collection)):
+    """
+    批量创建排课
+
+    与已有排课冲突、与本批中排在前面且已接受的项冲突、时间格式错误或教室不存在的项被拒绝，
+    其余项用一次insert_many写入。返回每项是否接受以及拒绝原因，部分失败时整体仍返回200。
+    """
+    results: List[Optional[ScheduleBulkItem]] = [None] * len(schedules)
+    rows: List[Optional[Tuple[str, str, int, int, int]]] = [None] * len(schedules)
+
+    def reject(i: int, reason: str) -> None:
+        results[i] = ScheduleBulkItem(index=i, accepted=False, reason=reason)
+
+    # 一次查询所有涉及的教室
+    classroom_ids = list({schedule.classroom for schedule in schedules})
+    found = await classrooms_collection.find({"id": {"$in": classroom_ids}}, {"id": 1}).to_list(length=None)
+    classrooms = {classroom["id"] for classroom in found}
+
+    for i, schedule in enumerate(schedules):
+        try:
+            start, end = parse_range(schedule.start_time, schedule.end_time)
+        except ValueError as e:
+            reject(i, str(e))
+            continue
+        if schedule.classroom not in classrooms:
+            reject(i, "教室不存在")
+            continue
+        rows[i] = (schedule.teacher_id, schedule.classroom, schedule.day_of_week, start, end)
+
+    await _ensure_writer(schedules_collection)
+
+    # 检查冲突并预留接受的项
+    pending = []
+    for i, reserved in enumerate(conflict_index.reserve_many(rows)):
+        if isinstance(reserved, ScheduleConflict):
+            reason = CONFLICT_MESSAGES[reserved.kind]
+            reject(i, reason if reserved.item is None else f"{reason}(与第{reserved.item + 1}项冲突)")
+        elif reserved is not None:
+            schedule_dict = schedules[i].model_dump()
+            schedule_dict["start_time"] = format_time(rows[i][3])
+            schedule_dict["end_time"] = format_time(rows[i][4])
+            pending.append((i, reserved, schedule_dict))
+
+    if pending:
+        write_errors = {}
+        try:
+            # ordered=False: 个别项违反唯一索引时其余项照常写入，insert_many会先为每项填好_id
+            await schedules_collection.insert_many([doc for _, _, doc in pending], ordered=False)
+        except BulkWriteError as e:
+            write_errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+        except BaseException:
+            for _, token, _ in pending:
+                conflict_index.release(token)
+            raise
+        for k, (i, token, doc) in enumerate(pending):
+            error = write_errors.get(k)
+            if error is None:
+                conflict_index.commit(token, str(doc["_id"]))
+                results[i] = ScheduleBulkItem(index=i, accepted=True, id=str(doc["_id"]))
+                continue
+            conflict_index.release(token)
+            if error.get("code") == 11000:
+                reject(i, _duplicate_message(error.get("keyPattern")))
+            else:
+                reject(i, f"写入失败: {error.get('errmsg')}")
+
+    accepted = sum(1 for result in results if result.accepted)
+    return ScheduleBulkResult(accepted=accepted, rejected=len(results) - accepted, results=results)
+
+@router.delete("/{schedule_id}")
+async def delete_schedule(schedule_id: str, collection: AsyncIOMotorCollection = Depends(get_schedules_collection)):
+    if not ObjectId.is_valid(schedule_id):
+        raise HTTPException(status_code=404, detail="排课不存在")
+    await _ensure_writer(collection)
+    result = await collection.delete_one({"_id": ObjectId(schedule_id)})
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="排课不存在")
+    conflict_index.remove(schedule_id)
+    return {"message": "排课已删除"}
 
 @router.get("/", response_model=List[Schedule])
-async def get_schedules(skip: int = 0, limit: int = 100, collection: Collection = Depends(get_schedules_collection)):
-    schedules = list(collection.find().skip(skip).limit(limit))
+async def get_schedules(skip: int = 0, limit: int = 100, collection: AsyncIOMotorCollection = Depends(get_schedules_collection)):
+    schedules = await collection.find().skip(skip).limit(limit).to_list(length=limit or None)
     for schedule in schedules:
         schedule["id"] = str(schedule["_id"])
     return schedules
 
 @router.get("/teacher/{teacher_id}", response_model=List[Schedule])
-async def get_teacher_schedule(teacher_id: str, collection: Collection = Depends(get_schedules_collection)):
-    schedules = list(collection.find({"teacher_id": teacher_id}))
+async def get_teacher_schedule(teacher_id: str, collection: AsyncIOMotorCollection = Depends(get_schedules_collection)):
+    schedules = await collection.find({"teacher_id": teacher_id}).to_list(length=None)
     for schedule in schedules:
         schedule["id"] = str(schedule["_id"])
     return schedules
 
 @router.get("/classroom/{classroom}", response_model=List[Schedule])
-async def get_classroom_schedule(classroom: str, collection: Collection = Depends(get_schedules_collection)):
-    schedules = list(collection.find({"classroom": classroom}))
+async def get_classroom_schedule(classroom: str, collection: AsyncIOMotorCollection = Depends(get_schedules_collection)):
+    schedules = await collection.find({"classroom": classroom}).to_list(length=None)
     for schedule in schedules:
         schedule["id"] = str(schedule["_id"])
     return schedules
\ No newline at end of file
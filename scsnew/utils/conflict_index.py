@@ -0,0 +1,353 @@
+"""
+排课冲突索引
+
+在内存中为每个(教师, 星期)和(教室, 星期)维护一组按开始时间排序的时间区间，并记录前缀最大结束时间，
+检查新排课是否与已有排课重叠只需一次二分查找，不用访问数据库。时间统一换算为分钟数比较，
+"8:00"和"08:00"是同一时间。
+
+并发创建排课时先在索引中预留(检查和占位之间没有await，事件循环中不会被其他请求打断)，
+写入数据库成功后确认，失败则释放。索引只在当前进程内有效，看不到其他进程写入的排课，
+因此排课只由持有写入租约(utils.writer_lease)的单个服务进程写入。
+从数据库重新载入时，读取快照期间确认和删除的排课会合并进快照，不会被覆盖掉。
+"""
+import heapq
+import itertools
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+MINUTES_PER_DAY = 24 * 60
+# 冲突类型，同时存在时先报告教师冲突
+KINDS = ("teacher", "classroom")
+
+
+def parse_time(text: str) -> int:
+    """
+    把"HH:MM"或"H:MM"格式的时间换算为从0点开始的分钟数
+
+    Raises:
+        ValueError: 格式不正确或超出范围
+    """
+    hours, sep, minutes = str(text).strip().partition(":")
+    if not sep or not hours.isdigit() or len(minutes) != 2 or not minutes.isdigit():
+        raise ValueError(f"时间格式不正确: {text}，应为HH:MM")
+    value = int(hours) * 60 + int(minutes)
+    if int(minutes) >= 60 or value > MINUTES_PER_DAY:
+        raise ValueError(f"时间超出范围: {text}")
+    return value
+
+
+def format_time(minutes: int) -> str:
+    """把分钟数格式化为补零的"HH:MM"，存入数据库的时间都使用这个格式"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_range(start_time: str, end_time: str) -> Tuple[int, int]:
+    """
+    解析上课时间段
+
+    Returns:
+        Tuple[int, int]: 开始和结束的分钟数
+
+    Raises:
+        ValueError: 时间格式不正确或结束时间不晚于开始时间
+    """
+    start, end = parse_time(start_time), parse_time(end_time)
+    if end <= start:
+        raise ValueError("结束时间必须晚于开始时间")
+    return start, end
+
+
+class ScheduleConflict(Exception):
+    """
+    新排课与已有排课时间重叠，kind为teacher或classroom
+
+    与已有排课(或其他请求的预留)冲突时schedule_id为对方编号，
+    批量创建时与同一批中排在前面的项冲突时item为对方下标。
+    """
+
+    def __init__(self, kind: str, schedule_id: Optional[str] = None, item: Optional[int] = None):
+        super().__init__(f"{kind} conflict with {schedule_id if item is None else f'item {item}'}")
+        self.kind = kind
+        self.schedule_id = schedule_id
+        self.item = item
+
+
+class _Intervals:
+    # 一个资源一天内的时间区间，按开始时间排序，max_end[i]为前i+1个区间的最大结束时间
+    __slots__ = ("starts", "ends", "ids", "max_end")
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.ids: List[str] = []
+        self.max_end: List[int] = []
+
+    def _rebuild(self, i: int) -> None:
+        del self.max_end[i:]
+        running = self.max_end[i - 1] if i else -1
+        for end in self.ends[i:]:
+            running = max(running, end)
+            self.max_end.append(running)
+
+    def overlap(self, start: int, end: int) -> Optional[str]:
+        # 开始时间早于end的区间是前i个，其中结束时间晚于start的与[start, end)重叠
+        i = bisect_left(self.starts, end)
+        if i == 0 or self.max_end[i - 1] <= start:
+            return None
+        for j in range(i - 1, -1, -1):
+            if self.ends[j] > start:
+                return self.ids[j]
+        return None
+
+    def add(self, start: int, end: int, entry_id: str) -> None:
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, entry_id)
+        self._rebuild(i)
+
+    def remove(self, entry_id: str) -> None:
+        i = self.ids.index(entry_id)
+        del self.starts[i], self.ends[i], self.ids[i]
+        self._rebuild(i)
+
+    def rename(self, old_id: str, new_id: str) -> None:
+        self.ids[self.ids.index(old_id)] = new_id
+
+
+class ConflictIndex:
+    """
+    按(资源, 星期)划分的排课时间区间索引
+
+    Examples:
+        >>> index = ConflictIndex()
+        >>> token = index.reserve("T0001", "A101", 1, 480, 580)
+        >>> index.commit(token, "665f...")
+        >>> index.reserve("T0001", "B201", 1, 540, 600)
+        Traceback (most recent call last):
+        ScheduleConflict: teacher conflict with 665f...
+    """
+
+    def __init__(self):
+        self._intervals: Dict[Tuple[str, str, int], _Intervals] = {}
+        # 排课编号(或预留编号)到(教师, 教室, 星期, 开始, 结束)
+        self._entries: Dict[str, Tuple[str, str, int, int, int]] = {}
+        self._pending = set()
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        # 正在进行的载入数，以及载入开始后确认的排课和删除的排课编号
+        self._loads = 0
+        self._committed: Dict[str, Tuple[str, str, int, int, int]] = {}
+        self._removed = set()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, teacher_id: str, classroom: str, day: int) -> Tuple[Tuple[str, str, int], Tuple[str, str, int]]:
+        return ("teacher", teacher_id, day), ("classroom", classroom, day)
+
+    def _add(self, entry_id: str, teacher_id: str, classroom: str, day: int, start: int, end: int) -> None:
+        for key in self._keys(teacher_id, classroom, day):
+            intervals = self._intervals.get(key)
+            if intervals is None:
+                intervals = self._intervals[key] = _Intervals()
+            intervals.add(start, end, entry_id)
+        self._entries[entry_id] = (teacher_id, classroom, day, start, end)
+
+    def _remove(self, entry_id: str) -> bool:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return False
+        teacher_id, classroom, day, _, _ = entry
+        for key in self._keys(teacher_id, classroom, day):
+            intervals = self._intervals[key]
+            intervals.remove(entry_id)
+            if not intervals.ids:
+                del self._intervals[key]
+        return True
+
+    @contextmanager
+    def loading(self):
+        """
+        在读取排课快照之前进入，load在其中调用
+
+        进入之后确认的排课即使不在快照中也会保留，删除的排课即使仍在快照中也不再载入。
+
+        Examples:
+            >>> with conflict_index.loading():
+            ...     conflict_index.load(await collection.find({}).to_list(length=None))
+        """
+        with self._lock:
+            self._loads += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._loads -= 1
+                if not self._loads:
+                    self._committed.clear()
+                    self._removed.clear()
+
+    def load(self, schedules: Iterable[Dict[str, Any]]) -> int:
+        """
+        用已有排课重建索引，尚未确认的预留保留
+
+        时间格式无法解析的排课跳过(它们不可能与按分钟比较的新排课正确比较)。
+        在loading()中调用时合并读取快照期间确认和删除的排课。
+
+        Returns:
+            int: 载入的排课数
+        """
+        rows = []
+        for schedule in schedules:
+            try:
+                start, end = parse_range(schedule["start_time"], schedule["end_time"])
+            except (KeyError, ValueError):
+                continue
+            rows.append((str(schedule["_id"]), schedule["teacher_id"], schedule["classroom"],
+                         int(schedule["day_of_week"]), start, end))
+        with self._lock:
+            rows = [row for row in rows if row[0] not in self._removed]
+            seen = {row[0] for row in rows}
+            committed = [(schedule_id, *entry) for schedule_id, entry in self._committed.items()
+                         if schedule_id not in seen]
+            pending = [(token, *self._entries[token]) for token in self._pending]
+            self._intervals = {}
+            self._entries = {}
+            for row in rows + committed + pending:
+                self._add(*row)
+            self.loaded = True
+        return len(rows) + len(committed)
+
+    def find_conflict(self, teacher_id: str, classroom: str, day: int,
+                      start: int, end: int) -> Optional[ScheduleConflict]:
+        """返回与给定时间段重叠的第一个冲突(先查教师后查教室)，没有冲突返回None"""
+        for kind, key in zip(KINDS, self._keys(teacher_id, classroom, day)):
+            intervals = self._intervals.get(key)
+            if intervals is not None:
+                other = intervals.overlap(start, end)
+                if other is not None:
+                    return ScheduleConflict(kind, other)
+        return None
+
+    def reserve(self, teacher_id: str, classroom: str, day: int, start: int, end: int) -> str:
+        """
+        检查冲突并占用时间段，返回预留编号，写入数据库后用commit确认或release释放
+
+        Raises:
+            ScheduleConflict: 教师或教室在该时间段已有排课(包括其他请求尚未确认的预留)
+        """
+        with self._lock:
+            conflict = self.find_conflict(teacher_id, classroom, day, start, end)
+            if conflict is not None:
+                raise conflict
+            token = f"pending-{next(self._tokens)}"
+            self._add(token, teacher_id, classroom, day, start, end)
+            self._pending.add(token)
+        return token
+
+    def reserve_many(self, rows: List[Optional[Tuple[str, str, int, int, int]]]
+                     ) -> List[Union[str, ScheduleConflict, None]]:
+        """
+        批量检查冲突并预留
+
+        对每个(资源, 星期)把已有区间和本批区间按开始时间排序后扫描一遍，找出所有重叠的对，
+        再按本批顺序决定: 与已有排课重叠的拒绝，与排在前面且已接受的项重叠的拒绝，其余接受并预留。
+
+        Args:
+            rows: 每项为(教师, 教室, 星期, 开始分钟, 结束分钟)，None表示该项已被调用方拒绝
+
+        Returns:
+            List[Union[str, ScheduleConflict, None]]: 与rows一一对应，接受的项为预留编号，
+            拒绝的项为ScheduleConflict，rows中为None的项仍为None
+        """
+        results: List[Union[str, ScheduleConflict, None]] = [None] * len(rows)
+        with self._lock:
+            groups: Dict[Tuple[str, Tuple[str, str, int]], List[int]] = {}
+            for i, row in enumerate(rows):
+                if row is not None:
+                    for kind, key in zip(KINDS, self._keys(*row[:3])):
+                        groups.setdefault((kind, key), []).append(i)
+
+            # 与已有排课的冲突(按类型)，以及与本批中排在前面的项的冲突
+            existing: Dict[int, Dict[str, str]] = {}
+            earlier: Dict[int, List[Tuple[int, str]]] = {}
+            order = itertools.count()
+            for (kind, key), items in groups.items():
+                # 事件: (开始, 结束, 已有排课编号, 本批下标)，两者恰有一个为None
+                events = [(rows[i][3], rows[i][4], None, i) for i in items]
+                intervals = self._intervals.get(key)
+                if intervals is not None:
+                    events.extend(zip(intervals.starts, intervals.ends, intervals.ids, itertools.repeat(None)))
+                events.sort(key=lambda event: event[0])
+                active = []
+                for start, end, schedule_id, i in events:
+                    while active and active[0][0] <= start:
+                        heapq.heappop(active)
+                    for _, _, other_id, j in active:
+                        if i is None and j is None:
+                            continue
+                        if i is None:
+                            existing.setdefault(j, {}).setdefault(kind, schedule_id)
+                        elif j is None:
+                            existing.setdefault(i, {}).setdefault(kind, other_id)
+                        else:
+                            first, second = min(i, j), max(i, j)
+                            earlier.setdefault(second, []).append((first, kind))
+                    heapq.heappush(active, (end, next(order), schedule_id, i))
+
+            accepted = set()
+            for i, row in enumerate(rows):
+                if row is None:
+                    continue
+                if i in existing:
+                    kind = next(kind for kind in KINDS if kind in existing[i])
+                    results[i] = ScheduleConflict(kind, existing[i][kind])
+                    continue
+                blockers = sorted((j, KINDS.index(kind)) for j, kind in earlier.get(i, ()) if j in accepted)
+                if blockers:
+                    j, kind = blockers[0]
+                    results[i] = ScheduleConflict(KINDS[kind], item=j)
+                    continue
+                accepted.add(i)
+                token = f"pending-{next(self._tokens)}"
+                self._add(token, *row)
+                self._pending.add(token)
+                results[i] = token
+        return results
+
+    def commit(self, token: str, schedule_id: str) -> None:
+        """预留已写入数据库，改用排课编号登记"""
+        with self._lock:
+            self._pending.discard(token)
+            entry = self._entries.pop(token, None)
+            if entry is None:
+                return
+            teacher_id, classroom, day, _, _ = entry
+            for key in self._keys(teacher_id, classroom, day):
+                self._intervals[key].rename(token, schedule_id)
+            self._entries[schedule_id] = entry
+            if self._loads:
+                self._committed[schedule_id] = entry
+                self._removed.discard(schedule_id)
+
+    def release(self, token: str) -> None:
+        """写入数据库失败，释放预留"""
+        with self._lock:
+            self._pending.discard(token)
+            self._remove(token)
+
+    def remove(self, schedule_id: str) -> bool:
+        """排课删除后从索引中移除，返回是否存在"""
+        with self._lock:
+            if self._loads:
+                self._committed.pop(schedule_id, None)
+                self._removed.add(schedule_id)
+            return self._remove(schedule_id)
+
+
+# 服务进程内共享的冲突索引，启动时从排课集合载入
+conflict_index = ConflictIndex()
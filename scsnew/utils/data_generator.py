@@ -4,6 +4,8 @@ from datetime import time
 from typing import List, Dict, Any
 import json
 
+from utils.timetable import solve_timetable
+
 fake = Faker('zh_CN')
 
 # 预定义数据
@@ -39,40 +41,42 @@ def generate_classrooms() -> List[Dict[str, Any]]:
                 })
     return classrooms
 
+CLASSES_PER_DEPT = 40  # 每个院系40个班级
+
+def make_student(i: int, gender: str, name: str, signature: str, age: int, phone: str, address: str) -> Dict[str, Any]:
+    """按序号i构造第i+1个学生，用户名、学号和邮箱由序号决定，保证唯一"""
+    dept_index = i % len(DEPARTMENTS)
+    department = DEPARTMENTS[dept_index]
+    class_num = (i % CLASSES_PER_DEPT) + 1
+    return {
+        "username": f"student{i+1:06d}",
+        "password": "password123",  # 默认密码，实际应用中应该加密
+        "nickname": f"学生{i+1}",
+        "signature": signature,
+        "name": name,
+        # 学号: 年级 + 院系编号 + 7位序号(学号有唯一索引，不能按序号取模)
+        "student_id": f"2024{(dept_index+1):02d}{i+1:07d}",
+        "department": department,
+        "class_name": f"{department}{class_num:02d}班",
+        "gender": gender,
+        "age": age,
+        "phone": phone,
+        "email": f"student{i+1}@example.com",
+        "address": address,
+        "current_grades": {},
+        "past_grades": {}
+    }
+
 def generate_students(count: int = 20000) -> List[Dict[str, Any]]:
     students = []
-    classes_per_dept = 40  # 每个院系40个班级
-    
     for i in range(count):
-        dept_index = i % len(DEPARTMENTS)
-        department = DEPARTMENTS[dept_index]
-        class_num = (i % classes_per_dept) + 1
-        class_name = f"{department}{class_num:02d}班"
-        
         gender = random.choice(["男", "女"])
         if gender == "男":
             name = fake.name_male()
         else:
             name = fake.name_female()
-            
-        student = {
-            "username": f"student{i+1:06d}",
-            "password": "password123",  # 默认密码，实际应用中应该加密
-            "nickname": f"学生{i+1}",
-            "signature": fake.sentence(),
-            "name": name,
-            "student_id": f"2024{(dept_index+1):02d}{(i % 1000):04d}",
-            "department": department,
-            "class_name": class_name,
-            "gender": gender,
-            "age": random.randint(18, 25),
-            "phone": fake.phone_number(),
-            "email": f"student{i+1}@example.com",
-            "address": fake.address(),
-            "current_grades": {},
-            "past_grades": {}
-        }
-        students.append(student)
+        students.append(make_student(i, gender, name, fake.sentence(), random.randint(18, 25),
+                                     fake.phone_number(), fake.address()))
     return students
 
 def generate_teachers(count: int = 200) -> List[Dict[str, Any]]:
@@ -112,6 +116,7 @@ def generate_courses() -> List[Dict[str, Any]]:
             "course_type": "公共选修课",
             "department": None,
             "class_names": None,
+            "class_size": random.randint(40, 120),
             "teacher_id": None
         }
         courses.append(course)
@@ -130,6 +135,7 @@ def generate_courses() -> List[Dict[str, Any]]:
                 "course_type": "专业必修课",
                 "department": dept,
                 "class_names": [f"{dept}{j:02d}班" for j in range(1, 41)],
+                "class_size": random.randint(30, 100),
                 "teacher_id": None
             }
             courses.append(course)
@@ -207,61 +213,9 @@ def assign_courses_to_teachers(teachers: List[Dict[str, Any]], courses: List[Dic
     
     return teachers, courses
 
-def generate_schedules(teachers: List[Dict[str, Any]], courses: List[Dict[str, Any]], classrooms: List[Dict[str, Any]]):
-    """生成课程安排，确保没有时间冲突"""
-    schedules = []
-    time_slots = generate_time_slots()
-    classroom_ids = [c["id"] for c in classrooms]
-    
-    # 记录教师和教室的时间占用
-    teacher_occupied = {t["teacher_id"]: set() for t in teachers}
-    classroom_occupied = {c["id"]: set() for c in classrooms}
-    
-    for course in courses:
-        if not course["teacher_id"]:
-            continue  # 没有分配教师的课程跳过
-            
-        teacher_id = course["teacher_id"]
-        
-        # 尝试分配时间 slot 和教室
-        assigned = False
-        random.shuffle(time_slots)
-        random.shuffle(classroom_ids)
-        
-        for slot in time_slots:
-            if assigned:
-                break
-                
-            time_key = (slot["day_of_week"], slot["start_time"], slot["end_time"])
-            
-            # 检查教师是否有空
-            if time_key in teacher_occupied[teacher_id]:
-                continue
-                
-            # 检查教室是否有空
-            for classroom_id in classroom_ids:
-                if time_key in classroom_occupied[classroom_id]:
-                    continue
-                    
-                # 分配成功
-                schedule = {
-                    "course_id": course["name"],
-                    "teacher_id": teacher_id,
-                    "classroom": classroom_id,
-                    "day_of_week": slot["day_of_week"],
-                    "start_time": slot["start_time"],
-                    "end_time": slot["end_time"]
-                }
-                schedules.append(schedule)
-                
-                # 更新占用记录
-                teacher_occupied[teacher_id].add(time_key)
-                classroom_occupied[classroom_id].add(time_key)
-                
-                assigned = True
-                break
-    
-    return schedules
+def generate_schedules(courses: List[Dict[str, Any]], classrooms: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """生成课程安排，确保没有时间冲突且教室容量足够，返回solve_timetable的结果(schedules和unplaced)"""
+    return solve_timetable(courses, classrooms, generate_time_slots())
 
 def generate_all_data():
     """生成所有数据"""
@@ -284,7 +238,12 @@ def generate_all_data():
     teachers, courses = assign_courses_to_teachers(teachers, courses)
     
     print("生成课程安排...")
-    schedules = generate_schedules(teachers, courses, classrooms)
+    timetable = generate_schedules(courses, classrooms)
+    schedules = timetable["schedules"]
+    if timetable["unplaced"]:
+        print(f"有{len(timetable['unplaced'])}门课程无法排课:")
+        for item in timetable["unplaced"][:10]:
+            print(f"  {item['course_id']}: {item['reason']}")
     
     return {
         "departments": departments,
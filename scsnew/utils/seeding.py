@@ -0,0 +1,274 @@
+"""
+批量初始化测试数据
+
+学生数据在多个工作进程中分块生成，每块生成后立即交给写入线程，以ordered=False的insert_many
+通过多个连接并发写入MongoDB，内存中只保留正在生成和正在写入的少量数据块。
+写入前直接删除集合而不是逐条delete_many，写入完成后再统一建索引，避免边写边维护索引。
+整个过程在后台线程中执行，通过SeedJob查询进度。
+"""
+import multiprocessing
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, List, Optional
+
+from faker import Faker
+from pymongo.errors import BulkWriteError
+
+from utils.data_generator import (
+    make_student, generate_departments, generate_classrooms, generate_teachers,
+    generate_courses, assign_courses_to_teachers, generate_time_slots
+)
+from utils.conflict_index import conflict_index
+from utils.timetable import solve_timetable
+
+# 每个数据块的学生数
+CHUNK_SIZE = 5000
+# 并发写入的线程(连接)数
+WRITERS = 4
+# 每个工作进程预先用Faker生成的取值池大小，学生从池中随机组合，避免每个学生都调用Faker
+POOL_SIZE = 5000
+
+# 工作进程内的取值池，首次生成数据块时初始化
+_pools: Optional[Dict[str, List[str]]] = None
+
+
+def _init_pools(seed: int) -> Dict[str, List[str]]:
+    fake = Faker('zh_CN')
+    fake.seed_instance(seed)
+    return {
+        "男": [fake.name_male() for _ in range(POOL_SIZE)],
+        "女": [fake.name_female() for _ in range(POOL_SIZE)],
+        "signature": [fake.sentence() for _ in range(POOL_SIZE)],
+        "phone": [fake.phone_number() for _ in range(POOL_SIZE)],
+        "address": [fake.address() for _ in range(POOL_SIZE)],
+    }
+
+
+def generate_student_chunk(start: int, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    生成序号为[start, start + count)的学生(在工作进程中执行)
+
+    Args:
+        start: 第一个学生的序号
+        count: 学生数
+        seed: 随机种子，相同的种子和序号生成相同的数据
+
+    Returns:
+        List[Dict[str, Any]]: 学生字典列表
+    """
+    global _pools
+    if _pools is None:
+        _pools = _init_pools(seed)
+    rng = random.Random(seed * 1000003 + start)
+    pools = _pools
+    students = []
+    for i in range(start, start + count):
+        gender = rng.choice(("男", "女"))
+        students.append(make_student(
+            i, gender, rng.choice(pools[gender]), rng.choice(pools["signature"]), rng.randint(18, 25),
+            rng.choice(pools["phone"]), rng.choice(pools["address"])
+        ))
+    return students
+
+
+class SeedJob:
+    """
+    一次数据初始化任务
+
+    Attributes:
+        id: 任务编号
+        status: pending/running/done/failed
+        phase: 当前阶段(drop/generate/index)
+        totals: 各集合计划写入的文档数
+        inserted: 各集合已写入的文档数
+        errors: 写入失败的文档数
+        unplaced: 无法排课的课程及原因
+        error: 任务失败时的错误信息
+    """
+
+    def __init__(self, students: int, teachers: int, processes: Optional[int] = None,
+                 writers: int = WRITERS, chunk_size: int = CHUNK_SIZE, seed: int = 0):
+        self.id = uuid.uuid4().hex[:12]
+        self.students = students
+        self.teachers = teachers
+        self.processes = processes or multiprocessing.cpu_count()
+        self.writers = writers
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.status = "pending"
+        self.phase: Optional[str] = None
+        self.totals: Dict[str, int] = {}
+        self.inserted: Dict[str, int] = {}
+        self.errors = 0
+        self.unplaced: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务进度(供进度查询接口返回)"""
+        with self._lock:
+            inserted = dict(self.inserted)
+        total = sum(self.totals.values())
+        done = sum(inserted.values())
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "totals": dict(self.totals),
+            "inserted": inserted,
+            "errors": self.errors,
+            "unplaced_courses": list(self.unplaced),
+            "progress": round(done / total, 4) if total else 0.0,
+            "elapsed_seconds": round(elapsed, 2),
+            "docs_per_second": round(done / elapsed) if elapsed else 0,
+            "error": self.error,
+        }
+
+    def start(self) -> "SeedJob":
+        """在后台线程中开始执行"""
+        self._thread = threading.Thread(target=self.run, name=f"seed-{self.id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """等待任务结束"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _record(self, collection: str, inserted: int, failed: int = 0) -> None:
+        with self._lock:
+            self.inserted[collection] = self.inserted.get(collection, 0) + inserted
+            self.errors += failed
+
+    def _insert(self, db, collection: str, docs: List[Dict[str, Any]]) -> None:
+        # ordered=False: 服务端可以并行处理一个批次，个别文档失败不影响其余文档
+        try:
+            result = db[collection].insert_many(docs, ordered=False)
+            self._record(collection, len(result.inserted_ids))
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            self._record(collection, inserted, len(docs) - inserted)
+
+    def run(self, db=None) -> None:
+        """执行初始化(阻塞直到完成)，db默认为database中的同步客户端"""
+        from database import (
+            db as default_db, create_indexes, STUDENTS_COLLECTION, TEACHERS_COLLECTION, COURSES_COLLECTION,
+            SCHEDULES_COLLECTION, DEPARTMENTS_COLLECTION, CLASSROOMS_COLLECTION
+        )
+        db = db if db is not None else default_db
+        self.started_at = time.time()
+        self.status = "running"
+        try:
+            # 体量小的集合在当前进程生成
+            departments = generate_departments()
+            classrooms = generate_classrooms()
+            teachers, courses = assign_courses_to_teachers(generate_teachers(self.teachers), generate_courses())
+            timetable = solve_timetable(courses, classrooms, generate_time_slots(), seed=self.seed)
+            schedules = timetable["schedules"]
+            self.unplaced = timetable["unplaced"]
+            small = {
+                DEPARTMENTS_COLLECTION: departments,
+                CLASSROOMS_COLLECTION: classrooms,
+                TEACHERS_COLLECTION: teachers,
+                COURSES_COLLECTION: courses,
+                SCHEDULES_COLLECTION: schedules,
+            }
+            self.totals = {STUDENTS_COLLECTION: self.students, **{name: len(docs) for name, docs in small.items()}}
+
+            self.phase = "drop"
+            for name in self.totals:
+                db.drop_collection(name)
+
+            # 删除集合之后接口新建或删除的排课不在schedules中，载入冲突索引时由loading()合并
+            with conflict_index.loading():
+                self.phase = "generate"
+                with ThreadPoolExecutor(self.writers, thread_name_prefix=f"seed-writer-{self.id}") as writers:
+                    pending = set()
+
+                    def submit(name, docs):
+                        # 正在写入的数据块不超过写入线程数的两倍，生成快于写入时在这里等待
+                        while len(pending) >= self.writers * 2:
+                            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                pending.discard(future)
+                                future.result()
+                        pending.add(writers.submit(self._insert, db, name, docs))
+
+                    for name, docs in small.items():
+                        if docs:
+                            submit(name, docs)
+                    self._generate_students(lambda docs: submit(STUDENTS_COLLECTION, docs))
+                    for future in pending:
+                        future.result()
+
+                self.phase = "index"
+                create_indexes()
+                # 排课集合已重建(insert_many为每条排课填好了_id)，重新载入服务进程内的排课冲突索引
+                conflict_index.load(schedules)
+            self.status = "done"
+        except Exception as e:
+            self.status = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.finished_at = time.time()
+
+    def _generate_students(self, emit) -> None:
+        chunks = ((start, min(self.chunk_size, self.students - start))
+                  for start in range(0, self.students, self.chunk_size))
+        if self.processes <= 1:
+            for start, count in chunks:
+                emit(generate_student_chunk(start, count, self.seed))
+            return
+        # spawn: 服务进程中已有数据库客户端的后台线程，不fork带线程的进程
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.processes, mp_context=context) as pool:
+            # 按顺序取回结果，同时在途的数据块不超过进程数的两倍
+            in_flight = deque()
+            for start, count in chunks:
+                in_flight.append(pool.submit(generate_student_chunk, start, count, self.seed))
+                if len(in_flight) >= self.processes * 2:
+                    emit(in_flight.popleft().result())
+            while in_flight:
+                emit(in_flight.popleft().result())
+
+
+# 任务编号到任务的映射
+_jobs: Dict[str, SeedJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def start_seed_job(students: int = 20000, teachers: int = 200, **kwargs) -> SeedJob:
+    """
+    开始一次后台数据初始化
+
+    Args:
+        students: 学生数
+        teachers: 教师数
+        **kwargs: 传给SeedJob的其他参数(processes、writers、chunk_size、seed)
+
+    Returns:
+        SeedJob: 已开始执行的任务
+
+    Raises:
+        RuntimeError: 已有初始化任务正在执行
+    """
+    with _jobs_lock:
+        if any(job.status in ("pending", "running") for job in _jobs.values()):
+            raise RuntimeError("已有数据初始化任务正在执行")
+        job = SeedJob(students, teachers, **kwargs)
+        _jobs[job.id] = job
+    return job.start()
+
+
+def get_seed_job(job_id: str) -> Optional[SeedJob]:
+    """按编号查找初始化任务"""
+    return _jobs.get(job_id)
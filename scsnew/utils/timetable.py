@@ -0,0 +1,174 @@
+"""
+排课求解
+
+每个教师和每间教室的占用情况用一个整数位集表示，第i位对应第i个上课时间段，
+查找教师和教室同时空闲的时间段只需一次按位与。课程按约束从强到弱的顺序排(能容纳的教室少、
+教师课多的先排)，教室按容量从小到大选第一间能容纳上课人数且有空的，把大教室留给大班。
+某门课找不到位置时做一层回溯: 把挡住它的那门课挪到别处，仍然排不下的课程连同原因一起返回。
+"""
+import random
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+# 一门课找不到位置时最多尝试挪动其他课程的次数
+MAX_REPAIRS = 64
+
+
+def _pick(free: int, offset: int) -> int:
+    # 取free中从offset开始的第一个空闲时间段，没有则回到开头，让课程分散在一周中
+    high = free >> offset
+    if high:
+        return offset + (high & -high).bit_length() - 1
+    return (free & -free).bit_length() - 1
+
+
+def solve_timetable(courses: List[Dict[str, Any]], classrooms: List[Dict[str, Any]],
+                    time_slots: List[Dict[str, Any]], seed: Optional[int] = None,
+                    max_repairs: int = MAX_REPAIRS) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    为每门课程安排一个时间段和教室
+
+    同一教师、同一教室在同一时间段只能有一门课，教室容量不能小于课程的class_size(未指定时不限)。
+
+    Args:
+        courses: 课程列表，需要name、teacher_id，可选class_size
+        classrooms: 教室列表，需要id、capacity
+        time_slots: 时间段列表，每项包含day_of_week、start_time、end_time，时间段之间互不重叠
+        seed: 随机种子，决定课程在一周中的分布
+        max_repairs: 一门课排不下时最多尝试挪动其他课程的次数
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: schedules为排课列表，
+        unplaced为排不下的课程列表，每项包含course_id和reason
+
+    Examples:
+        >>> result = solve_timetable(courses, classrooms, generate_time_slots())
+        >>> len(result['schedules']), result['unplaced'][:1]
+    """
+    rng = random.Random(seed)
+    slot_count = len(time_slots)
+    full = (1 << slot_count) - 1
+    rooms = sorted(classrooms, key=lambda room: room["capacity"])
+    capacities = [room["capacity"] for room in rooms]
+
+    room_busy = [0] * len(rooms)
+    room_course: List[List[Optional[int]]] = [[None] * slot_count for _ in rooms]
+    teacher_busy: Dict[str, int] = {}
+    teacher_course: Dict[Tuple[str, int], int] = {}
+    placement: List[Optional[Tuple[int, int]]] = [None] * len(courses)
+    # 还有空闲时间段的教室(按容量排序的下标)，满了的教室不再扫描
+    open_rooms = list(range(len(rooms)))
+
+    unplaced = []
+    first_room = [0] * len(courses)
+    load: Dict[str, int] = {}
+    todo = []
+    for ci, course in enumerate(courses):
+        teacher_id = course.get("teacher_id")
+        if not teacher_id:
+            unplaced.append({"course_id": course["name"], "reason": "未分配教师"})
+            continue
+        size = course.get("class_size") or 0
+        first_room[ci] = bisect_left(capacities, size)
+        if first_room[ci] == len(rooms):
+            unplaced.append({"course_id": course["name"], "reason": f"没有能容纳{size}人的教室"})
+            continue
+        load[teacher_id] = load.get(teacher_id, 0) + 1
+        todo.append(ci)
+    # 可选教室少的先排，教室数相同时教师课多的先排
+    todo.sort(key=lambda ci: (len(rooms) - first_room[ci], -load[courses[ci]["teacher_id"]]))
+
+    def place(ci: int, slot: int, r: int) -> None:
+        teacher_id = courses[ci]["teacher_id"]
+        bit = 1 << slot
+        teacher_busy[teacher_id] = teacher_busy.get(teacher_id, 0) | bit
+        teacher_course[(teacher_id, slot)] = ci
+        room_busy[r] |= bit
+        room_course[r][slot] = ci
+        placement[ci] = (slot, r)
+        if room_busy[r] == full:
+            del open_rooms[bisect_left(open_rooms, r)]
+
+    def unplace(ci: int) -> Tuple[int, int]:
+        slot, r = placement[ci]
+        teacher_id = courses[ci]["teacher_id"]
+        if room_busy[r] == full:
+            insort(open_rooms, r)
+        bit = 1 << slot
+        teacher_busy[teacher_id] &= ~bit
+        del teacher_course[(teacher_id, slot)]
+        room_busy[r] &= ~bit
+        room_course[r][slot] = None
+        placement[ci] = None
+        return slot, r
+
+    def find(ci: int) -> Optional[Tuple[int, int]]:
+        teacher_free = full & ~teacher_busy.get(courses[ci]["teacher_id"], 0)
+        if not teacher_free:
+            return None
+        i = bisect_left(open_rooms, first_room[ci])
+        while i < len(open_rooms):
+            r = open_rooms[i]
+            free = teacher_free & ~room_busy[r]
+            if free:
+                return _pick(free, rng.randrange(slot_count)), r
+            i += 1
+        return None
+
+    def repair(ci: int) -> bool:
+        # 找只被一门课挡住的(时间段, 教室): 教师有空但教室被占，或教室有空但教师在上另一门课。
+        # 把挡路的课挪走后让出位置，挡路的课找不到新位置就还原
+        teacher_id = courses[ci]["teacher_id"]
+        teacher_free = full & ~teacher_busy.get(teacher_id, 0)
+        attempts = 0
+        for r in range(first_room[ci], len(rooms)):
+            candidates = (teacher_free & room_busy[r]) | (full & ~teacher_free & ~room_busy[r])
+            while candidates:
+                low = candidates & -candidates
+                candidates ^= low
+                slot = low.bit_length() - 1
+                blocker = room_course[r][slot]
+                if blocker is None:
+                    blocker = teacher_course[(teacher_id, slot)]
+                old = unplace(blocker)
+                place(ci, slot, r)
+                spot = find(blocker)
+                if spot is not None:
+                    place(blocker, *spot)
+                    return True
+                unplace(ci)
+                place(blocker, *old)
+                attempts += 1
+                if attempts >= max_repairs:
+                    return False
+        return False
+
+    for ci in todo:
+        spot = find(ci)
+        if spot is not None:
+            place(ci, *spot)
+            continue
+        teacher_id = courses[ci]["teacher_id"]
+        if teacher_busy.get(teacher_id, 0) == full:
+            reason = f"教师{teacher_id}没有空闲时间段"
+        elif repair(ci):
+            continue
+        else:
+            reason = "没有教师和教室同时空闲的时间段"
+        unplaced.append({"course_id": courses[ci]["name"], "reason": reason})
+
+    schedules = []
+    for ci, spot in enumerate(placement):
+        if spot is None:
+            continue
+        slot, r = spot
+        course = courses[ci]
+        schedules.append({
+            "course_id": course["name"],
+            "teacher_id": course["teacher_id"],
+            "classroom": rooms[r]["id"],
+            "day_of_week": time_slots[slot]["day_of_week"],
+            "start_time": time_slots[slot]["start_time"],
+            "end_time": time_slots[slot]["end_time"]
+        })
+    return {"schedules": schedules, "unplaced": unplaced}
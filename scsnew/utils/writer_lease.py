@@ -0,0 +1,93 @@
+"""
+排课写入租约
+
+冲突索引只保存在当前进程内存中，其他进程写入的排课(例如开始时间不同但时间重叠)在这里看不到，
+因此同一个数据库只能由一个服务进程写入排课。租约是数据库中的一条文档，记录持有者和到期时间，
+到期时间按数据库服务器的时钟计算。持有者定期续期；其他进程(多个uvicorn worker或多台机器)
+在租约到期前无法取得租约，启动时直接失败，写入排课时返回503。
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import DuplicateKeyError
+
+# 租约有效期(秒)，持有者每隔三分之一有效期续期一次
+LEASE_SECONDS = 30
+
+
+class WriterLease:
+    """
+    数据库中的独占写入租约
+
+    Attributes:
+        name: 租约文档的_id
+        seconds: 有效期(秒)
+        owner: 本进程的持有者标识(主机名:进程号:随机串)
+    """
+
+    def __init__(self, name: str, seconds: int = LEASE_SECONDS):
+        self.name = name
+        self.seconds = seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # 本地保守估计的到期时刻(time.monotonic)，早于数据库中记录的到期时间
+        self._deadline = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def remaining(self) -> float:
+        """租约剩余的秒数，未持有时为0"""
+        return max(0.0, self._deadline - time.monotonic())
+
+    async def acquire(self, collection: AsyncIOMotorCollection) -> bool:
+        """
+        取得或续期租约
+
+        Returns:
+            bool: 此前本进程的租约已经失效(首次取得或没有及时续期)时返回True，
+            期间其他进程可能写入过排课，调用方应重新载入冲突索引
+
+        Raises:
+            RuntimeError: 租约由其他进程持有且尚未到期
+        """
+        start = time.monotonic()
+        lapsed = start >= self._deadline
+        try:
+            # 文档不存在、属于本进程或已到期时更新；属于其他进程且未到期时upsert插入同一_id失败
+            await collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"$expr": {"$lt": ["$expires_at", "$$NOW"]}}]},
+                [{"$set": {"owner": self.owner, "expires_at": {"$add": ["$$NOW", self.seconds * 1000]}}}],
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            self._deadline = 0.0
+            holder = await collection.find_one({"_id": self.name}) or {}
+            raise RuntimeError(f"排课写入租约由{holder.get('owner')}持有，同一数据库只能由一个服务进程写入排课")
+        self._deadline = start + self.seconds
+        return lapsed
+
+    def keep(self, collection: AsyncIOMotorCollection, on_lapse: Callable[[], None]) -> None:
+        """在当前事件循环中启动定期续期任务，续期时发现租约曾经失效则调用on_lapse"""
+        async def renew():
+            while True:
+                await asyncio.sleep(self.seconds / 3)
+                try:
+                    if await self.acquire(collection):
+                        on_lapse()
+                except Exception:
+                    # 续期失败(数据库不可用或租约已被其他进程取得)时remaining()会降到0，写入请求返回503
+                    continue
+
+        if self._task is None:
+            self._task = asyncio.create_task(renew(), name=f"lease-{self.name}")
+
+    async def release(self, collection: AsyncIOMotorCollection) -> None:
+        """停止续期并释放租约(服务关闭时调用)，其他进程无需等待到期即可取得"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._deadline = 0.0
+        await collection.delete_one({"_id": self.name, "owner": self.owner})
@@ -2,7 +2,26 @@ from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 from enum import Enum
+import importlib.util
+import os
 import re
+import sys
+
+
+def _load_validators():
+    # 与用户管理库共用仓库根目录下user_validators的预编译规则。
+    # 按文件路径加载，不把仓库根目录加入sys.path: 根目录下的html.py、abc.py会遮蔽同名的标准库模块
+    module = sys.modules.get('user_validators')
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'user_validators.py')
+        spec = importlib.util.spec_from_file_location('user_validators', path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['user_validators'] = module
+        spec.loader.exec_module(module)
+    return module.validators
+
+
+validators = _load_validators()
 
 class Gender(str, Enum):
     MALE = "male"
@@ -22,7 +41,7 @@ class UserBase(BaseModel):
 
     @field_validator('phone')
     def validate_phone(cls, v):
-        if not re.match(r'^1[3-9]\d{9}$', v):  # 简单的中国手机号验证
+        if not validators.check('cn_mobile', v):  # 简单的中国手机号验证
             raise ValueError('Invalid phone number format')
         return v
 
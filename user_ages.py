@@ -0,0 +1,86 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence
+
+# 成年的最小年龄
+ADULT_AGE = 18
+# 年龄分段的下界(含)，最后一段无上界
+AGE_BUCKET_EDGES = (0, 18, 25, 35, 45, 60)
+# 年龄缺失的用户归入的分段
+UNKNOWN_AGE_BUCKET = '未知'
+
+
+def age_value(age) -> Optional[int]:
+    """
+    取出有效的年龄
+
+    所有统计(成年判断、年龄计数器、年龄分段、批量统计和列式快照)都按这一规则处理年龄:
+    只有非负整数是有效年龄，None、浮点数、字符串、布尔值和负数都视为缺失。
+
+    Args:
+        age: 用户字典中的age字段
+
+    Returns:
+        Optional[int]: 有效年龄，缺失或无效时为None
+    """
+    if type(age) is int and age >= 0:
+        return age
+    return None
+
+
+def age_bucket_labels(edges: Sequence[int] = AGE_BUCKET_EDGES) -> List[str]:
+    """
+    生成年龄分段的名称
+
+    Args:
+        edges: 各分段的下界
+
+    Returns:
+        List[str]: 如['0-17', '18-24', ..., '60+']
+    """
+    labels = [f'{low}-{high - 1}' for low, high in zip(edges, edges[1:])]
+    labels.append(f'{edges[-1]}+')
+    return labels
+
+
+_AGE_LABELS = age_bucket_labels(AGE_BUCKET_EDGES)
+
+
+def age_bucket_of(age) -> str:
+    """
+    年龄所属的分段名称，分段与count_users_per_age_bucket一致
+
+    Args:
+        age: 年龄
+
+    Returns:
+        str: 如'18-24'，年龄缺失或无效时为'未知'
+    """
+    age = age_value(age)
+    if age is None or age < AGE_BUCKET_EDGES[0]:
+        return UNKNOWN_AGE_BUCKET
+    return _AGE_LABELS[bisect_right(AGE_BUCKET_EDGES, age) - 1]
+
+
+def count_age_buckets(ages, edges: Sequence[int] = AGE_BUCKET_EDGES) -> Dict[str, int]:
+    """
+    逐个统计年龄分段(不依赖numpy)
+
+    Args:
+        ages: 年龄序列，缺失的年龄为None或负数
+        edges: 各分段的下界
+
+    Returns:
+        Dict[str, int]: 分段名称到用户数量的映射，缺失年龄计入'未知'
+    """
+    labels = age_bucket_labels(edges)
+    result = dict.fromkeys(labels, 0)
+    result[UNKNOWN_AGE_BUCKET] = 0
+    for age in ages:
+        if age is None or age < edges[0]:
+            result[UNKNOWN_AGE_BUCKET] += 1
+            continue
+        index = len(edges) - 1
+        while age < edges[index]:
+            index -= 1
+        result[labels[index]] += 1
+    return result
@@ -0,0 +1,184 @@
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时调用方退回逐个用户统计
+    np = None
+
+from user_ages import (ADULT_AGE, AGE_BUCKET_EDGES, UNKNOWN_AGE_BUCKET, age_bucket_labels, age_value,
+                       count_age_buckets)
+from user_snapshot import PRESENT, UserSnapshot, _contains_chinese, _domain_of
+
+HAS_NUMPY = np is not None
+
+# 性别编码: 0其他/缺失, 1男, 2女
+_GENDER_CODES = {'male': 1, 'female': 2}
+
+
+class BatchStats:
+    """
+    基于NumPy数组的批量用户统计
+
+    把年龄、性别和邮箱域名编码各存为一个数组，成年/未成年×性别交叉表、
+    域名直方图和年龄分段都用向量运算一次算出，返回结构与
+    user_management_full中对应函数相同。
+
+    Attributes:
+        rows: 用户数量
+        ages: 年龄数组，缺失为-1
+        genders: 性别编码数组
+        domain_codes: 邮箱域名编码数组
+        domain_table: 域名编码到域名的映射列表，空字符串表示无效邮箱
+        chinese: 用户名含中文字符的标记数组
+    """
+
+    def __init__(self, ages, genders, domain_codes, domain_table: List[str], chinese):
+        if np is None:
+            raise ImportError('批量统计需要安装numpy')
+        self.ages = ages
+        self.genders = genders
+        self.domain_codes = domain_codes
+        self.domain_table = domain_table
+        self.chinese = chinese
+        self.rows = len(ages)
+
+    @classmethod
+    def from_users(cls, user_list: List[Dict]) -> 'BatchStats':
+        """
+        从用户字典列表构建统计数组
+
+        Args:
+            user_list: 用户列表
+
+        Returns:
+            BatchStats: 批量统计对象
+        """
+        if np is None:
+            raise ImportError('批量统计需要安装numpy')
+        count = len(user_list)
+        domain_index: Dict[str, int] = {}
+
+        def age_of(user):
+            age = age_value(user.get('age'))
+            return -1 if age is None else age
+
+        def domain_of(user):
+            domain = _domain_of(user.get('email') or '')
+            return domain_index.setdefault(domain, len(domain_index))
+
+        ages = np.fromiter((age_of(u) for u in user_list), dtype=np.int64, count=count)
+        genders = np.fromiter((_GENDER_CODES.get((u.get('gender') or '').lower(), 0) for u in user_list),
+                              dtype=np.int8, count=count)
+        domain_codes = np.fromiter((domain_of(u) for u in user_list), dtype=np.int64, count=count)
+        chinese = np.fromiter((_contains_chinese(u.get('username') or '') for u in user_list),
+                              dtype=np.bool_, count=count)
+        return cls(ages, genders, domain_codes, list(domain_index), chinese)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: UserSnapshot) -> 'BatchStats':
+        """
+        直接在列式快照的内存映射上构建统计数组
+
+        Args:
+            snapshot: 已打开的用户快照
+
+        Returns:
+            BatchStats: 批量统计对象
+        """
+        if np is None:
+            raise ImportError('批量统计需要安装numpy')
+        ages = np.frombuffer(snapshot.values('age'), dtype=np.int32)
+        age_states = snapshot.states('age')
+        if age_states is not None:
+            ages = np.where(np.frombuffer(age_states, dtype=np.uint8) == PRESENT, ages, -1)
+
+        lookup = np.array([_GENDER_CODES.get(value.lower(), 0) for value in snapshot.table('gender')] or [0],
+                          dtype=np.int8)
+        genders = lookup[np.frombuffer(snapshot.values('gender'), dtype=np.uint32)]
+        gender_states = snapshot.states('gender')
+        if gender_states is not None:
+            genders[np.frombuffer(gender_states, dtype=np.uint8) != PRESENT] = 0
+
+        domain_codes = np.frombuffer(snapshot.domain_codes(), dtype=np.uint32)
+        chinese = np.frombuffer(snapshot.chinese_flags(), dtype=np.uint8).astype(np.bool_)
+        return cls(ages, genders, domain_codes, snapshot.domain_table(), chinese)
+
+    def _adult_mask(self):
+        return self.ages >= ADULT_AGE
+
+    def count_adults(self) -> int:
+        """统计成年用户数量"""
+        return int(np.count_nonzero(self._adult_mask()))
+
+    def count_minors(self) -> int:
+        """统计未成年用户数量"""
+        return self.rows - self.count_adults()
+
+    def gender_distribution(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取性别分布统计(按成年/未成年分组)
+
+        Returns:
+            Dict: 结构为{'adults': {'male': x, 'female': y}, 'minors': {'male': a, 'female': b}}
+        """
+        cells = np.bincount(self._adult_mask().astype(np.int64) * 3 + self.genders, minlength=6)
+        return {
+            'adults': {gender: int(cells[3 + code]) for gender, code in _GENDER_CODES.items()},
+            'minors': {gender: int(cells[code]) for gender, code in _GENDER_CODES.items()}
+        }
+
+    def domain_counts(self) -> Dict[str, int]:
+        """
+        统计每个域名的用户数量
+
+        Returns:
+            Dict[str, int]: 域名到用户数量的映射字典
+        """
+        counts = np.bincount(self.domain_codes, minlength=len(self.domain_table))
+        return {domain: int(count) for domain, count in zip(self.domain_table, counts)
+                if domain and count}
+
+    def count_chinese(self) -> int:
+        """统计用户名包含中文字符的用户数量"""
+        return int(np.count_nonzero(self.chinese))
+
+    def age_buckets(self, edges: Sequence[int] = AGE_BUCKET_EDGES) -> Dict[str, int]:
+        """
+        统计各年龄分段的用户数量
+
+        Args:
+            edges: 各分段的下界
+
+        Returns:
+            Dict[str, int]: 分段名称到用户数量的映射，缺失年龄计入'未知'
+        """
+        return _bucket_ages(self.ages, edges)
+
+
+def _bucket_ages(ages, edges: Sequence[int]) -> Dict[str, int]:
+    # ages为年龄数组，缺失为-1
+    known = ages >= edges[0]
+    buckets = np.searchsorted(np.asarray(edges), ages[known], side='right') - 1
+    counts = np.bincount(buckets, minlength=len(edges))
+    result = {label: int(count) for label, count in zip(age_bucket_labels(edges), counts)}
+    result[UNKNOWN_AGE_BUCKET] = len(ages) - int(np.count_nonzero(known))
+    return result
+
+
+def age_buckets_for(user_list: List[Dict], edges: Optional[Sequence[int]] = None) -> Dict[str, int]:
+    """
+    统计用户列表的年龄分段，有numpy时只构建年龄一列并向量化分段
+
+    Args:
+        user_list: 用户列表
+        edges: 各分段的下界，默认为AGE_BUCKET_EDGES
+
+    Returns:
+        Dict[str, int]: 分段名称到用户数量的映射
+    """
+    edges = edges or AGE_BUCKET_EDGES
+    ages = (age_value(u.get('age')) for u in user_list)
+    if HAS_NUMPY:
+        return _bucket_ages(np.fromiter((-1 if age is None else age for age in ages), dtype=np.int64,
+                                        count=len(user_list)), edges)
+    return count_age_buckets(ages, edges)
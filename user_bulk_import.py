@@ -0,0 +1,210 @@
+import csv
+import json
+import multiprocessing
+import os
+from itertools import chain, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from user_password import IMPORT_ITERATIONS, hash_password, is_hashed
+from user_validators import validators
+
+# 每个任务交给工作进程的行数
+CHUNK_SIZE = 5000
+# 行数少于该值时不启动进程池，直接在当前进程校验
+MIN_PARALLEL_ROWS = 20000
+
+# 原始行: 用户字典 / JSONL文本行 / CSV字段列表
+RawRow = Union[Dict, str, List[str]]
+
+
+def _normalize(raw: RawRow, header: Optional[List[str]]) -> Tuple[str, Optional[Dict], Optional[str]]:
+    """
+    解析并校验一行数据
+
+    明文密码通过强度校验后按IMPORT_ITERATIONS计算哈希，明文不离开工作进程；
+    已经是哈希的密码(如从其他实例导出的数据)原样保留。
+
+    Returns:
+        Tuple: (用户名, 规范化后的用户字典, None) 或 (用户名, None, 错误消息)
+    """
+    check_username = validators.get('username')
+    check_email = validators.get('email')
+    check_phone = validators.get('phone')
+    check_password = validators.get('strong_password')
+
+    if isinstance(raw, str):
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            return '', None, 'JSON格式错误'
+        if not isinstance(row, dict):
+            return '', None, 'JSON行必须是对象'
+    elif isinstance(raw, dict):
+        row = raw
+    else:
+        row = dict(zip(header, raw))
+
+    username = row.get('username') or ''
+    name = username if isinstance(username, str) else str(username)
+    password = row.get('password') or ''
+    email = row.get('email') or ''
+    phone = row.get('phone') or row.get('mobile') or ''
+
+    if not username or not password or not email or not phone:
+        return name, None, '所有必填字段不能为空'
+    if not isinstance(username, str) or not check_username(username):
+        return name, None, '用户名格式无效(4-20位字母数字下划线)'
+    if not isinstance(email, str) or not check_email(email):
+        return name, None, '邮箱格式无效'
+    phone = str(phone)
+    if not check_phone(phone):
+        return name, None, '手机号格式无效(需要11位数字)'
+    hashed = isinstance(password, str) and is_hashed(password)
+    if not hashed and (not isinstance(password, str) or not check_password(password)):
+        return name, None, '密码强度不足(需8位以上，包含大小写字母和数字)'
+
+    age = row.get('age')
+    if age == '':
+        age = None
+    if age is not None and type(age) is not int:
+        try:
+            age = int(age)
+        except (TypeError, ValueError):
+            return name, None, '年龄必须是整数'
+
+    user = {
+        'username': username,
+        'password': password if hashed else hash_password(password, IMPORT_ITERATIONS),
+        'email': email,
+        'mobile': phone,
+        'age': age,
+        'gender': row.get('gender') or None,
+        'nickname': row.get('nickname') or None,
+    }
+    for key, value in row.items():
+        if key not in user and key not in ('id', 'phone'):
+            user[key] = value
+    return name, user, None
+
+
+def _validate_chunk(task: Tuple[int, Optional[List[str]], List[RawRow]]) -> List[Tuple]:
+    # 工作进程入口，返回(行号, 用户名, 用户字典, 错误消息)列表
+    start, header, raws = task
+    return [(start + offset,) + _normalize(raw, header) for offset, raw in enumerate(raws)]
+
+
+def read_rows(filename: str, fmt: Optional[str] = None) -> Tuple[Optional[List[str]], Iterator[RawRow]]:
+    """
+    按格式读取导入文件的原始行
+
+    JSONL的行原样交给工作进程解析，CSV在当前进程拆分字段后再分发。
+
+    Args:
+        filename: 导入文件路径
+        fmt: 文件格式(csv/jsonl/json)，默认按扩展名判断
+
+    Returns:
+        Tuple: (CSV表头或None, 原始行迭代器)
+    """
+    fmt = fmt or os.path.splitext(filename)[1].lstrip('.').lower()
+    if fmt == 'csv':
+        f = open(filename, 'r', encoding='utf-8', newline='')
+        reader = csv.reader(f)
+        header = next(reader, [])
+
+        def csv_rows():
+            with f:
+                yield from reader
+        return header, csv_rows()
+    if fmt == 'jsonl':
+        def jsonl_rows():
+            with open(filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield line
+        return None, jsonl_rows()
+    if fmt == 'json':
+        from user_loader import iter_users
+        return None, iter_users(filename)
+    raise ValueError(f'不支持的导入格式: {fmt}')
+
+
+def _chunks(rows: Iterable[RawRow], header: Optional[List[str]], chunk_size: int):
+    it = iter(rows)
+    start = 1
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield start, header, chunk
+        start += len(chunk)
+
+
+def bulk_register(
+    store,
+    rows: Iterable[RawRow],
+    header: Optional[List[str]] = None,
+    processes: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    on_insert: Optional[Callable[[Dict], None]] = None
+) -> Dict[str, Union[int, List]]:
+    """
+    批量校验并注册用户
+
+    格式校验和密码哈希在进程池中并行执行(使用user_validators中预编译的规则)，用户名唯一性在当前进程按行序
+    通过存储的用户名哈希索引检查，通过的用户加入store并同步更新索引和统计。
+
+    Args:
+        store: 目标UserStore
+        rows: 原始行(用户字典、JSONL文本行或CSV字段列表)
+        header: CSV表头，rows为字段列表时必填
+        processes: 工作进程数，默认为CPU核数；为1时不启动进程池
+        chunk_size: 每个任务的行数
+        on_insert: 每个用户加入store后调用(仍持有该用户名的分段锁)，用于按顺序发布注册事件
+
+    Returns:
+        Dict: 导入结果，结构为:
+        {
+            'total': int,       # 处理的行数
+            'accepted': List,   # 注册成功的用户记录(UserRecord)
+            'errors': List      # 每个失败行的{'row': 行号, 'username': 用户名, 'message': 错误消息}
+        }
+    """
+    rows = iter(rows)
+    head = list(islice(rows, MIN_PARALLEL_ROWS))
+    tasks = _chunks(chain(head, rows), header, chunk_size)
+    processes = processes or os.cpu_count() or 1
+
+    pool = None
+    if len(head) == MIN_PARALLEL_ROWS and processes > 1:
+        # 数据量足够大时才并行，小批量导入省去进程启动开销
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_validate_chunk, tasks)
+    else:
+        results = map(_validate_chunk, tasks)
+
+    accepted = []
+    errors = []
+    total = 0
+    try:
+        for chunk in results:
+            for row_no, username, user, message in chunk:
+                total += 1
+                if user is None:
+                    errors.append({'row': row_no, 'username': username, 'message': message})
+                    continue
+                # 存储的用户名索引本身就是哈希集合，本批次已接受的用户也已加入其中；
+                # insert对同一用户名的查重和加入是原子的，可与其他线程的注册并发
+                with store.locks.lock_for(username):
+                    record = store.insert(user)
+                    if record is not None and on_insert is not None:
+                        on_insert(record)
+                if record is None:
+                    errors.append({'row': row_no, 'username': username, 'message': '用户名已被使用'})
+                    continue
+                accepted.append(record)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return {'total': total, 'accepted': accepted, 'errors': errors}
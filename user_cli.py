@@ -1,16 +1,52 @@
 # -*- coding: utf-8 -*-
 import argparse
-from user_management_full import (
-    register_user, login, change_password,
-    count_adults, count_minors, get_gender_distribution,
-    count_users_with_chinese_chars, get_usernames_with_chinese,
-    count_users_per_domain
-)
-
-def main():
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Dict, List, Optional
+
+
+
+def _default_socket_path() -> str:
+    # 每个用户单独的套接字: 优先放在$XDG_RUNTIME_DIR(只有本人可访问)，
+    # 否则放在临时目录下按uid命名、权限为0700的子目录中，其他用户无法抢先创建或连接
+    if os.environ.get('USER_CLI_SOCKET'):
+        return os.environ['USER_CLI_SOCKET']
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'user_cli.sock')
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), f'user_cli-{uid}', 'user_cli.sock')
+
+
+# 守护进程监听的Unix套接字路径
+SOCKET_PATH = _default_socket_path()
+# 连接守护进程的超时秒数，超时后在当前进程执行
+CONNECT_TIMEOUT = 1.0
+# 等待守护进程返回结果的超时秒数，超时后报错(命令可能已经执行，不在当前进程重复执行)
+RESPONSE_TIMEOUT = float(os.environ.get('USER_CLI_TIMEOUT', '60'))
+# stats cube的维度(与user_cube.DIMENSIONS一致，这里不导入以免拖慢启动)
+CUBE_DIMENSIONS = ['age', 'gender', 'domain', 'company', 'region']
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description='用户管理系统命令行接口')
+    parser.add_argument('--local', action='store_true', help='不转发给守护进程，直接在当前进程执行')
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
 
+    # 守护进程命令
+    serve_parser = subparsers.add_parser('serve', help='启动守护进程，常驻内存保存数据和索引')
+    serve_parser.add_argument('-s', '--socket', default=SOCKET_PATH, help='Unix套接字路径')
+
     # 注册命令
     register_parser = subparsers.add_parser('register', help='注册新用户')
     register_parser.add_argument('-u', '--username', required=True, help='用户名(4-20位字母数字下划线)')
@@ -32,18 +68,34 @@ def main():
     change_pwd_parser.add_argument('-o', '--old-password', required=True, help='旧密码')
     change_pwd_parser.add_argument('-n', '--new-password', required=True, help='新密码')
 
+    # 批量导入命令
+    import_parser = subparsers.add_parser('import', help='批量导入用户(CSV/JSONL)')
+    import_parser.add_argument('-f', '--file', required=True, help='导入文件路径')
+    import_parser.add_argument('--format', choices=['csv', 'jsonl', 'json'], help='文件格式(默认按扩展名判断)')
+    import_parser.add_argument('-w', '--workers', type=int, help='校验进程数(默认为CPU核数)')
+    import_parser.add_argument('-o', '--output', help='导入成功的用户写入该JSONL文件(不含密码)')
+    import_parser.add_argument('-r', '--report', help='错误报告写入该JSONL文件')
+
+    # 搜索命令
+    search_parser = subparsers.add_parser('search', help='按用户名、姓名或昵称搜索用户')
+    search_parser.add_argument('query', help='查询字符串(不区分大小写)')
+    search_parser.add_argument('-f', '--field', choices=['username', 'name', 'nickname'],
+                               help='只在该字段中搜索(默认全部)')
+    search_parser.add_argument('--prefix', action='store_true', help='按前缀匹配(默认按子串匹配)')
+    search_parser.add_argument('-l', '--limit', type=int, default=20, help='最多显示的用户数(默认20)')
+
     # 统计命令组
     stats_parser = subparsers.add_parser('stats',
-        help='统计功能\n可用子命令:\n  age  年龄统计\n  gender   性别统计\n  ch  中文用户名统计\n  domain   邮箱域名统计')
+        help='统计功能\n可用子命令:\n  age  年龄统计\n  gender   性别统计\n  ch  中文用户名统计\n  domain   邮箱域名统计\n  check   统计一致性校验')
     stats_subparsers = stats_parser.add_subparsers(
         dest='stats_command',
         metavar='子命令',
-        help='统计子命令:\n age -t [adults|minors|all] 年龄统计\n gender 性别分布\n  ch -t [count|names] 中文用户名\n  domain -t [count|list] 邮箱域名')
+        help='统计子命令:\n age -t [adults|minors|all|buckets] 年龄统计\n gender 性别分布\n  ch -t [count|names] 中文用户名\n  domain -t [count|list|top] 邮箱域名\n  check 统计一致性校验')
 
     # 年龄统计
     age_parser = stats_subparsers.add_parser('age', help='年龄统计')
-    age_parser.add_argument('-t', '--type', choices=['adults', 'minors', 'all'], 
-                          default='all', help='统计类型(成年/未成年/全部)')
+    age_parser.add_argument('-t', '--type', choices=['adults', 'minors', 'all', 'buckets'], 
+                          default='all', help='统计类型(成年/未成年/全部/年龄段)')
 
     # 性别统计
     stats_subparsers.add_parser('gender', help='性别分布统计')
@@ -55,10 +107,35 @@ def main():
 
     # 域名统计
     domain_parser = stats_subparsers.add_parser('domain', help='邮箱域名统计')
-    domain_parser.add_argument('-t', '--type', choices=['count', 'list'], 
-                             default='count', help='统计类型(数量/列表)')
+    domain_parser.add_argument('-t', '--type', choices=['count', 'list', 'top'], 
+                             default='count', help='统计类型(数量/列表/头部域名)')
+    domain_parser.add_argument('-k', '--k', type=int, default=5, help='头部域名数量(默认5)')
+    domain_parser.add_argument('--approx', action='store_true',
+                             help='流式读取数据文件做近似统计(Space-Saving+Count-Min)，不加载用户数据')
+
+    # 多维统计立方体
+    cube_parser = stats_subparsers.add_parser('cube', help='按年龄段/性别/域名/公司/地区任意组合统计')
+    cube_parser.add_argument('-g', '--group-by', nargs='*', default=[], choices=CUBE_DIMENSIONS,
+                             help='分组维度(可多个，不指定时只统计总数)')
+    cube_parser.add_argument('-w', '--where', nargs='*', default=[], metavar='维度=取值',
+                             help='过滤条件，如 region=四川 age=18-24')
+    cube_parser.add_argument('-k', '--top', type=int, help='只显示用户数最多的前k个分组')
 
-    args = parser.parse_args()
+    # 统计一致性校验
+    stats_subparsers.add_parser('check', help='重新计算统计值并与增量计数器比较')
+
+    return parser
+
+
+def run(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """在当前进程执行一条命令，结果输出到标准输出"""
+    from user_management_full import (
+        register_user, login, change_password,
+        count_adults, count_minors, get_gender_distribution,
+        count_users_with_chinese_chars, get_usernames_with_chinese,
+        count_users_per_domain, check_stats_consistency, count_users_per_age_bucket,
+        bulk_register, search_users
+    )
 
     if args.command == 'register':
         result = register_user(
@@ -84,12 +161,48 @@ def main():
         )
         print(result)
 
+    elif args.command == 'import':
+        from user_bulk_import import read_rows
+        header, rows = read_rows(args.file, args.format)
+        start = time.perf_counter()
+        result = bulk_register(rows, header=header, processes=args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"导入完成: 共{result['total']}行, 成功{len(result['accepted'])}行, "
+              f"失败{len(result['errors'])}行, 用时{elapsed:.2f}秒 "
+              f"({result['total'] / elapsed if elapsed else 0:.0f}行/秒)")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                for user in result['accepted']:
+                    f.write(json.dumps(dict(user.public), ensure_ascii=False) + '\n')
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                for error in result['errors']:
+                    f.write(json.dumps(error, ensure_ascii=False) + '\n')
+        else:
+            for error in result['errors'][:10]:
+                print(f"第{error['row']}行 {error['username']}: {error['message']}")
+            if len(result['errors']) > 10:
+                print(f"...及其他{len(result['errors']) - 10}个错误(使用-r保存完整报告)")
+
+    elif args.command == 'search':
+        start = time.perf_counter()
+        found = search_users(args.query, field=args.field, prefix=args.prefix, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"找到{len(found)}个用户(用时{elapsed:.2f}毫秒):")
+        for user in found:
+            print(f"- {user.get('username')} 姓名: {user.get('name') or '-'} 昵称: {user.get('nickname') or '-'}")
+
     elif args.command == 'stats':
         if args.stats_command == 'age':
             if args.type == 'adults':
                 print(f"成年用户数量: {count_adults()}")
             elif args.type == 'minors':
                 print(f"未成年用户数量: {count_minors()}")
+            elif args.type == 'buckets':
+                print("各年龄段用户数量:")
+                for bucket, count in count_users_per_age_bucket().items():
+                    print(f"{bucket}: {count}")
             else:
                 print(f"成年用户: {count_adults()}, 未成年用户: {count_minors()}")
 
@@ -116,6 +229,20 @@ def main():
                 print("各域名用户数量:")
                 for domain, count in domains.items():
                     print(f"{domain}: {count}")
+            elif args.type == 'top':
+                if args.approx:
+                    from user_domains import DomainStream
+                    from user_loader import iter_users
+                    from user_management_full import DATA_FILE
+                    stream = DomainStream().update(iter_users(DATA_FILE))
+                    top, total = stream.top(args.k), stream.total
+                    print(f"用户数量最多的{args.k}个域名(近似):")
+                else:
+                    from user_management_full import get_top_domains
+                    top, total = get_top_domains(args.k), sum(count_users_per_domain().values())
+                    print(f"用户数量最多的{args.k}个域名:")
+                for domain, count in top:
+                    print(f"{domain}: {count} (占比{count / total:.1%})")
             else:
                 from user_management_full import list_unique_domains
                 domains = list_unique_domains()
@@ -123,10 +250,198 @@ def main():
                 for domain in domains:
                     print(f"- {domain}")
 
+        elif args.stats_command == 'cube':
+            from user_domains import top_k
+            from user_management_full import query_user_cube
+            where = {}
+            for condition in args.where:
+                dim, sep, value = condition.partition('=')
+                if not sep or dim not in CUBE_DIMENSIONS:
+                    parser.error(f"无效的过滤条件: {condition}(格式为维度=取值，维度可选{'/'.join(CUBE_DIMENSIONS)})")
+                where[dim] = value
+            start = time.perf_counter()
+            try:
+                cells = query_user_cube(args.group_by, where)
+            except ValueError as e:
+                parser.error(str(e))
+            elapsed = (time.perf_counter() - start) * 1000
+            if not args.group_by:
+                print(f"用户数量: {cells.get((), 0)} (用时{elapsed:.2f}毫秒)")
+            else:
+                rows = top_k(cells, args.top if args.top is not None else len(cells))
+                print(f"共{len(cells)}个分组(用时{elapsed:.2f}毫秒):")
+                for key, count in rows:
+                    print(' '.join(f"{dim}={value}" for dim, value in zip(args.group_by, key)) + f": {count}")
+
+        elif args.stats_command == 'check':
+            mismatches = check_stats_consistency()
+            if not mismatches:
+                print("统计计数器与全量计算结果一致")
+            else:
+                print("统计计数器不一致:")
+                for key, (live, fresh) in mismatches.items():
+                    print(f"{key}: 计数器={live}, 重新计算={fresh}")
+
     else:
         parser.print_help()
 
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """处理一条转发来的命令: 读取一行JSON请求，返回一行JSON结果"""
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        output = io.StringIO()
+        code = 0
+        cwd = os.getcwd()
+        try:
+            # 文件参数按客户端的工作目录解析
+            os.chdir(request.get('cwd') or cwd)
+            with redirect_stdout(output), redirect_stderr(output):
+                parser = build_parser()
+                try:
+                    args = parser.parse_args(request['argv'])
+                    if args.command == 'serve':
+                        print("守护进程已在运行")
+                        code = 1
+                    else:
+                        run(parser, args)
+                except SystemExit as e:
+                    code = e.code if isinstance(e.code, int) else 1
+                except Exception:
+                    traceback.print_exc()
+                    code = 1
+        finally:
+            os.chdir(cwd)
+        response = {'output': output.getvalue(), 'code': code}
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+def serve(socket_path: str = SOCKET_PATH) -> None:
+    """
+    启动守护进程
+
+    数据和索引只加载一次并常驻内存，命令逐条串行执行，
+    注册等修改对之后转发来的命令可见。
+
+    Args:
+        socket_path: Unix套接字路径
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        print("当前平台不支持Unix套接字，无法启动守护进程")
+        sys.exit(1)
+
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    default_path = socket_path == SOCKET_PATH and not os.environ.get('USER_CLI_SOCKET')
+    if default_path and not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, mode=0o700)
+    if default_path and not _is_private(os.stat(socket_dir)):
+        print(f"套接字目录不属于当前用户或权限过宽: {socket_dir}")
+        sys.exit(1)
+
+    if os.path.lexists(socket_path):
+        if not _is_private(os.lstat(socket_path)):
+            print(f"套接字文件不属于当前用户，拒绝使用: {socket_path}")
+            sys.exit(1)
+        if forward(['--help'], socket_path) is not None:
+            print(f"守护进程已在运行: {socket_path}")
+            sys.exit(1)
+        os.unlink(socket_path)  # 上次异常退出留下的套接字文件
+
+    from user_management_full import user_store
+    user_store.wait_loaded()
+    print(f"已加载{len(user_store.users)}个用户，监听 {socket_path}")
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # 套接字创建时即为0600，只有当前用户能连接
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, _CommandHandler)
+    finally:
+        os.umask(umask)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def _is_private(st: os.stat_result) -> bool:
+    # 属于当前用户，且组和其他用户没有任何权限
+    return st.st_uid == os.getuid() and not stat.S_IMODE(st.st_mode) & 0o077
+
+
+def forward(argv: List[str], socket_path: str = SOCKET_PATH) -> Optional[Dict]:
+    """
+    把命令转发给正在运行的守护进程
+
+    套接字文件不属于当前用户或权限过宽时不转发(命令参数中可能有密码)。
+    连接失败或连接超时(残留的套接字文件)时也返回None，由调用方在当前进程执行。
+    连接成功后守护进程可能已经执行了命令(注册、导入、修改密码等)，等待结果超时或连接中断时
+    返回错误结果而不是None，避免在本进程重复执行。
+
+    Args:
+        argv: 命令行参数
+        socket_path: Unix套接字路径
+
+    Returns:
+        Optional[Dict]: 守护进程返回的{'output': 输出, 'code': 退出码}，无法连接守护进程时返回None
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    try:
+        st = os.lstat(socket_path)
+    except OSError:
+        return None
+    if not stat.S_ISSOCK(st.st_mode) or not _is_private(st):
+        return None
+    request = {'argv': argv, 'cwd': os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(socket_path)
+        except OSError:  # 包括socket.timeout
+            return None
+        # 连接成功后守护进程可能已经执行了命令，超时或断开都不能回退到本进程重复执行
+        try:
+            sock.settimeout(RESPONSE_TIMEOUT)
+            sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+            sock.shutdown(socket.SHUT_WR)
+            data = b''.join(iter(lambda: sock.recv(65536), b''))
+        except socket.timeout:
+            return {'output': f"等待守护进程结果超时({RESPONSE_TIMEOUT}秒)，命令可能已经执行，请确认后再重试\n", 'code': 1}
+        except OSError as e:
+            return {'output': f"与守护进程的连接中断: {e}，命令可能已经执行，请确认后再重试\n", 'code': 1}
+    if not data:
+        return {'output': "守护进程没有返回结果，命令可能已经执行，请确认后再重试\n", 'code': 1}
+    return json.loads(data)
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.socket)
+        return
+
+    # 守护进程在运行时转发给它，否则在当前进程加载数据执行
+    if not args.local and args.command:
+        response = forward(argv)
+        if response is not None:
+            print(response['output'], end='')
+            if response['code']:
+                sys.exit(response['code'])
+            return
+
+    run(parser, args)
+
 if __name__ == '__main__':
     main()
 #指令示例：
-# 查询年龄分布：python user_cli.py stats age -t all
\ No newline at end of file
+# 查询年龄分布：python user_cli.py stats age -t all
+# 多维统计：python user_cli.py stats cube -g region gender -w age=25-34 -k 10
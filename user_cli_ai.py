@@ -14,20 +14,28 @@ users = [
 ]
 import json
 import re
-# 初始化用户列表
+from user_domains import count_domains, top_k
+from user_journal import UserJournal
+
+# 用户数据日志，注册和修改只追加事件，不再整体重写数据文件
+journal = None
+# 初始化用户列表(读取快照并重放日志)
 def load_users(filename='2-mocked-users.json'):
+    global journal
+    journal = UserJournal(filename)
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return journal.load()
     except FileNotFoundError:
         return []
     except json.JSONDecodeError:
         print("警告：用户数据文件格式错误，将使用空列表")
         return []
-# 保存用户数据
+# 保存用户数据(把当前用户列表压缩为新快照并清空日志)
 def save_users(users, filename='2-mocked-users.json'):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+    if journal is None or journal.filename != filename:
+        UserJournal(filename).compact(users)
+    else:
+        journal.compact(users)
 
 # 验证邮箱格式
 def is_valid_email(email):
@@ -110,7 +118,7 @@ def register_user(users):
     }
     
     users.append(new_user)
-    save_users(users)
+    journal.register(new_user)
     print(f"注册成功！欢迎 {nickname}")
     return True
 
@@ -168,7 +176,7 @@ def change_password(users, current_user):
     for i, user in enumerate(users):
         if user['username'] == current_user['username']:
             users[i]['password'] = new_password
-            save_users(users)
+            journal.update(user['username'], password=new_password)
             print("密码修改成功！")
             return True
     
@@ -241,27 +249,21 @@ def email_domain_analysis(users):
         print("暂无用户数据")
         return
     
-    domain_map = {}
-    for user in users:
-        try:
-            domain = user['email'].split('@')[-1].lower()
-            domain_map[domain] = domain_map.get(domain, 0) + 1
-        except IndexError:
-            pass
+    domain_map = count_domains(user.get('email', '') for user in users)
     
     if not domain_map:
         print("未找到有效的邮箱数据")
         return
     
-    # 按用户数排序
-    sorted_domains = sorted(domain_map.items(), key=lambda x: x[1], reverse=True)
+    # 只显示前5种类型，用堆选择代替对全部域名排序
+    top_domains = top_k(domain_map, 5)
     
     print("\n[邮箱类型分布]")
-    for domain, count in sorted_domains[:5]:  # 只显示前5种类型
+    for domain, count in top_domains:
         print(f"- {domain}: {count} 用户 (占比{count/len(users):.1%})")
     
-    if len(sorted_domains) > 5:
-        print(f"...及其他 {len(sorted_domains)-5} 种邮箱类型")
+    if len(domain_map) > 5:
+        print(f"...及其他 {len(domain_map)-5} 种邮箱类型")
 
 def main():
     users = load_users()
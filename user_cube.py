@@ -0,0 +1,224 @@
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from user_ages import age_bucket_of
+from user_snapshot import _domain_of
+
+# 立方体的维度: 年龄分段、性别、邮箱域名、公司、地区(由地址推出的省级行政区)
+DIMENSIONS = ('age', 'gender', 'domain', 'company', 'region')
+# 字段缺失或无效时的维度值
+UNKNOWN = '未知'
+# 地址不以国内省级行政区开头时的地区
+OTHER_REGION = '其他'
+# 国内省级行政区(名称均为2或3个字)，与地址前缀匹配
+PROVINCES = frozenset((
+    '北京', '天津', '上海', '重庆', '河北', '山西', '辽宁', '吉林', '黑龙江', '江苏', '浙江', '安徽',
+    '福建', '江西', '山东', '河南', '湖北', '湖南', '广东', '海南', '四川', '贵州', '云南', '陕西',
+    '甘肃', '青海', '台湾', '内蒙古', '广西', '西藏', '宁夏', '新疆', '香港', '澳门',
+))
+
+Cell = Tuple[str, ...]
+
+def region_of(address) -> str:
+    """
+    从地址推出地区
+
+    Args:
+        address: 地址，如'四川成都市'
+
+    Returns:
+        str: 省级行政区名称(如'四川')，地址缺失时为'未知'，不以国内省级行政区开头时为'其他'
+    """
+    if not isinstance(address, str) or not address.strip():
+        return UNKNOWN
+    address = address.strip()
+    for length in (3, 2):
+        if address[:length] in PROVINCES:
+            return address[:length]
+    return OTHER_REGION
+
+
+def cell_of(user: Mapping) -> Cell:
+    """
+    用户在立方体中所属的基本单元
+
+    Args:
+        user: 用户字典或记录
+
+    Returns:
+        Cell: 按DIMENSIONS顺序排列的各维度值
+    """
+    email = user.get('email')
+    gender = user.get('gender')
+    company = user.get('company')
+    return (
+        age_bucket_of(user.get('age')),
+        gender if isinstance(gender, str) and gender else UNKNOWN,
+        (_domain_of(email) if isinstance(email, str) else '') or UNKNOWN,
+        company.strip() if isinstance(company, str) and company.strip() else UNKNOWN,
+        region_of(user.get('address')),
+    )
+
+
+def _mask_of(dims: Iterable[str]) -> int:
+    mask = 0
+    for dim in dims:
+        if dim not in DIMENSIONS:
+            raise ValueError(f'不支持的维度: {dim}(可选: {", ".join(DIMENSIONS)})')
+        mask |= 1 << DIMENSIONS.index(dim)
+    return mask
+
+
+def _dims_of(mask: int) -> Tuple[str, ...]:
+    return tuple(dim for i, dim in enumerate(DIMENSIONS) if mask >> i & 1)
+
+
+def _projection(mask: int):
+    # 从基本单元取出mask中各维度的值，结果总是元组
+    positions = [i for i in range(len(DIMENSIONS)) if mask >> i & 1]
+    if not positions:
+        return lambda cell: ()
+    if len(positions) == 1:
+        index = positions[0]
+        return lambda cell: (cell[index],)
+    if len(positions) == len(DIMENSIONS):
+        return tuple
+    return itemgetter(*positions)
+
+
+class UserCube:
+    """
+    预计算的多维用户统计立方体
+
+    对DIMENSIONS的全部32种维度组合(cuboid)各维护一张单元到用户数的表，
+    注册、修改和删除用户时每张表只增减一个单元，上卷(减少分组维度)和下钻(增加分组维度)
+    都直接读取对应组合的表，查询耗时只与该组合的单元数有关，与用户总数无关。
+
+    Attributes:
+        total: 用户总数
+    """
+
+    def __init__(self, users: Optional[Iterable[Mapping]] = None):
+        # 第mask张表的键是mask中各维度的取值(按DIMENSIONS顺序)，_projections[mask]从基本单元取出这些值
+        self._projections = [_projection(mask) for mask in range(1 << len(DIMENSIONS))]
+        self._cuboids: List[Dict[Cell, int]] = [{} for _ in self._projections]
+        if users is not None:
+            # 先汇总出基本单元，其余维度组合由基本单元上卷得到，不同单元数远小于用户数
+            for cell, count in Counter(map(cell_of, users)).items():
+                self._apply(cell, count)
+
+    @property
+    def total(self) -> int:
+        """用户总数"""
+        return self._cuboids[0].get((), 0)
+
+    def _apply(self, cell: Cell, delta: int) -> None:
+        for project, cuboid in zip(self._projections, self._cuboids):
+            key = project(cell)
+            count = cuboid.get(key, 0) + delta
+            if count:
+                cuboid[key] = count
+            else:
+                del cuboid[key]
+
+    def add(self, user: Mapping) -> None:
+        """
+        计入一个用户
+
+        Args:
+            user: 用户字典或记录
+        """
+        self._apply(cell_of(user), 1)
+
+    def remove(self, user: Mapping) -> None:
+        """
+        移除一个已计入的用户(按其当前字段值)
+
+        Args:
+            user: 用户字典或记录
+        """
+        self._apply(cell_of(user), -1)
+
+    def cuboid(self, dims: Sequence[str]) -> Dict[Cell, int]:
+        """
+        某个维度组合的全部单元
+
+        Args:
+            dims: 分组维度
+
+        Returns:
+            Dict[Cell, int]: 单元(按dims顺序排列的维度值)到用户数的映射
+        """
+        return self.query(group_by=dims)
+
+    def query(self, group_by: Sequence[str] = (), where: Optional[Dict[str, str]] = None) -> Dict[Cell, int]:
+        """
+        按维度分组统计用户数，可同时按其他维度的取值切片
+
+        Args:
+            group_by: 分组维度，结果的键按此顺序排列维度值
+            where: 维度到取值的过滤条件，如{'region': '北京'}
+
+        Returns:
+            Dict[Cell, int]: 分组值到用户数的映射，不含用户数为0的分组
+
+        Raises:
+            ValueError: 维度名无效或同一维度既用于分组又用于过滤
+
+        Examples:
+            >>> cube.query(['gender'], where={'age': '18-24'})
+            {('male',): 12, ('female',): 9}
+        """
+        where = dict(where or {})
+        if 'domain' in where:
+            where['domain'] = where['domain'].lower()
+        if set(group_by) & set(where):
+            raise ValueError('同一维度不能既用于分组又用于过滤')
+        mask = _mask_of(group_by) | _mask_of(where)
+        dims = _dims_of(mask)
+        cuboid = self._cuboids[mask]
+        if not group_by:
+            # 所有维度都指定了取值，单次查表
+            key = tuple(where[dim] for dim in dims)
+            count = cuboid.get(key, 0)
+            return {(): count} if count else {}
+        order = [dims.index(dim) for dim in group_by]
+        if not where:
+            if list(order) == sorted(order):
+                return dict(cuboid)
+            return {tuple([key[i] for i in order]): count for key, count in cuboid.items()}
+        filters = [(dims.index(dim), value) for dim, value in where.items()]
+        return {tuple([key[i] for i in order]): count for key, count in cuboid.items()
+                if all(key[i] == value for i, value in filters)}
+
+    def count(self, **where: str) -> int:
+        """
+        满足条件的用户数
+
+        Args:
+            **where: 维度到取值的过滤条件，不指定时为用户总数
+
+        Returns:
+            int: 用户数
+
+        Examples:
+            >>> cube.count(gender='female', region='四川')
+            3
+        """
+        return self.query(where=where).get((), 0)
+
+    def verify(self, users: Iterable[Mapping]) -> List[Tuple[str, ...]]:
+        """
+        与重新计算的立方体比较
+
+        Args:
+            users: 全部用户
+
+        Returns:
+            List[Tuple[str, ...]]: 结果不一致的维度组合，一致时为空列表
+        """
+        fresh = UserCube(users)
+        return [_dims_of(mask) for mask, (live, expected) in enumerate(zip(self._cuboids, fresh._cuboids))
+                if live != expected]
+
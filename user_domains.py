@@ -0,0 +1,266 @@
+import heapq
+from array import array
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from user_snapshot import _domain_of
+
+# 近似模式默认跟踪的候选域名数
+DEFAULT_CAPACITY = 1000
+# Count-Min Sketch的默认宽度和深度(误差约为总数的e/宽度，失败概率约为e^-深度)
+DEFAULT_WIDTH = 4096
+DEFAULT_DEPTH = 4
+
+
+def top_k(counts: Dict[str, int], k: int) -> List[Tuple[str, int]]:
+    """
+    从计数字典中取出数量最多的k项
+
+    用堆选择代替整体排序，复杂度为O(n log k)；数量相同时保持字典中的先后顺序。
+
+    Args:
+        counts: 项到数量的映射
+        k: 返回的项数
+
+    Returns:
+        List[Tuple[str, int]]: 按数量从多到少排列的(项, 数量)列表
+    """
+    if k <= 0:
+        return []
+    return heapq.nlargest(k, counts.items(), key=itemgetter(1))
+
+
+def count_domains(emails: Iterable[str]) -> Dict[str, int]:
+    """
+    精确统计每个邮箱域名的数量
+
+    Args:
+        emails: 邮箱地址序列，无效邮箱被忽略
+
+    Returns:
+        Dict[str, int]: 域名到数量的映射
+    """
+    counts: Dict[str, int] = {}
+    for email in emails:
+        domain = _domain_of(email or '')
+        if domain:
+            counts[domain] = counts.get(domain, 0) + 1
+    return counts
+
+
+class SpaceSaving:
+    """
+    Space-Saving频繁项算法
+
+    最多跟踪capacity个候选项，新项到来且候选已满时替换计数最小的候选，
+    并继承其计数作为误差上界。任何真实数量超过总数/capacity的项都一定在候选中，
+    每个候选的真实数量介于(count - error)和count之间。
+
+    Attributes:
+        capacity: 候选项数上限
+        total: 已处理的总数量
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError('候选项数必须大于0')
+        self.capacity = capacity
+        self.total = 0
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        # (数量, 项)的最小堆，计数增加时不更新堆，淘汰时再丢弃过期条目
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, item: str, count: int = 1) -> None:
+        """
+        记录一个项出现count次
+
+        Args:
+            item: 项
+            count: 出现次数
+        """
+        self.total += count
+        counts = self._counts
+        if item in counts:
+            counts[item] += count
+            return
+        if len(counts) < self.capacity:
+            counts[item] = count
+            self._errors[item] = 0
+            heapq.heappush(self._heap, (count, item))
+            return
+        floor, victim = self._pop_min()
+        del counts[victim]
+        del self._errors[victim]
+        counts[item] = floor + count
+        self._errors[item] = floor
+        heapq.heappush(self._heap, (floor + count, item))
+
+    def _pop_min(self) -> Tuple[int, str]:
+        heap = self._heap
+        counts = self._counts
+        while True:
+            count, item = heapq.heappop(heap)
+            current = counts.get(item)
+            if current == count:
+                return count, item
+            if current is not None:
+                heapq.heappush(heap, (current, item))
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """
+        返回估计数量最多的k项
+
+        Args:
+            k: 返回的项数
+
+        Returns:
+            List[Tuple[str, int, int]]: (项, 估计数量, 误差上界)，按估计数量从多到少排列
+        """
+        return [(item, count, self._errors[item]) for item, count in top_k(self._counts, k)]
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch频率估计
+
+    depth行、每行width个计数器，每个项在每行按不同的哈希落到一个计数器上，
+    估计值取各行计数器的最小值，只会高估不会低估。内存与项数无关。
+
+    Attributes:
+        width: 每行的计数器数
+        depth: 行数
+        total: 已处理的总数量
+    """
+
+    def __init__(self, width: int = DEFAULT_WIDTH, depth: int = DEFAULT_DEPTH):
+        if width < 1 or depth < 1:
+            raise ValueError('宽度和深度必须大于0')
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self._rows = [array('Q', bytes(8 * width)) for _ in range(depth)]
+
+    def _slots(self, item: str):
+        width = self.width
+        return ((row, hash((seed, item)) % width) for seed, row in enumerate(self._rows))
+
+    def add(self, item: str, count: int = 1) -> None:
+        """
+        记录一个项出现count次
+
+        Args:
+            item: 项
+            count: 出现次数
+        """
+        self.total += count
+        for row, slot in self._slots(item):
+            row[slot] += count
+
+    def estimate(self, item: str) -> int:
+        """
+        估计一个项出现的次数
+
+        Args:
+            item: 项
+
+        Returns:
+            int: 估计次数(不小于真实次数)
+        """
+        return min(row[slot] for row, slot in self._slots(item))
+
+
+class DomainStream:
+    """
+    流式邮箱域名统计
+
+    不保存全部域名，Space-Saving维护候选的头部域名，Count-Min Sketch估计任意域名的数量，
+    适合处理无法全部装入内存的大文件或持续到来的用户数据。
+
+    Attributes:
+        total: 已处理的有效邮箱数
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, width: int = DEFAULT_WIDTH, depth: int = DEFAULT_DEPTH):
+        self.heavy = SpaceSaving(capacity)
+        self.sketch = CountMinSketch(width, depth)
+        self.total = 0
+
+    def add(self, email: str) -> None:
+        """
+        处理一个邮箱地址，无效邮箱被忽略
+
+        Args:
+            email: 邮箱地址
+        """
+        domain = _domain_of(email or '')
+        if domain:
+            self.total += 1
+            self.heavy.add(domain)
+            self.sketch.add(domain)
+
+    def update(self, users: Iterable[Dict]) -> 'DomainStream':
+        """
+        处理一批用户
+
+        Args:
+            users: 用户字典的可迭代对象
+
+        Returns:
+            DomainStream: 自身，便于链式调用
+        """
+        for user in users:
+            self.add(user.get('email') or '')
+        return self
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        """
+        近似的头部域名
+
+        候选由Space-Saving选出，数量取Space-Saving与Count-Min两个上界中较小的一个。
+
+        Args:
+            k: 返回的域名数
+
+        Returns:
+            List[Tuple[str, int]]: 按估计数量从多到少排列的(域名, 估计数量)列表
+        """
+        estimates = {domain: min(count, self.sketch.estimate(domain))
+                     for domain, count, _ in self.heavy.top(max(k, 1) * 2)}
+        return top_k(estimates, k)
+
+    def estimate(self, domain: str) -> int:
+        """
+        估计某个域名的用户数量
+
+        Args:
+            domain: 域名(不区分大小写)
+
+        Returns:
+            int: 估计数量(不小于真实数量)
+        """
+        return self.sketch.estimate(domain.lower())
+
+
+def top_domains(users: Iterable[Dict], k: int, exact: Optional[bool] = None,
+                exact_limit: int = 1000000) -> List[Tuple[str, int]]:
+    """
+    统计数量最多的k个邮箱域名
+
+    Args:
+        users: 用户字典的可迭代对象
+        k: 返回的域名数
+        exact: True为精确统计，False为流式近似统计，None时列表不超过exact_limit个用户时精确统计
+        exact_limit: 自动选择模式时精确统计的用户数上限
+
+    Returns:
+        List[Tuple[str, int]]: 按数量从多到少排列的(域名, 数量)列表
+    """
+    if exact is None:
+        exact = hasattr(users, '__len__') and len(users) <= exact_limit
+    if exact:
+        return top_k(count_domains(user.get('email') or '' for user in users), k)
+    return DomainStream().update(users).top(k)
@@ -0,0 +1,428 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from user_record import public_view
+
+# 订阅者队列满时的处理方式: 阻塞发布方，或丢弃事件并标记订阅者落后
+BLOCK = 'block'
+DROP = 'drop'
+# 订阅者队列的默认容量
+DEFAULT_MAXSIZE = 1000
+# 变更流待投递事件的上限，超过后发布方在deliver_pending中等待投递线程消化
+OUTBOX_LIMIT = 10000
+
+# 标记取过订阅事件的线程(消费者)，消费者写回存储时不等待待投递队列，否则会和投递线程互相等待
+_consumer = threading.local()
+
+
+class Subscription:
+    """
+    事件总线上的一个订阅者
+
+    每个订阅者有自己的有界队列。overflow为'block'时队列满会让发布方等待(背压)，
+    为'drop'时丢弃新事件并把lagged置为True，订阅者可根据最后处理的seq从ChangeLog补读。
+
+    Attributes:
+        overflow: 队列满时的处理方式
+        dropped: 被丢弃的事件数
+        last_seq: 最近取出的事件序号
+    """
+
+    def __init__(self, bus: 'EventBus', maxsize: int, overflow: str):
+        if overflow not in (BLOCK, DROP):
+            raise ValueError(f'不支持的溢出处理方式: {overflow}')
+        self.overflow = overflow
+        self.dropped = 0
+        self.last_seq = 0
+        self._bus = bus
+        self._queue: 'queue.Queue[Optional[Dict]]' = queue.Queue(maxsize)
+        self._closed = False
+
+    @property
+    def lagged(self) -> bool:
+        """是否有事件因队列满被丢弃"""
+        return self.dropped > 0
+
+    def _deliver(self, event: Dict) -> None:
+        if self._closed:
+            return
+        if self.overflow == BLOCK:
+            # 分段等待，订阅者关闭后发布方不会一直阻塞
+            while not self._closed:
+                try:
+                    self._queue.put(event, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        取出下一个事件
+
+        Args:
+            timeout: 最长等待秒数，None表示一直等待
+
+        Returns:
+            Optional[Dict]: 事件，超时或订阅已关闭时返回None
+        """
+        if self._closed and self._queue.empty():
+            return None
+        _consumer.active = True
+        try:
+            event = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if event is not None:
+            self.last_seq = event['seq']
+        return event
+
+    def __iter__(self) -> Iterator[Dict]:
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self) -> None:
+        """取消订阅，正在迭代的消费者会在取完剩余事件后结束"""
+        if self._closed:
+            return
+        self._closed = True
+        self._bus._unsubscribe(self)
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class EventBus:
+    """进程内的发布/订阅事件总线，按发布顺序把事件投递给每个订阅者"""
+
+    def __init__(self):
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, maxsize: int = DEFAULT_MAXSIZE, overflow: str = BLOCK) -> Subscription:
+        """
+        新建订阅
+
+        Args:
+            maxsize: 订阅者队列容量
+            overflow: 队列满时阻塞发布方('block')或丢弃事件('drop')
+
+        Returns:
+            Subscription: 订阅对象
+        """
+        subscription = Subscription(self, maxsize, overflow)
+        with self._lock:
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscription]
+
+    def publish(self, event: Dict) -> None:
+        """
+        把事件投递给所有订阅者
+
+        Args:
+            event: 事件字典
+        """
+        for subscription in self._subscribers:
+            subscription._deliver(event)
+
+
+class ChangeLog:
+    """
+    持久化的JSON Lines变更日志
+
+    每行一个事件，只追加不改写，消费者记住读到的字节偏移，下次从该偏移继续读取。
+    每个事件立即写入操作系统，跟踪日志的消费者马上可见；与UserJournal一样按条数或时间批量fsync。
+
+    Attributes:
+        filename: 日志文件路径
+        last_seq: 日志中最后一个事件的序号
+    """
+
+    def __init__(self, filename: str, sync_every: int = 32, sync_interval: float = 1.0):
+        """
+        Args:
+            filename: 日志文件路径
+            sync_every: 累计多少条未同步事件后执行fsync
+            sync_interval: 距上次fsync超过多少秒后执行fsync
+        """
+        self.filename = filename
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.last_seq = self._read_last_seq()
+        self._file = open(filename, 'ab')
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _read_last_seq(self) -> int:
+        # 从文件末尾往前读到最后一个完整的行，崩溃时写了一半的末尾行被截掉
+        try:
+            f = open(self.filename, 'r+b')
+        except FileNotFoundError:
+            return 0
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            position = size
+            data = b''
+            while position > 0 and data.count(b'\n') < 2:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+            last_newline = data.rfind(b'\n')
+            partial = len(data) - last_newline - 1
+            if partial:
+                f.truncate(size - partial)
+            if last_newline < 0:
+                return 0
+            line = data[data.rfind(b'\n', 0, last_newline) + 1:last_newline]
+            return json.loads(line)['seq']
+
+    def append(self, event: Dict) -> int:
+        """
+        追加一个事件
+
+        Args:
+            event: 事件字典，必须包含seq
+
+        Returns:
+            int: 该事件之后的字节偏移(下一个事件的起点)
+        """
+        self._file.write(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n')
+        self._file.flush()
+        self.last_seq = event['seq']
+        self._unsynced += 1
+        if (self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval):
+            self.flush()
+        return self._file.tell()
+
+    def flush(self) -> None:
+        """把已追加的事件写入磁盘并fsync"""
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """同步剩余事件并关闭日志文件"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def read_changes(filename: str, offset: int = 0) -> Iterator[Tuple[int, Dict]]:
+    """
+    从指定偏移读取变更日志中已完整写入的事件
+
+    Args:
+        filename: 日志文件路径
+        offset: 开始读取的字节偏移
+
+    Returns:
+        Iterator[Tuple[int, Dict]]: (该事件之后的偏移, 事件)，末尾未写完的行不会返回
+    """
+    try:
+        f = open(filename, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+            offset += len(line)
+            if line.strip():
+                yield offset, json.loads(line)
+
+
+def tail_changes(filename: str, offset: int = 0, poll_interval: float = 0.2,
+                 stop: Optional[threading.Event] = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    持续跟踪变更日志，读完已有事件后等待新事件
+
+    Args:
+        filename: 日志文件路径
+        offset: 开始读取的字节偏移
+        poll_interval: 没有新事件时的轮询间隔(秒)
+        stop: 设置后结束跟踪
+
+    Returns:
+        Iterator[Tuple[int, Dict]]: (该事件之后的偏移, 事件)
+    """
+    while stop is None or not stop.is_set():
+        found = False
+        for offset, event in read_changes(filename, offset):
+            found = True
+            yield offset, event
+        if not found:
+            time.sleep(poll_interval)
+
+
+class ChangeFeed:
+    """
+    用户数据的变更数据捕获(CDC)
+
+    为每个变更分配递增的序号，先写入持久化日志(如果启用)再发布到事件总线，
+    日志顺序、序号顺序和订阅者收到的顺序一致。
+
+    分配序号和写日志在锁内完成，投递给订阅者在锁外进行: 事件先进入待投递队列，
+    同一时刻只有一个线程按序号顺序投递。'block'订阅者队列满时投递线程等待；待投递队列
+    超过outbox_limit时，其他发布方在deliver_pending中等待投递线程消化，背压传递到所有发布方，
+    内存有上限。deliver_pending在释放存储锁之后调用，消费者线程写回存储时不等待，因此不会死锁。
+
+    事件结构:
+        {
+            'seq': int,          # 递增序号
+            'ts': float,         # 时间戳
+            'op': str,           # register/update/delete
+            'username': str,     # 用户名(改名时为修改前的用户名)
+            'user': Dict,        # 变更后的用户信息(删除时为删除前)，不含密码
+            'changed': List[str] # 修改的字段名(仅update)
+        }
+
+    Attributes:
+        bus: 事件总线
+        log: 持久化日志，未启用时为None
+        outbox_limit: 待投递事件的上限
+    """
+
+    def __init__(self, log_file: Optional[str] = None, outbox_limit: int = OUTBOX_LIMIT):
+        self.bus = EventBus()
+        self.log: Optional[ChangeLog] = None
+        self.outbox_limit = outbox_limit
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._outbox: deque = deque()
+        self._delivering = False
+        if log_file:
+            self.open_log(log_file)
+
+    def open_log(self, filename: str) -> ChangeLog:
+        """
+        启用持久化日志，序号从日志中最后一个事件之后继续
+
+        Args:
+            filename: 日志文件路径
+
+        Returns:
+            ChangeLog: 日志对象
+        """
+        with self._lock:
+            if self.log is not None:
+                self.log.close()
+            self.log = ChangeLog(filename)
+            self._seq = max(self._seq, self.log.last_seq)
+        return self.log
+
+    def subscribe(self, maxsize: int = DEFAULT_MAXSIZE, overflow: str = BLOCK) -> Subscription:
+        """订阅之后发布的变更，参数见EventBus.subscribe"""
+        return self.bus.subscribe(maxsize, overflow)
+
+    def publish(self, op: str, username: str, user: Dict, changed: Optional[List[str]] = None,
+                deliver: bool = True) -> Dict:
+        """
+        发布一个变更事件
+
+        在持有存储锁时发布应传deliver=False，释放锁之后再调用deliver_pending，
+        序号在发布时已确定，投递顺序不受影响。持锁发布不等待，背压在deliver_pending中生效。
+
+        Args:
+            op: register/update/delete
+            username: 用户名
+            user: 用户记录或用户字典，事件中使用不含密码的只读视图
+            changed: 修改的字段名
+            deliver: 是否立即投递给订阅者
+
+        Returns:
+            Dict: 发布的事件
+        """
+        public = public_view(user)
+        with self._lock:
+            self._seq += 1
+            event = {'seq': self._seq, 'ts': time.time(), 'op': op, 'username': username, 'user': public}
+            if changed is not None:
+                event['changed'] = changed
+            if self.log is not None:
+                self.log.append(event)
+            self._outbox.append(event)
+        if deliver:
+            self.deliver_pending()
+        return event
+
+    def deliver_pending(self) -> None:
+        """
+        把待投递的事件按序号顺序投递给订阅者
+
+        已有线程在投递时，待投递事件不超过outbox_limit则直接返回，本线程发布的事件由该线程接着投递；
+        超过时等待投递线程把队列消化到上限以内(订阅者的消费者线程除外)。调用时不应持有存储的锁。
+        """
+        with self._lock:
+            while (self._delivering and len(self._outbox) > self.outbox_limit
+                   and not getattr(_consumer, 'active', False)):
+                self._drained.wait()
+            if self._delivering or not self._outbox:
+                return
+            self._delivering = True
+        try:
+            while True:
+                with self._lock:
+                    if not self._outbox:
+                        self._delivering = False
+                        self._drained.notify_all()
+                        return
+                    event = self._outbox.popleft()
+                    if len(self._outbox) == self.outbox_limit:
+                        self._drained.notify_all()
+                self.bus.publish(event)
+        except BaseException:
+            with self._lock:
+                self._delivering = False
+                self._drained.notify_all()
+            raise
+
+    def close(self) -> None:
+        """关闭持久化日志"""
+        with self._lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+
+
+def consume(subscription: Subscription, handler: Callable[[Dict], None],
+            name: str = 'change-consumer') -> threading.Thread:
+    """
+    在后台线程中逐个处理订阅到的事件
+
+    Args:
+        subscription: 订阅对象
+        handler: 事件处理函数
+        name: 线程名
+
+    Returns:
+        threading.Thread: 已启动的守护线程，订阅关闭后结束
+    """
+    def run():
+        for event in subscription:
+            handler(event)
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,190 @@
+import atexit
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from user_loader import iter_users
+
+# 日志文件相对快照文件的后缀
+JOURNAL_SUFFIX = '.journal'
+
+
+class UserJournal:
+    """
+    用户数据的追加式预写日志
+
+    快照文件(原有的JSON数组)只在压缩时整体重写，平时每次注册、修改、删除
+    只向日志文件追加一行JSON事件。每个事件立即写入操作系统，进程被杀死时不会丢失；
+    fsync按条数或时间批量执行，机器断电时最多丢失最后一个未同步批次内的事件。
+    日志条数达到阈值时自动压缩。
+
+    Attributes:
+        filename: 快照文件路径
+        journal_file: 日志文件路径
+        users: load()返回的用户列表，压缩时写回快照
+    """
+
+    def __init__(
+        self,
+        filename: str = '2-mocked-users.json',
+        journal_file: Optional[str] = None,
+        sync_every: int = 32,
+        sync_interval: float = 1.0,
+        compact_every: int = 1000
+    ):
+        """
+        Args:
+            filename: 快照文件路径
+            journal_file: 日志文件路径，默认为快照文件名加.journal
+            sync_every: 累计多少条未同步事件后执行fsync
+            sync_interval: 距上次fsync超过多少秒后执行fsync
+            compact_every: 日志累计多少条事件后自动压缩为快照
+        """
+        self.filename = filename
+        self.journal_file = journal_file or filename + JOURNAL_SUFFIX
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self.users: List[Dict] = []
+        self._file = None
+        self._seq = 0
+        self._events = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def load(self) -> List[Dict]:
+        """
+        读取快照并重放日志，得到最新的用户列表
+
+        日志末尾因崩溃而写了一半的行会被截掉。
+
+        Returns:
+            List[Dict]: 用户列表
+
+        Raises:
+            json.JSONDecodeError: 当快照文件格式错误时
+        """
+        try:
+            users = list(iter_users(self.filename))
+        except FileNotFoundError:
+            users = []
+        positions = {user.get('username'): i for i, user in enumerate(users)}
+
+        good_offset = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        if not line.endswith(b'\n'):
+                            break  # 写了一半的末尾行
+                        print(f"警告: 日志文件中有损坏的记录，已跳过(偏移{good_offset})")
+                        good_offset += len(line)
+                        continue
+                    good_offset += len(line)
+                    self._apply(users, positions, event)
+                    self._seq = max(self._seq, event.get('seq', 0))
+                    self._events += 1
+            if good_offset < os.path.getsize(self.journal_file):
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(good_offset)
+
+        self.users = [user for user in users if user is not None]
+        atexit.register(self.close)
+        return self.users
+
+    @staticmethod
+    def _apply(users: List[Optional[Dict]], positions: Dict[str, int], event: Dict) -> None:
+        # 事件按用户名幂等地应用，压缩中途崩溃后重放也不会产生重复用户
+        op = event.get('op')
+        if op == 'register':
+            user = event['user']
+            index = positions.get(user.get('username'))
+            if index is None or users[index] is None:
+                positions[user.get('username')] = len(users)
+                users.append(user)
+            else:
+                users[index] = user
+        elif op == 'update':
+            index = positions.get(event['username'])
+            if index is not None and users[index] is not None:
+                users[index].update(event['fields'])
+        elif op == 'delete':
+            index = positions.pop(event['username'], None)
+            if index is not None:
+                users[index] = None
+
+    def append(self, op: str, **payload) -> None:
+        """
+        追加一条事件到日志
+
+        Args:
+            op: 事件类型(register/update/delete)
+            **payload: 事件内容
+        """
+        if self._file is None:
+            self._file = open(self.journal_file, 'a', encoding='utf-8')
+        self._seq += 1
+        event = {'seq': self._seq, 'op': op, **payload}
+        self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._events += 1
+        self._unsynced += 1
+        if (self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval):
+            self.flush()
+        if self._events >= self.compact_every:
+            self.compact()
+
+    def register(self, user: Dict) -> None:
+        """记录新注册的用户"""
+        self.append('register', user=user)
+
+    def update(self, username: str, **fields) -> None:
+        """记录用户字段修改"""
+        self.append('update', username=username, fields=fields)
+
+    def delete(self, username: str) -> None:
+        """记录用户删除"""
+        self.append('delete', username=username)
+
+    def flush(self) -> None:
+        """把已追加的事件写入磁盘并fsync"""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self, users: Optional[List[Dict]] = None) -> None:
+        """
+        把当前用户列表写成新快照并清空日志
+
+        快照先写入临时文件再原子替换，替换完成前崩溃不会损坏原快照。
+
+        Args:
+            users: 要写入的用户列表，默认为load()返回的列表
+        """
+        if users is not None:
+            self.users = users
+        self.flush()
+        tmp_file = self.filename + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.users, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.filename)
+
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_file, 'w', encoding='utf-8')
+        os.fsync(self._file.fileno())
+        self._events = 0
+
+    def close(self) -> None:
+        """同步剩余事件并关闭日志文件"""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
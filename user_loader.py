@@ -0,0 +1,88 @@
+import json
+import re
+from typing import Dict, Iterator
+
+# 每次从文件读取的字符数
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# 数字值中可能出现的字符，解析结果后紧跟这些字符说明数字可能被块边界截断
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+def iter_users(filename: str = '2-mocked-users.json', chunk_size: int = CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    流式读取顶层为JSON数组的用户文件，逐个产出用户字典
+
+    文件按块读取，已解析的部分随即丢弃，内存占用只与单个用户和块大小有关，
+    与文件总大小无关。
+
+    Args:
+        filename: 用户数据文件路径
+        chunk_size: 每次读取的字符数
+
+    Yields:
+        Dict: 单个用户字典
+
+    Raises:
+        FileNotFoundError: 当数据文件不存在时
+        json.JSONDecodeError: 当数据文件格式错误时
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            # 丢弃已解析部分并追加一块新数据，文件读完时返回False
+            nonlocal buf, pos, eof
+            if eof:
+                return False
+            chunk = f.read(chunk_size)
+            buf = buf[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            return not eof
+
+        def skip_whitespace() -> None:
+            nonlocal pos
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos < len(buf) or not fill():
+                    return
+
+        skip_whitespace()
+        if pos >= len(buf) or buf[pos] != '[':
+            raise json.JSONDecodeError('用户数据文件顶层必须是数组', buf, pos)
+        pos += 1
+
+        skip_whitespace()
+        if pos < len(buf) and buf[pos] == ']':
+            return
+
+        while True:
+            skip_whitespace()
+            while True:
+                try:
+                    user, end = _decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # 可能只是当前块里的对象不完整，再读一块重试
+                    if fill():
+                        continue
+                    raise
+                # 数字等值可能恰好在块边界被截断，未到文件末尾时读更多数据确认
+                if (end == len(buf) or buf[end] in _NUMBER_CHARS) and fill():
+                    continue
+                break
+            pos = end
+            yield user
+
+            skip_whitespace()
+            if pos >= len(buf):
+                raise json.JSONDecodeError('用户数据文件意外结束', buf, pos)
+            if buf[pos] == ']':
+                return
+            if buf[pos] != ',':
+                raise json.JSONDecodeError("用户之间应以','分隔", buf, pos)
+            pos += 1
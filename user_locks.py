@@ -0,0 +1,78 @@
+import threading
+import zlib
+from typing import List
+
+# 默认的锁分段数
+DEFAULT_STRIPES = 64
+
+
+class StripedLock:
+    """
+    按键分段的锁
+
+    把键哈希到固定数量的锁上，同一个键总是得到同一把锁，不同键的操作大多落在不同的锁上可以并行，
+    而锁的数量不随键的数量增长。用于对同一用户名的"检查后写入"操作(注册查重、校验旧密码后修改等)互斥。
+    锁是可重入的，持有锁的线程可以调用同样加锁的存储方法。
+
+    Attributes:
+        stripes: 锁的数量
+    """
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        if stripes < 1:
+            raise ValueError('锁分段数必须大于0')
+        self.stripes = stripes
+        self._locks: List[threading.RLock] = [threading.RLock() for _ in range(stripes)]
+
+    def lock_for(self, key: str) -> threading.RLock:
+        """
+        获取键对应的锁
+
+        Args:
+            key: 键(如用户名)
+
+        Returns:
+            threading.RLock: 该键所在分段的锁，可用于with语句
+        """
+        # 用crc32而不是hash()，分段与PYTHONHASHSEED无关，便于复现问题
+        return self._locks[zlib.crc32(str(key).encode('utf-8')) % self.stripes]
+
+
+class IdAllocator:
+    """
+    线程安全的递增id分配器
+
+    代替len(users) + 1: 并发注册不会拿到相同的id，删除用户后也不会复用已分配过的id。
+
+    Attributes:
+        next_value: 下一个要分配的id
+    """
+
+    def __init__(self, start: int = 1):
+        self.next_value = start
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        """分配一个新id"""
+        with self._lock:
+            value = self.next_value
+            self.next_value += 1
+            return value
+
+    def observe(self, value) -> None:
+        """
+        记录一个已存在的id，之后分配的id都比它大
+
+        Args:
+            value: 已存在的id，非整数时忽略
+        """
+        if type(value) is not int:
+            return
+        with self._lock:
+            if value >= self.next_value:
+                self.next_value = value + 1
+
+    def reset(self, start: int = 1) -> None:
+        """从start重新开始分配"""
+        with self._lock:
+            self.next_value = start
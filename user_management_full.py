@@ -1,28 +1,621 @@
 import json
-import re
-from typing import List, Dict, Optional, Union
+import os
+import threading
+from typing import TYPE_CHECKING, Callable, Iterable, List, Dict, Optional, Union
+
+from user_ages import ADULT_AGE, UNKNOWN_AGE_BUCKET, age_bucket_labels, age_bucket_of, age_value
+from user_events import ChangeFeed
+from user_loader import iter_users
+from user_locks import IdAllocator, StripedLock
+from user_record import UserRecord
+from user_search import NgramIndex, contains_cjk
+from user_validators import validators
+
+if TYPE_CHECKING:
+    from user_cube import UserCube
+    from user_snapshot import UserSnapshot
+
+# 用户数据文件路径，可通过环境变量USER_DATA_FILE或configure()修改
+DATA_FILE = os.environ.get('USER_DATA_FILE', '2-mocked-users.json')
 
 # 用户数据结构
 User = Dict[str, Union[str, int]]
+# 影响统计立方体维度取值的字段
+CUBE_FIELDS = ('age', 'gender', 'email', 'company', 'address')
 users: List[User] = []
 
 
-def load_mocked_users() -> None:
+class UserStats:
+    """
+    增量维护的用户统计计数器
+
+    加载时一次遍历算出所有统计值，之后随注册和资料修改增减计数，
+    统计查询无需再扫描全部用户。
+
+    Attributes:
+        adults: 成年用户数量
+        minors: 未成年用户数量
+        gender: 按成年/未成年分组的性别计数
+        domains: 邮箱域名到用户数量的映射
+        chinese: 用户名包含中文字符的用户数量
+        ages: 年龄到用户数量的映射，年龄缺失或无效的用户计在-1下
     """
-    从2-mocked-users.json加载测试用户数据到全局users列表
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """清空所有计数器"""
+        self.adults = 0
+        self.minors = 0
+        self.gender = {
+            'adults': {'male': 0, 'female': 0},
+            'minors': {'male': 0, 'female': 0}
+        }
+        self.domains: Dict[str, int] = {}
+        self.chinese = 0
+        self.ages: Dict[int, int] = {}
+
+    def add(self, user: User, delta: int = 1) -> None:
+        """
+        把一个用户计入统计
+
+        Args:
+            user: 用户字典
+            delta: 计数增量，移除用户时传-1
+        """
+        adult = is_adult(user)
+        if adult:
+            self.adults += delta
+        else:
+            self.minors += delta
+
+        gender = (user.get('gender') or '').lower()
+        if gender in ('male', 'female'):
+            self.gender['adults' if adult else 'minors'][gender] += delta
+
+        domain = extract_domain(user.get('email') or '')
+        if domain:
+            count = self.domains.get(domain, 0) + delta
+            if count:
+                self.domains[domain] = count
+            else:
+                del self.domains[domain]
+
+        if contains_chinese(user.get('username') or ''):
+            self.chinese += delta
+
+        age = age_value(user.get('age'))
+        if age is None:
+            age = -1
+        count = self.ages.get(age, 0) + delta
+        if count:
+            self.ages[age] = count
+        else:
+            del self.ages[age]
+
+    def remove(self, user: User) -> None:
+        """
+        把一个用户从统计中扣除
+
+        Args:
+            user: 用户字典
+        """
+        self.add(user, -1)
+
+    def snapshot(self) -> Dict:
+        """
+        导出当前统计值
+
+        Returns:
+            Dict: 各计数器的副本
+        """
+        return {
+            'adults': self.adults,
+            'minors': self.minors,
+            'gender': {group: dict(counts) for group, counts in self.gender.items()},
+            'domains': dict(self.domains),
+            'chinese': self.chinese
+        }
+
+    def age_buckets(self) -> Dict[str, int]:
+        """
+        按年龄计数器汇总各年龄分段的用户数量(只遍历出现过的年龄)
+
+        Returns:
+            Dict[str, int]: 分段名称到用户数量的映射，缺失年龄计入'未知'
+        """
+        result = dict.fromkeys(age_bucket_labels(), 0)
+        result[UNKNOWN_AGE_BUCKET] = 0
+        for age, count in dict(self.ages).items():
+            result[age_bucket_of(age)] += count
+        return result
+
+    @classmethod
+    def compute(cls, user_list: List[User]) -> 'UserStats':
+        """
+        一次遍历从头计算统计值
+
+        Args:
+            user_list: 用户列表
+
+        Returns:
+            UserStats: 新的统计对象
+        """
+        stats = cls()
+        for user in user_list:
+            stats.add(user)
+        return stats
+
+    def verify(self, user_list: List[User]) -> Dict[str, tuple]:
+        """
+        重新计算统计值并与当前计数器比较
+
+        Args:
+            user_list: 用户列表
+
+        Returns:
+            Dict[str, tuple]: 不一致的统计项，值为(当前值, 重新计算的值)；一致时为空字典
+        """
+        recomputed = self.compute(user_list)
+        live = self.snapshot()
+        fresh = recomputed.snapshot()
+        live['ages'], fresh['ages'] = dict(self.ages), recomputed.ages
+        return {key: (live[key], fresh[key]) for key in live if live[key] != fresh[key]}
+
+
+class UserStore:
+    """
+    带哈希索引的内存用户存储
+
+    在原始用户列表之外维护用户名、邮箱域名和手机号索引，
+    注册和修改资料时增量更新，使查询从O(n)降为O(1)。
+    支持在后台线程中边读取边建索引，加载未完成时查询会等待所需数据就绪。
+    挂载列式快照时，统计查询直接由快照列计算，首次需要用户字典时才物化。
+    设置了加载函数时，数据在第一次被访问时才加载。
+    用户名、姓名和昵称的n-gram搜索索引在第一次搜索时才建立，之后随增删改同步更新。
+    多维统计立方体(年龄分段、性别、域名、公司、地区)同样在第一次查询时建立，之后增量维护。
+    存入的用户统一转换为不可变的UserRecord，字段只能通过update修改。
+
+    线程安全: 索引和计数器的修改在一把短暂持有的写锁内完成；对同一用户名的"检查后写入"
+    (注册查重、校验密码后修改)由locks中该用户名所在分段的锁串行化，密码哈希等耗时计算在锁外进行；
+    id由ids原子分配。按用户名查询、统计等读操作不加锁。
+
+    Attributes:
+        users: 用户列表(与模块级users为同一对象)
+        locks: 按用户名分段的锁
+        ids: 新用户的id分配器
+    """
+
+    def __init__(self, user_list: Optional[List[User]] = None):
+        self.users: List[User] = user_list if user_list is not None else []
+        self._by_username: Dict[str, User] = {}
+        # 原始数据中同名的后续用户(注册时已查重，只有导入的旧数据会有)，第一个被删除或改名时顶上
+        self._shadowed: Dict[str, List[User]] = {}
+        # 域名和手机号到{id(用户): 用户}，按加入顺序排列，增删都是O(1)
+        self._by_domain: Dict[str, Dict[int, User]] = {}
+        self._by_mobile: Dict[str, Dict[int, User]] = {}
+        # id(用户)到其在users中的下标，删除时不用线性查找
+        self._positions: Dict[int, int] = {}
+        self.stats = UserStats()
+        self._loading = False
+        self._cond = threading.Condition()
+        self._snapshot: Optional['UserSnapshot'] = None
+        self._loader: Optional[Callable[[], None]] = None
+        self._search: Optional[NgramIndex] = None
+        self._cube: Optional['UserCube'] = None
+        self._write_lock = threading.RLock()
+        self.locks = StripedLock()
+        self.ids = IdAllocator()
+        self.rebuild()
+
+    def load(self, data: List[User]) -> None:
+        """
+        用新数据替换全部用户并重建索引
+
+        Args:
+            data: 用户字典列表
+        """
+        self._snapshot = None
+        self.users[:] = data
+        self.rebuild()
+
+    def load_stream(self, user_iter: Iterable[User], batch_size: int = 1000) -> None:
+        """
+        逐个读取用户并同步更新索引和统计
+
+        加载期间按用户名查询会在该用户读入后立即返回，
+        统计等全量查询则等待加载完成。
+
+        Args:
+            user_iter: 产出用户字典的可迭代对象
+            batch_size: 每读入多少个用户唤醒一次等待中的查询
+        """
+        with self._cond:
+            self._loading = True
+            self.users.clear()
+            self.rebuild()
+        try:
+            for count, user in enumerate(user_iter, 1):
+                self.add(user)
+                if count % batch_size == 0:
+                    with self._cond:
+                        self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._loading = False
+                self._cond.notify_all()
+
+    def set_loader(self, loader: Optional[Callable[[], None]]) -> None:
+        """
+        设置延迟加载函数，在第一次访问用户数据时调用
+
+        Args:
+            loader: 加载函数，None表示取消尚未执行的延迟加载
+        """
+        with self._cond:
+            self._loader = loader
+
+    def _ensure_loaded(self) -> None:
+        if self._loader is None:
+            return
+        with self._cond:
+            loader, self._loader = self._loader, None
+        if loader is not None:
+            loader()
+
+    def attach_snapshot(self, snapshot: 'UserSnapshot') -> None:
+        """
+        挂载列式快照作为数据源
+
+        统计查询直接使用快照，按用户名查询等需要用户字典的操作
+        会在第一次调用时把快照物化到存储中。
+
+        Args:
+            snapshot: 已打开的用户快照
+        """
+        with self._cond:
+            self.users.clear()
+            self.rebuild()
+            self._snapshot = snapshot
+
+    def _materialize(self) -> None:
+        self._ensure_loaded()
+        if self._snapshot is None:
+            return
+        with self._cond:
+            snapshot, self._snapshot = self._snapshot, None
+            if snapshot is None:
+                return
+            self._loading = True
+        self.load_stream(snapshot)
+
+    def wait_loaded(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待正在进行的加载完成
+
+        Args:
+            timeout: 最长等待秒数，None表示一直等待
+
+        Returns:
+            bool: 加载已完成返回True，超时返回False
+        """
+        self._materialize()
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._loading, timeout)
+
+    def get_stats(self) -> UserStats:
+        """
+        获取统计计数器(加载完成后)
+
+        Returns:
+            UserStats: 统计计数器，挂载快照时为由快照列计算的只读统计
+        """
+        self._ensure_loaded()
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot.stats
+        self.wait_loaded()
+        return self.stats
+
+    def age_buckets(self) -> Dict[str, int]:
+        """
+        统计各年龄分段的用户数量
+
+        Returns:
+            Dict[str, int]: 分段名称到用户数量的映射
+        """
+        self._ensure_loaded()
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot.age_buckets()
+        self.wait_loaded()
+        return self.stats.age_buckets()
+
+    def rebuild(self) -> None:
+        """根据当前用户列表重建所有索引"""
+        with self._write_lock:
+            self.users[:] = map(UserRecord.of, self.users)
+            self._by_username.clear()
+            self._shadowed.clear()
+            self._by_domain.clear()
+            self._by_mobile.clear()
+            self._positions = {id(user): i for i, user in enumerate(self.users)}
+            self.stats.reset()
+            self._search = None
+            self._cube = None
+            self.ids.reset()
+            for user in self.users:
+                self._index(user)
+                self.stats.add(user)
+                self.ids.observe(user.get('id'))
+
+    def _index(self, user: User) -> None:
+        # 用户名重复时保留第一个，与原先线性查找的结果一致
+        username = user.get('username')
+        if self._by_username.setdefault(username, user) is not user:
+            self._shadowed.setdefault(username, []).append(user)
+        domain = extract_domain(user.get('email') or '')
+        if domain:
+            self._by_domain.setdefault(domain, {})[id(user)] = user
+        mobile = user.get('mobile')
+        if mobile:
+            self._by_mobile.setdefault(mobile, {})[id(user)] = user
+
+    def _unindex(self, user: User) -> None:
+        username = user.get('username')
+        shadowed = self._shadowed.get(username)
+        if self._by_username.get(username) is user:
+            if shadowed:
+                # 若存在同名用户，让下一个顶上
+                self._by_username[username] = shadowed.pop(0)
+            else:
+                del self._by_username[username]
+        elif shadowed:
+            shadowed[:] = [u for u in shadowed if u is not user]
+        if shadowed is not None and not shadowed:
+            del self._shadowed[username]
+        for index, key in ((self._by_domain, extract_domain(user.get('email') or '')),
+                           (self._by_mobile, user.get('mobile'))):
+            bucket = index.get(key) if key else None
+            if bucket is not None:
+                bucket.pop(id(user), None)
+                if not bucket:
+                    del index[key]
+
+    def add(self, user: User) -> UserRecord:
+        """
+        追加用户并更新索引
+
+        Args:
+            user: 用户字典
+
+        Returns:
+            UserRecord: 存储中的用户记录
+        """
+        user = UserRecord.of(user)
+        with self._write_lock:
+            self._positions[id(user)] = len(self.users)
+            self.users.append(user)
+            self._index(user)
+            self.stats.add(user)
+            self.ids.observe(user.get('id'))
+            if self._search is not None:
+                self._search.add(user)
+            if self._cube is not None:
+                self._cube.add(user)
+        return user
+
+    def insert(self, user: User) -> Optional[UserRecord]:
+        """
+        注册新用户: 用户名未被占用时分配id并加入存储，查重和加入对同一用户名是原子的
+
+        Args:
+            user: 用户字典，没有id时自动分配
+
+        Returns:
+            Optional[UserRecord]: 存储中的用户记录，用户名已被占用时返回None
+        """
+        self.wait_loaded()
+        username = user.get('username')
+        with self.locks.lock_for(username):
+            if self.has_username(username):
+                return None
+            if user.get('id') is None:
+                user = {'id': self.ids.allocate(), **user}
+            return self.add(user)
+
+    def update(self, user: UserRecord, **fields) -> None:
+        """
+        修改用户字段，必要时更新受影响的索引
+
+        Args:
+            user: 存储中的用户记录
+            **fields: 要修改的字段
+        """
+        reindex = any(k in fields for k in ('username', 'email', 'mobile'))
+        recount = any(k in fields for k in ('username', 'email', 'age', 'gender'))
+        with self._write_lock:
+            recube = self._cube is not None and any(k in fields for k in CUBE_FIELDS)
+            if reindex:
+                self._unindex(user)
+            if recount:
+                self.stats.remove(user)
+            if recube:
+                self._cube.remove(user)
+            user._update(fields)
+            if reindex:
+                self._index(user)
+            if recount:
+                self.stats.add(user)
+            if recube:
+                self._cube.add(user)
+            if self._search is not None and any(k in fields for k in ('username', 'name', 'nickname')):
+                self._search.update(user)
+
+    def search_index(self, build: bool = True) -> Optional[NgramIndex]:
+        """
+        获取n-gram搜索索引(加载完成后)
+
+        Args:
+            build: 索引尚未建立时是否立即建立
+
+        Returns:
+            Optional[NgramIndex]: 搜索索引，build为False且尚未建立时返回None
+        """
+        if self._search is None and build:
+            self.wait_loaded()
+            with self._write_lock:
+                if self._search is None:
+                    self._search = NgramIndex(self.users)
+        return self._search
+
+    def cube(self, build: bool = True) -> Optional['UserCube']:
+        """
+        获取多维统计立方体(加载完成后)
+
+        Args:
+            build: 立方体尚未建立时是否立即建立
+
+        Returns:
+            Optional[UserCube]: 统计立方体，build为False且尚未建立时返回None
+        """
+        if self._cube is None and build:
+            from user_cube import UserCube
+            self.wait_loaded()
+            with self._write_lock:
+                if self._cube is None:
+                    self._cube = UserCube(self.users)
+        return self._cube
+
+    def remove(self, user: User) -> None:
+        """
+        删除用户并更新索引
+
+        Args:
+            user: 存储中的用户字典
+        """
+        self.wait_loaded()
+        with self._write_lock:
+            index = self._positions.pop(id(user), None)
+            if index is None or index >= len(self.users) or self.users[index] is not user:
+                return
+            # 用最后一个用户填补空位，删除是O(1)(被移动的用户在列表中的顺序会改变)
+            last = self.users.pop()
+            if last is not user:
+                self.users[index] = last
+                self._positions[id(last)] = index
+            self._unindex(user)
+            self.stats.remove(user)
+            if self._search is not None:
+                self._search.remove(user)
+            if self._cube is not None:
+                self._cube.remove(user)
+
+    def get(self, username: str) -> Optional[User]:
+        """
+        按用户名查找用户
+
+        Args:
+            username: 用户名
+
+        Returns:
+            Optional[User]: 找到的用户字典，不存在时返回None
+        """
+        self._materialize()
+        user = self._by_username.get(username)
+        if user is None and self._loading:
+            with self._cond:
+                self._cond.wait_for(lambda: username in self._by_username or not self._loading)
+            user = self._by_username.get(username)
+        return user
+
+    def has_username(self, username: str) -> bool:
+        """检查用户名是否存在"""
+        return self.get(username) is not None
+
+    def find_by_mobile(self, mobile: str) -> List[User]:
+        """
+        按手机号查找用户
+
+        Args:
+            mobile: 手机号
+
+        Returns:
+            List[User]: 使用该手机号的用户列表
+        """
+        self.wait_loaded()
+        return list(self._by_mobile.get(mobile, {}).values())
+
+    def find_by_domain(self, domain: str) -> List[User]:
+        """
+        按邮箱域名查找用户
+
+        Args:
+            domain: 邮箱域名(不区分大小写)
+
+        Returns:
+            List[User]: 属于该域名的用户列表
+        """
+        self.wait_loaded()
+        return list(self._by_domain.get(domain.lower(), {}).values())
+
+    def next_id(self) -> int:
+        """分配新用户的id(每次调用返回不同的值)"""
+        self.wait_loaded()
+        return self.ids.allocate()
+
+
+user_store = UserStore(users)
+
+# 用户数据的变更事件流，设置环境变量USER_CHANGE_LOG时同时写入持久化日志
+change_feed = ChangeFeed(os.environ.get('USER_CHANGE_LOG'))
+
+
+def load_mocked_users(filename: Optional[str] = None, background: bool = False) -> None:
+    """
+    从2-mocked-users.json流式加载测试用户数据到全局users列表
+
+    如果存在不早于JSON文件的同名.usnap列式快照，则改为内存映射该快照。
+
+    Args:
+        filename: 测试数据文件路径，默认为DATA_FILE
+        background: 为True时在后台线程中加载，按用户名的查询可在加载完成前得到结果
 
     Raises:
         FileNotFoundError: 当测试数据文件不存在时
         json.JSONDecodeError: 当测试数据文件格式错误时
     """
-    global users
-    try:
-        with open('2-mocked-users.json', 'r', encoding='utf-8') as f:
-            users = json.load(f)
-    except FileNotFoundError:
-        print("警告: 测试数据文件未找到，将使用空用户列表")
-    except json.JSONDecodeError:
-        print("警告: 测试数据文件格式错误，将使用空用户列表")
+    from user_snapshot import UserSnapshot, snapshot_path
+
+    filename = filename or DATA_FILE
+    user_store.set_loader(None)
+    snapshot_file = snapshot_path(filename)
+    if os.path.exists(snapshot_file) and (
+            not os.path.exists(filename)
+            or os.path.getmtime(snapshot_file) >= os.path.getmtime(filename)):
+        try:
+            user_store.attach_snapshot(UserSnapshot(snapshot_file))
+            return
+        except ValueError as e:
+            print(f"警告: {e}，改为读取JSON数据文件")
+
+    def run():
+        try:
+            user_store.load_stream(iter_users(filename))
+        except FileNotFoundError:
+            print("警告: 测试数据文件未找到，将使用空用户列表")
+            user_store.load([])
+        except json.JSONDecodeError:
+            print("警告: 测试数据文件格式错误，将使用空用户列表")
+            user_store.load([])
+
+    if background:
+        # 先标记为加载中，避免线程启动前的查询误判为数据不存在
+        user_store._loading = True
+        threading.Thread(target=run, name='load-mocked-users', daemon=True).start()
+    else:
+        run()
 
 
 def is_valid_username(username: str) -> bool:
@@ -35,8 +628,7 @@ def is_valid_username(username: str) -> bool:
     Returns:
         bool: 如果格式有效返回True，否则返回False
     """
-    pattern = r'^\w{4,20}$'
-    return re.match(pattern, username) is not None
+    return validators.check('username', username)
 # def is_valid_username(username: str) -> bool:
 #     '''
 #     yanzheng yonghuming geshi(4-20wei zimu shuzi xiahuaxian)
@@ -59,8 +651,7 @@ def is_valid_email(email: str) -> bool:
     Returns:
         bool: 如果格式有效返回True，否则返回False
     """
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return validators.check('email', email)
 # def is_valid_email(email: str) -> bool:
 #     '''
 #     验证邮箱的格式
@@ -83,7 +674,7 @@ def is_valid_phone(phone: str) -> bool:
     Returns:
         bool: 如果格式有效返回True，否则返回False
     """
-    return phone.isdigit() and len(phone) == 11
+    return validators.check('phone', phone)
 # def is_valid_phone(phone: str) -> bool:
 #     '''
 #     验证手机号码格式u（11位数字）
@@ -104,15 +695,7 @@ def is_strong_password(password: str) -> bool:
     Returns:
         bool: 如果密码强度足够返回True，否则返回False
     """
-    if len(password) < 8:
-        return False
-    if not re.search(r'[a-z]', password):
-        return False
-    if not re.search(r'[A-Z]', password):
-        return False
-    if not re.search(r'[0-9]', password):
-        return False
-    return True
+    return validators.check('strong_password', password)
 # def is_strong_password(password: str) -> bool:
 #     '''
 #     验证密码强度 （8位以上，含大小写字母和数字）
@@ -141,7 +724,7 @@ def is_username_taken(username: str) -> bool:
     Returns:
         bool: 如果用户名已存在返回True，否则返回False
     """
-    return any(user['username'] == username for user in users)
+    return user_store.has_username(username)
 # def is_username_taken(username: str) -> bool:
 #     '''
 #     检查用户名是否已被使用
@@ -181,7 +764,7 @@ def register_user(
         {
             'success': bool,  # 操作是否成功
             'message': str,    # 结果消息
-            'user': Dict       # 注册成功的用户信息(仅success为True时存在)
+            'user': Dict       # 注册成功的用户信息(只读，不含密码，仅success为True时存在)
         }
 
     Raises:
@@ -192,23 +775,9 @@ def register_user(
         {'success': True, 'message': '用户注册成功', 'user': {...}}
     """
     # 输入验证
-    if not username or not password or not email or not phone:
-        return {'success': False, 'message': '所有必填字段不能为空'}
-
-    if not is_valid_username(username):
-        return {'success': False, 'message': '用户名格式无效(4-20位字母数字下划线)'}
-
-    if is_username_taken(username):
-        return {'success': False, 'message': '用户名已被使用'}
-
-    if not is_valid_email(email):
-        return {'success': False, 'message': '邮箱格式无效'}
-
-    if not is_valid_phone(phone):
-        return {'success': False, 'message': '手机号格式无效(需要11位数字)'}
-
-    if not is_strong_password(password):
-        return {'success': False, 'message': '密码强度不足(需8位以上，包含大小写字母和数字)'}
+    error = _check_registration(username, password, email, phone)
+    if error:
+        return {'success': False, 'message': error}
     # #输入验证
     # if not username or not password or not email or not phone:
     #     return {'success':False, 'message':'所有必填字段不能为空'}
@@ -238,11 +807,46 @@ def register_user(
 
     # users.append(new_user)
     # return {'success': True, 'message': '用户注册成功', 'user': new_user}
-    #创建新用户
+    #创建新用户，只保存密码哈希
+    from user_password import hash_password
+    new_user = _create_user(username, hash_password(password), email, phone, nickname, age, gender, **kwargs)
+    if new_user is None:
+        # 校验之后、加入之前被其他线程抢先注册
+        return {'success': False, 'message': '用户名已被使用'}
+    return {'success': True ,'message': '用户注册成功', 'user': new_user.public}
+
+
+def _check_registration(username: str, password: str, email: str, phone: str,
+                        check_taken: bool = True) -> Optional[str]:
+    # 按原有顺序校验注册信息，返回第一个错误消息，全部通过时返回None
+    if not username or not password or not email or not phone:
+        return '所有必填字段不能为空'
+
+    if not is_valid_username(username):
+        return '用户名格式无效(4-20位字母数字下划线)'
+
+    if check_taken and is_username_taken(username):
+        return '用户名已被使用'
+
+    if not is_valid_email(email):
+        return '邮箱格式无效'
+
+    if not is_valid_phone(phone):
+        return '手机号格式无效(需要11位数字)'
+
+    if not is_strong_password(password):
+        return '密码强度不足(需8位以上，包含大小写字母和数字)'
+    return None
+
+
+def _create_user(username: str, password_hash: str, email: str, phone: str, nickname: Optional[str] = None,
+                 age: Optional[int] = None, gender: Optional[str] = None, deliver: bool = True,
+                 **kwargs) -> Optional[UserRecord]:
+    # 原子地查重、分配id并加入存储，再发布注册事件；调用方已完成校验和密码哈希，用户名已被占用时返回None。
+    # deliver为False时事件只记入变更流，由调用方在合适的线程里调用change_feed.deliver_pending投递
     new_user = {
-        'id': len(users) + 1,
-        'username': username,       
-        'password': password,
+        'username': username,
+        'password': password_hash,
         'email': email,
         'mobile': phone,
         'age': age,
@@ -250,8 +854,46 @@ def register_user(
         'nickname': nickname,
         **kwargs
     }
-    users.append(new_user)
-    return {'success': True ,'message': '用户注册成功', 'user': new_user}
+    with user_store.locks.lock_for(username):
+        new_user = user_store.insert(new_user)
+        if new_user is not None:
+            change_feed.publish('register', username, new_user, deliver=False)
+    # 释放锁之后再投递，订阅者阻塞或写回存储时不会卡住持有该锁的写入方
+    if deliver:
+        change_feed.deliver_pending()
+    return new_user
+
+
+def bulk_register(rows: Iterable, header: Optional[List[str]] = None,
+                  processes: Optional[int] = None) -> Dict[str, Union[int, List]]:
+    """
+    批量注册用户
+
+    Args:
+        rows: 用户字典、JSONL文本行或CSV字段列表的可迭代对象
+        header: CSV表头(rows为字段列表时必填)
+        processes: 校验用的工作进程数，默认为CPU核数
+
+    Returns:
+        Dict: 导入结果，结构为:
+        {
+            'total': int,       # 处理的行数
+            'accepted': List,   # 注册成功的用户记录(UserRecord)
+            'errors': List      # 每个失败行的{'row': 行号, 'username': 用户名, 'message': 错误消息}
+        }
+
+    Examples:
+        >>> bulk_register([{'username': 'testuser', 'password': 'Pass1234',
+        ...                 'email': 'test@example.com', 'phone': '13812345678'}])
+        {'total': 1, 'accepted': [{...}], 'errors': []}
+    """
+    from user_bulk_import import bulk_register as _bulk_register
+    # 注册事件在加入存储时于同一把用户名锁内发布，之后对该用户的修改事件不会排到它前面
+    result = _bulk_register(user_store, rows, header=header, processes=processes,
+                            on_insert=lambda user: change_feed.publish('register', user['username'], user,
+                                                                       deliver=False))
+    change_feed.deliver_pending()
+    return result
 
 
 def login(username: str, password: str) -> Dict[str, Union[bool, str, Dict]]:
@@ -269,7 +911,7 @@ def login(username: str, password: str) -> Dict[str, Union[bool, str, Dict]]:
         {
             'success': bool,  # 登录是否成功
             'message': str,   # 结果消息
-            'user': Dict      # 用户信息(仅success为True时存在)
+            'user': Dict      # 用户信息(只读，不含密码，仅success为True时存在)
         }
 
     Examples:
@@ -281,7 +923,7 @@ def login(username: str, password: str) -> Dict[str, Union[bool, str, Dict]]:
     if not username or not password:
         return {'success': False, 'message': '用户名和密码不能为空'}
 
-    user = next((u for u in users if u['username'] == username), None)  #匹配用户名
+    user = user_store.get(username)  #匹配用户名
     # user = next((u for u in users if u['username'] == username), None)
 
     if not user:
@@ -289,21 +931,72 @@ def login(username: str, password: str) -> Dict[str, Union[bool, str, Dict]]:
     # if not user:
     #     return {'success': False, 'message': '用户名不存在'}
     
-    if user['password'] != password:
+    from user_password import hasher
+    if not hasher.verify(password, user['password']):
         return {'success': False, 'message': '密码不正确'}
     # if user['password'] != password:
     #     return {'success': False, 'message': '密码不正确'}
 
-    # 返回用户信息时移除密码字段
-    user_data = user.copy()
-    user_data.pop('password')
-    return {'success': True, 'message': '登录成功', 'user': user_data}
+    return _login_succeeded(user, password)
     # # 返回用户信息时移除密码字段
     # user_data = user.copy()
     # user_data.pop('password')
     # return {'success': True, 'message': '登录成功', 'user': user_data}
 
 
+
+def _migrate_password(user: User, password: str, stored: str, new_hash: str) -> None:
+    # 明文或迭代次数过低的密码在登录成功时透明地迁移为新哈希
+    from user_password import hasher
+    hasher.cache.add(password, new_hash)
+    with user_store.locks.lock_for(user['username']):
+        # 哈希期间密码已被修改时放弃迁移，不覆盖新密码
+        if user['password'] == stored:
+            user_store.update(user, password=new_hash)
+
+
+def _login_succeeded(user: User, password: str) -> Dict[str, Union[bool, str, Dict]]:
+    from user_password import hasher
+    stored = user['password']
+    if hasher.needs_rehash(stored):
+        _migrate_password(user, password, stored, hasher.hash(password))
+
+    # 返回记录缓存的只读视图(不含密码)，每次登录不再复制用户字典
+    return {'success': True, 'message': '登录成功', 'user': user.public}
+
+
+async def login_async(username: str, password: str) -> Dict[str, Union[bool, str, Dict]]:
+    """
+    用户登录验证的异步版本
+
+    密码哈希计算在user_password的线程池中执行，服务端可以同时处理多个登录而不阻塞事件循环。
+
+    Args:
+        username: 用户名
+        password: 密码
+
+    Returns:
+        Dict: 与login相同
+    """
+    if not username or not password:
+        return {'success': False, 'message': '用户名和密码不能为空'}
+
+    user = user_store.get(username)
+    if not user:
+        return {'success': False, 'message': '用户名不存在'}
+
+    import asyncio
+    from user_password import hasher
+    stored = user['password']
+    if not await hasher.verify_async(password, stored):
+        return {'success': False, 'message': '密码不正确'}
+    if hasher.needs_rehash(stored):
+        # 迁移用的哈希同样在线程池中计算，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        new_hash = await loop.run_in_executor(hasher.executor, hasher.hash, password)
+        _migrate_password(user, password, stored, new_hash)
+    return {'success': True, 'message': '登录成功', 'user': user.public}
+
 def change_password(username: str, old_password: str, new_password: str) -> Dict[str, Union[bool, str]]:
     """
     修改用户密码
@@ -333,15 +1026,26 @@ def change_password(username: str, old_password: str, new_password: str) -> Dict
     if not is_strong_password(new_password):
         return {'success': False, 'message': '新密码强度不足(需8位以上，包含大小写字母和数字)'}
 
-    user = next((u for u in users if u['username'] == username), None)
+    user = user_store.get(username)
 
     if not user:
         return {'success': False, 'message': '用户名不存在'}
 
-    if user['password'] != old_password:
+    from user_password import hasher
+    stored = user['password']
+    if not hasher.verify(old_password, stored):
         return {'success': False, 'message': '旧密码不正确'}
 
-    user['password'] = new_password
+    # 哈希在锁外计算，锁内确认密码在此期间没有被其他请求修改
+    new_hash = hasher.hash(new_password)
+    with user_store.locks.lock_for(username):
+        if user_store.get(username) is not user:
+            return {'success': False, 'message': '用户名不存在'}
+        if user['password'] != stored:
+            return {'success': False, 'message': '旧密码不正确'}
+        user_store.update(user, password=new_hash)
+        change_feed.publish('update', username, user, ['password'], deliver=False)
+    change_feed.deliver_pending()
     return {'success': True, 'message': '密码修改成功'}
 
 # def change_password(username: str, old_password: str, new_password: str) -> Dict[str, Union[bool, str]]:
@@ -384,6 +1088,82 @@ def change_password(username: str, old_password: str, new_password: str) -> Dict
 #     user['password'] = new_password
 #     return {'success': True, 'message': '密码修改成功'}
 
+def update_user_profile(username: str, **fields) -> Dict[str, Union[bool, str]]:
+    """
+    修改用户资料(不含用户名和密码)
+
+    Args:
+        username: 用户名
+        **fields: 要修改的资料字段，如email、mobile、age、gender、nickname
+
+    Returns:
+        Dict: 包含操作状态和消息的字典，结构为:
+        {
+            'success': bool,  # 操作是否成功
+            'message': str   # 结果消息
+        }
+
+    Examples:
+        >>> update_user_profile("testuser", age=20, gender="female")
+        {'success': True, 'message': '资料修改成功'}
+    """
+    if not fields:
+        return {'success': False, 'message': '没有要修改的字段'}
+
+    if any(key in fields for key in ('id', 'username', 'password')):
+        return {'success': False, 'message': '不能通过资料修改更改id、用户名或密码'}
+
+    if 'email' in fields and not is_valid_email(fields['email'] or ''):
+        return {'success': False, 'message': '邮箱格式无效'}
+
+    if 'mobile' in fields and not is_valid_phone(fields['mobile'] or ''):
+        return {'success': False, 'message': '手机号格式无效(需要11位数字)'}
+
+    with user_store.locks.lock_for(username):
+        user = user_store.get(username)
+
+        if not user:
+            return {'success': False, 'message': '用户名不存在'}
+
+        user_store.update(user, **fields)
+        change_feed.publish('update', username, user, sorted(fields), deliver=False)
+    change_feed.deliver_pending()
+    return {'success': True, 'message': '资料修改成功'}
+
+
+def delete_user(username: str) -> Dict[str, Union[bool, str]]:
+    """
+    删除用户
+
+    Args:
+        username: 用户名
+
+    Returns:
+        Dict: 包含操作状态和消息的字典，结构为:
+        {
+            'success': bool,  # 操作是否成功
+            'message': str   # 结果消息
+        }
+
+    Examples:
+        >>> delete_user("testuser")
+        {'success': True, 'message': '用户已删除'}
+    """
+    if not username:
+        return {'success': False, 'message': '用户名不能为空'}
+
+    with user_store.locks.lock_for(username):
+        user = user_store.get(username)
+
+        if not user:
+            return {'success': False, 'message': '用户名不存在'}
+
+        user_store.remove(user)
+        change_feed.publish('delete', username, user, deliver=False)
+    change_feed.deliver_pending()
+    return {'success': True, 'message': '用户已删除'}
+
+
 def is_adult(user: Dict) -> bool:
     """
     判断用户是否成年(≥18岁)
@@ -392,9 +1172,10 @@ def is_adult(user: Dict) -> bool:
         user: 用户字典
 
     Returns:
-        bool: 如果用户成年返回True，否则返回False
+        bool: 如果用户成年返回True，否则返回False(年龄缺失或无效时视为未成年，与批量统计一致)
     """
-    return user.get('age', 0) >= 18 if user.get('age') is not None else False
+    age = age_value(user.get('age'))
+    return age is not None and age >= ADULT_AGE
 
 # def is_adult(user: Dict) -> bool:
 #     """
@@ -415,7 +1196,7 @@ def count_adults() -> int:
     Returns:
         int: 成年用户数量
     """
-    return sum(1 for user in users if is_adult(user))
+    return user_store.get_stats().adults
 # def count_adults() -> int:
 #     """
 #     统计成年用户数量
@@ -433,7 +1214,7 @@ def count_minors() -> int:
     Returns:
         int: 未成年用户数量
     """
-    return sum(1 for user in users if not is_adult(user))
+    return user_store.get_stats().minors
 
 # def count_minors() -> int:
 #     """
@@ -445,6 +1226,16 @@ def count_minors() -> int:
 #     return sum(1 for user in users if not is_adult(user))
 
 
+def count_users_per_age_bucket() -> Dict[str, int]:
+    """
+    统计各年龄段的用户数量
+
+    Returns:
+        Dict[str, int]: 年龄段到用户数量的映射，如{'0-17': x, '18-24': y, ..., '60+': z, '未知': w}
+    """
+    return user_store.age_buckets()
+
+
 def get_gender_distribution() -> Dict[str, Dict[str, int]]:
     """
     获取性别分布统计(按成年/未成年分组)
@@ -456,22 +1247,7 @@ def get_gender_distribution() -> Dict[str, Dict[str, int]]:
             'minors': {'male': a, 'female': b}
         }
     """
-    result = {
-        'adults': {'male': 0, 'female': 0},
-        'minors': {'male': 0, 'female': 0}
-    }
-
-    for user in users:
-        gender = user.get('gender', '').lower()
-        if gender not in ['male', 'female']:
-            continue
-
-        if is_adult(user):
-            result['adults'][gender] += 1
-        else:
-            result['minors'][gender] += 1
-
-    return result
+    return user_store.get_stats().snapshot()['gender']
 # def get_gender_distribution() -> Dict[str, Dict[str, int]]:
 #     """
 #     获取性别分布统计(按成年/未成年分组)
@@ -511,7 +1287,7 @@ def contains_chinese(text: str) -> bool:
     Returns:
         bool: 如果包含中文字符返回True，否则返回False
     """
-    return any('\u4e00' <= char <= '\u9fff' for char in text)
+    return contains_cjk(text)
 # def contains_chinese(text: str) -> bool:
 #     """
 #     检查字符串是否包含中文字符
@@ -533,7 +1309,10 @@ def count_users_with_chinese_chars() -> int:
     Returns:
         int: 包含中文字符的用户名数量
     """
-    return sum(1 for user in users if contains_chinese(user.get('username', '')))
+    index = user_store.search_index(build=False)
+    if index is not None:
+        return index.count_cjk_usernames()
+    return user_store.get_stats().chinese
 # def count_users_with_chinese_chars() -> int:
 #     """
 #     统计用户名包含中文字符的用户数量
@@ -551,7 +1330,7 @@ def get_usernames_with_chinese() -> List[str]:
     Returns:
         List[str]: 包含中文字符的用户名列表
     """
-    return [user['username'] for user in users if contains_chinese(user.get('username', ''))]
+    return user_store.search_index().cjk_usernames()
 # def get_usernames_with_chinese() -> List[str]:
 #     """
 #     获取所有包含中文字符的用户名
@@ -593,12 +1372,7 @@ def list_unique_domains() -> List[str]:
     Returns:
         List[str]: 按字母排序的唯一域名列表
     """
-    domains = set()
-    for user in users:
-        domain = extract_domain(user.get('email', ''))
-        if domain:
-            domains.add(domain)
-    return sorted(domains)
+    return sorted(user_store.get_stats().domains)
 # def list_unique_domains() -> List[str]:
 #     """
 #     获取所有唯一的邮箱域名
@@ -620,12 +1394,7 @@ def count_users_per_domain() -> Dict[str, int]:
     Returns:
         Dict[str, int]: 域名到用户数量的映射字典
     """
-    domain_counts = {}
-    for user in users:
-        domain = extract_domain(user.get('email', ''))
-        if domain:
-            domain_counts[domain] = domain_counts.get(domain, 0) + 1
-    return domain_counts
+    return dict(user_store.get_stats().domains)
 # def count_users_per_domain() -> Dict[str, int]:
 #     """
 #     统计每个域名的用户数量
@@ -641,6 +1410,50 @@ def count_users_per_domain() -> Dict[str, int]:
 #     return domain_counts
 
 
+
+def get_top_domains(k: int = 5) -> List[tuple]:
+    """
+    获取用户数量最多的k个邮箱域名
+
+    直接在增量维护的域名计数上做堆选择，不对全部域名排序。
+
+    Args:
+        k: 返回的域名数
+
+    Returns:
+        List[tuple]: 按用户数量从多到少排列的(域名, 用户数量)列表
+
+    Examples:
+        >>> get_top_domains(3)
+        [('qq.com', 25), ('163.com', 18), ('gmail.com', 12)]
+    """
+    from user_domains import top_k
+    return top_k(user_store.get_stats().domains, k)
+
+
+def query_user_cube(group_by: Optional[List[str]] = None,
+                    where: Optional[Dict[str, str]] = None) -> Dict[tuple, int]:
+    """
+    按年龄分段、性别、邮箱域名、公司和地区的任意组合统计用户数
+
+    结果由预计算的统计立方体直接给出，不扫描用户列表。
+
+    Args:
+        group_by: 分组维度(age/gender/domain/company/region)，None表示不分组
+        where: 维度到取值的过滤条件
+
+    Returns:
+        Dict[tuple, int]: 分组值(按group_by顺序)到用户数的映射；不分组时键为()
+
+    Raises:
+        ValueError: 维度名无效
+
+    Examples:
+        >>> query_user_cube(['gender'], where={'region': '北京'})
+        {('male',): 3, ('female',): 2}
+    """
+    return user_store.cube().query(group_by or (), where)
+
 def get_usernames_by_domain(domain: str) -> List[str]:
     """
     获取指定域名的所有用户名
@@ -651,8 +1464,7 @@ def get_usernames_by_domain(domain: str) -> List[str]:
     Returns:
         List[str]: 属于该域名的用户名列表
     """
-    return [user['username'] for user in users
-            if extract_domain(user.get('email', '')) == domain.lower()]
+    return [user['username'] for user in user_store.find_by_domain(domain)]
 # def get_usernames_by_domain(domain: str) -> List[str]:
 #     """
 #     获取指定域名的所有用户名
@@ -667,7 +1479,69 @@ def get_usernames_by_domain(domain: str) -> List[str]:
 #             if extract_domain(user.get('email', '')) == domain.lower()]
 
 
-# 初始化时加载测试数据
-load_mocked_users()
+def check_stats_consistency() -> Dict[str, tuple]:
+    """
+    从头重新统计并与增量计数器比较
+
+    Returns:
+        Dict[str, tuple]: 不一致的统计项，值为(当前值, 重新计算的值)；一致时为空字典
+    """
+    user_store.wait_loaded()
+    return user_store.stats.verify(users)
+
+
+def find_users_by_mobile(phone: str) -> List[User]:
+    """
+    获取使用指定手机号的所有用户
+
+    Args:
+        phone: 手机号
+
+    Returns:
+        List[User]: 使用该手机号的用户列表
+    """
+    return user_store.find_by_mobile(phone)
+
+
+
+def search_users(query: str, field: Optional[str] = None, prefix: bool = False,
+                 limit: Optional[int] = 20) -> List[User]:
+    """
+    按用户名、姓名或昵称的子串或前缀查找用户(不区分大小写)
+
+    Args:
+        query: 查询字符串
+        field: 只在该字段(username/name/nickname)中查找，默认全部查找
+        prefix: 为True时按前缀匹配
+        limit: 最多返回的用户数，None表示不限制
+
+    Returns:
+        List[User]: 匹配的用户列表
+
+    Raises:
+        ValueError: 当field不是可搜索的字段时
+
+    Examples:
+        >>> search_users('张')
+        [{'username': '张伟', ...}, ...]
+    """
+    return user_store.search_index().search(query, field=field, prefix=prefix, limit=limit)
+
+def configure(filename: str) -> None:
+    """
+    设置用户数据文件路径
+
+    数据不会立即加载，而是在下一次访问用户数据时从新路径读取。
+
+    Args:
+        filename: JSON用户数据文件路径(同名的.usnap快照会被优先使用)
+    """
+    global DATA_FILE
+    DATA_FILE = filename
+    user_store.set_loader(lambda: load_mocked_users(DATA_FILE, background=True))
+
+
+# 导入时不加载数据，第一次访问用户数据时再在后台加载
+configure(DATA_FILE)
 # #初始化时加载测试数据
 # load_macked_users()
\ No newline at end of file
@@ -0,0 +1,243 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+# 哈希格式: pbkdf2_sha256$迭代次数$盐$摘要(盐和摘要为不带填充的base64)
+ALGORITHM = 'pbkdf2_sha256'
+# 默认迭代次数，可通过环境变量USER_PASSWORD_ITERATIONS调整计算成本
+DEFAULT_ITERATIONS = int(os.environ.get('USER_PASSWORD_ITERATIONS', '200000'))
+# 批量导入明文密码时使用的迭代次数，导入的哈希低于DEFAULT_ITERATIONS，首次登录时由needs_rehash升级
+IMPORT_ITERATIONS = int(os.environ.get('USER_IMPORT_PASSWORD_ITERATIONS', '64'))
+SALT_BYTES = 16
+# 最近验证成功记录的缓存容量
+CACHE_SIZE = 1024
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _split(stored: str) -> Optional[Tuple[int, bytes, bytes]]:
+    # 解析哈希字符串，不是本模块格式(如明文密码)时返回None
+    parts = stored.split('$')
+    if len(parts) != 4 or parts[0] != ALGORITHM:
+        return None
+    try:
+        return int(parts[1]), _b64decode(parts[2]), _b64decode(parts[3])
+    except ValueError:
+        return None
+
+
+def is_hashed(stored: str) -> bool:
+    """
+    判断存储的密码是否已经是哈希值
+
+    Args:
+        stored: 用户字典中的password字段
+
+    Returns:
+        bool: 是本模块生成的哈希返回True，明文密码返回False
+    """
+    return isinstance(stored, str) and _split(stored) is not None
+
+
+class VerifyCache:
+    """
+    最近验证成功记录的有界LRU缓存
+
+    键是用进程内随机密钥对(存储的哈希, 密码)计算的HMAC摘要，缓存里既没有明文密码，
+    也无法离线用来猜测密码；存储的哈希变化(修改密码、重新哈希)后旧记录自然失效。
+    只缓存验证成功的记录，错误密码每次都要完整计算，不会因缓存降低暴力破解成本。
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._key = os.urandom(32)
+        self._entries: 'OrderedDict[bytes, None]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, password: str, stored: str) -> bytes:
+        message = stored.encode('utf-8') + b'\0' + password.encode('utf-8')
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def hit(self, password: str, stored: str) -> bool:
+        """查询(密码, 哈希)是否最近验证成功过，命中时移到最近使用的位置"""
+        key = self._digest(password, stored)
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, password: str, stored: str) -> None:
+        """记录一次验证成功，超出容量时淘汰最久未使用的记录"""
+        if self.maxsize <= 0:
+            return
+        key = self._digest(password, stored)
+        with self._lock:
+            self._entries[key] = None
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PasswordHasher:
+    """
+    PBKDF2-SHA256密码哈希与验证
+
+    hashlib.pbkdf2_hmac在计算时释放GIL，submit/verify_many/verify_async把验证放到线程池中，
+    服务端可以同时验证多个登录请求而不阻塞事件循环。
+
+    Attributes:
+        iterations: 新生成哈希使用的迭代次数
+        cache: 最近验证成功记录的缓存
+    """
+
+    def __init__(self, iterations: int = DEFAULT_ITERATIONS, cache_size: int = CACHE_SIZE,
+                 max_workers: Optional[int] = None):
+        self.iterations = iterations
+        self.cache = VerifyCache(cache_size)
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def hash(self, password: str, iterations: Optional[int] = None) -> str:
+        """
+        生成密码哈希
+
+        Args:
+            password: 明文密码
+            iterations: 迭代次数，默认为self.iterations
+
+        Returns:
+            str: 形如pbkdf2_sha256$200000$盐$摘要的哈希字符串
+        """
+        iterations = iterations or self.iterations
+        salt = os.urandom(SALT_BYTES)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+        return f'{ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(digest)}'
+
+    def verify(self, password: str, stored: str) -> bool:
+        """
+        验证密码，兼容尚未迁移的明文密码
+
+        Args:
+            password: 用户输入的密码
+            stored: 用户字典中的password字段(哈希或明文)
+
+        Returns:
+            bool: 密码正确返回True，否则返回False
+        """
+        if not isinstance(stored, str) or not isinstance(password, str):
+            return False
+        parts = _split(stored)
+        if parts is None:
+            return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+        if self.cache.hit(password, stored):
+            return True
+        iterations, salt, expected = parts
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+        if not hmac.compare_digest(digest, expected):
+            return False
+        self.cache.add(password, stored)
+        return True
+
+    def needs_rehash(self, stored: str) -> bool:
+        """
+        判断存储的密码是否需要重新哈希(明文或迭代次数低于当前设置)
+
+        Args:
+            stored: 用户字典中的password字段
+
+        Returns:
+            bool: 需要重新哈希返回True
+        """
+        parts = _split(stored) if isinstance(stored, str) else None
+        return parts is None or parts[0] < self.iterations
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """验证用的线程池，第一次使用时创建"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self._max_workers, thread_name_prefix='password-verify')
+        return self._executor
+
+    def submit(self, password: str, stored: str) -> 'Future[bool]':
+        """
+        在线程池中验证密码
+
+        Args:
+            password: 用户输入的密码
+            stored: 用户字典中的password字段
+
+        Returns:
+            Future[bool]: 验证结果
+        """
+        return self.executor.submit(self.verify, password, stored)
+
+    def verify_many(self, pairs: Iterable[Tuple[str, str]]) -> List[bool]:
+        """
+        并发验证多组(密码, 存储的密码)
+
+        Args:
+            pairs: (用户输入的密码, password字段)的可迭代对象
+
+        Returns:
+            List[bool]: 与输入顺序一致的验证结果
+        """
+        futures = [self.submit(password, stored) for password, stored in pairs]
+        return [future.result() for future in futures]
+
+    async def verify_async(self, password: str, stored: str) -> bool:
+        """
+        在事件循环中等待线程池完成验证
+
+        Args:
+            password: 用户输入的密码
+            stored: 用户字典中的password字段
+
+        Returns:
+            bool: 密码正确返回True，否则返回False
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.verify, password, stored)
+
+    def shutdown(self) -> None:
+        """关闭线程池"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+hasher = PasswordHasher()
+
+
+def hash_password(password: str, iterations: Optional[int] = None) -> str:
+    """用默认哈希器生成密码哈希，iterations默认为哈希器的迭代次数"""
+    return hasher.hash(password, iterations)
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """用默认哈希器验证密码"""
+    return hasher.verify(password, stored)
@@ -0,0 +1,158 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional
+
+# 常用字段各占一个槽位(顺序与2-mocked-users.json一致)，其他字段放在_extra字典中
+FIELDS = ('id', 'name', 'username', 'email', 'mobile', 'age', 'gender', 'address', 'company', 'password',
+          'nickname')
+_FIELD_SET = frozenset(FIELDS)
+# 对外视图中不包含的字段
+PRIVATE_FIELDS = frozenset({'password'})
+
+# 槽位未设置的标记，区分"字段不存在"和"字段值为None"
+_MISSING = object()
+
+
+class PublicView(dict):
+    """
+    用户信息的只读视图(不含密码)
+
+    是dict的子类，可直接序列化为JSON、打印格式与普通字典相同，但所有修改方法都会抛出TypeError。
+    同一个用户的视图只创建一次，被所有登录响应共享。
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('用户信息视图是只读的')
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return PublicView, (dict(self),)
+
+    def __copy__(self) -> Dict:
+        return dict(self)
+
+    def copy(self) -> Dict:
+        """返回可修改的普通字典副本"""
+        return dict(self)
+
+
+class UserRecord(Mapping):
+    """
+    基于__slots__的不可变用户记录
+
+    实现只读的Mapping接口，原先读取用户字典的代码(user['username']、user.get('age')、
+    dict(user))无需修改；常用字段也可以作为属性读取(user.username)。
+    调用方不能修改记录，字段修改只能由UserStore通过_update完成，修改后缓存的对外视图随之失效。
+    与普通字典相比每个用户的内存占用也更小。
+
+    Attributes:
+        public: 不含密码的只读视图，第一次访问时创建并缓存
+    """
+
+    __slots__ = FIELDS + ('_extra', '_public')
+
+    def __init__(self, data: Mapping):
+        setter = object.__setattr__
+        for field in FIELDS:
+            setter(self, field, data.get(field, _MISSING))
+        extra = {key: value for key, value in data.items() if key not in _FIELD_SET}
+        setter(self, '_extra', extra or None)
+        setter(self, '_public', None)
+
+    @classmethod
+    def of(cls, user: Mapping) -> 'UserRecord':
+        """把用户字典转换为记录，已经是记录时原样返回"""
+        return user if type(user) is cls else cls(user)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('用户记录是不可变的')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError('用户记录是不可变的')
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            value = object.__getattribute__(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            value = object.__getattribute__(self, key)
+            return default if value is _MISSING else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELD_SET:
+            return object.__getattribute__(self, key) is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for field in FIELDS:
+            if object.__getattribute__(self, field) is not _MISSING:
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        count = sum(object.__getattribute__(self, field) is not _MISSING for field in FIELDS)
+        return count + (len(self._extra) if self._extra is not None else 0)
+
+    def __repr__(self) -> str:
+        return f'UserRecord({self.to_dict()!r})'
+
+    def __reduce__(self):
+        return UserRecord, (self.to_dict(),)
+
+    @property
+    def public(self) -> PublicView:
+        """不含密码的只读视图，修改前一直复用同一个对象"""
+        view = self._public
+        if view is None:
+            view = PublicView((key, value) for key, value in self.items() if key not in PRIVATE_FIELDS)
+            object.__setattr__(self, '_public', view)
+        return view
+
+    def to_dict(self) -> Dict[str, Any]:
+        """返回可修改的普通字典副本(含密码)"""
+        return dict(self.items())
+
+    def _update(self, fields: Dict[str, Any]) -> None:
+        # 仅供UserStore调用: 原地修改字段并丢弃缓存的对外视图，保持存储中各索引引用的对象不变
+        setter = object.__setattr__
+        for key, value in fields.items():
+            if key in _FIELD_SET:
+                setter(self, key, value)
+            else:
+                extra = self._extra
+                if extra is None:
+                    extra = {}
+                    setter(self, '_extra', extra)
+                extra[key] = value
+        setter(self, '_public', None)
+
+
+def public_view(user: Optional[Mapping]) -> Optional[Dict]:
+    """
+    获取用户的只读对外视图
+
+    Args:
+        user: 用户记录或用户字典
+
+    Returns:
+        Optional[Dict]: 不含密码的只读视图，user为None时返回None
+    """
+    if user is None:
+        return None
+    if isinstance(user, UserRecord):
+        return user.public
+    return PublicView((key, value) for key, value in user.items() if key not in PRIVATE_FIELDS)
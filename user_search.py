@@ -0,0 +1,364 @@
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 建立索引的字段
+SEARCH_FIELDS = ('username', 'name', 'nickname')
+# 非中文文本的n-gram长度
+GRAM_SIZE = 3
+# 中文文本的n-gram长度(中文名一般只有2-3个字)
+CJK_GRAM_SIZE = 2
+# 前缀查询用的有序字段值列表中每块的最大项数，插入和删除只移动一个块内的元素
+BLOCK_SIZE = 1024
+
+_CJK_RE = re.compile('[\u4e00-\u9fff]')
+
+
+def contains_cjk(text: str) -> bool:
+    """检查字符串是否包含中文字符"""
+    return _CJK_RE.search(text) is not None
+
+
+def _grams(text: str) -> set:
+    # 所有文本取三元组；含中文的文本再加上二元组和单个中文字符，
+    # 这样两三个字的中文名和单字姓氏查询都能命中索引
+    grams = {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+    if 0 < len(text) < GRAM_SIZE:
+        # 短于三元组的值整体作为一个键，短查询合并倒排表时才能找到它
+        grams.add(text)
+    if contains_cjk(text):
+        grams.update(text[i:i + CJK_GRAM_SIZE] for i in range(len(text) - CJK_GRAM_SIZE + 1))
+        grams.update(_CJK_RE.findall(text))
+    return grams
+
+
+def _doc_grams(values: Tuple[str, ...]) -> set:
+    # 一个文档所有字段值的n-gram
+    grams = set()
+    for value in values:
+        grams |= _grams(value)
+    return grams
+
+
+def _query_grams(query: str) -> Optional[List[str]]:
+    # 返回查询可用的索引键，查询过短无法命中索引时返回None
+    if contains_cjk(query):
+        if len(query) >= CJK_GRAM_SIZE:
+            return [query[i:i + CJK_GRAM_SIZE] for i in range(len(query) - CJK_GRAM_SIZE + 1)]
+        return [query]
+    if len(query) >= GRAM_SIZE:
+        return [query[i:i + GRAM_SIZE] for i in range(len(query) - GRAM_SIZE + 1)]
+    return None
+
+
+class _SortedValues:
+    """
+    按字段值排序的(字段值, 文档编号)序列
+
+    分成若干有序块，每块不超过BLOCK_SIZE项，blocks为(各块字段值, 各块文档编号, 各块最大值)。
+    插入和删除只修改一个块；块分裂或删空时整体替换blocks，无锁的查询先取出blocks再遍历，
+    总能看到一致的块划分。块内先插入文档编号再插入字段值、先删除字段值再删除文档编号，
+    查询按字段值的下标取文档编号不会越界。
+    """
+
+    __slots__ = ('blocks',)
+
+    def __init__(self, pairs: List[Tuple[str, int]]):
+        # pairs已按(字段值, 文档编号)排序，初始每块半满，留出插入的空间
+        step = BLOCK_SIZE // 2
+        chunks = [pairs[i:i + step] for i in range(0, len(pairs), step)]
+        self.blocks: Tuple[List[List[str]], List[List[int]], List[str]] = (
+            [[value for value, _ in chunk] for chunk in chunks],
+            [[doc for _, doc in chunk] for chunk in chunks],
+            [chunk[-1][0] for chunk in chunks],
+        )
+
+    def insert(self, value: str, doc: int) -> None:
+        values, docs, maxes = self.blocks
+        if not values:
+            self.blocks = ([[value]], [[doc]], [value])
+            return
+        i = min(bisect_left(maxes, value), len(values) - 1)
+        block_values, block_docs = values[i], docs[i]
+        j = bisect_left(block_values, value)
+        block_docs.insert(j, doc)
+        block_values.insert(j, value)
+        maxes[i] = block_values[-1]
+        if len(block_values) > BLOCK_SIZE:
+            half = len(block_values) // 2
+            self.blocks = (
+                values[:i] + [block_values[:half], block_values[half:]] + values[i + 1:],
+                docs[:i] + [block_docs[:half], block_docs[half:]] + docs[i + 1:],
+                maxes[:i] + [block_values[half - 1], block_values[-1]] + maxes[i + 1:],
+            )
+
+    def remove(self, value: str, doc: int) -> None:
+        values, docs, maxes = self.blocks
+        i = bisect_left(maxes, value)
+        while i < len(values):
+            block_values, block_docs = values[i], docs[i]
+            j = bisect_left(block_values, value)
+            while j < len(block_values) and block_values[j] == value:
+                if block_docs[j] == doc:
+                    del block_values[j]
+                    del block_docs[j]
+                    if not block_values:
+                        self.blocks = (values[:i] + values[i + 1:], docs[:i] + docs[i + 1:],
+                                       maxes[:i] + maxes[i + 1:])
+                    else:
+                        maxes[i] = block_values[-1]
+                    return
+                j += 1
+            if j < len(block_values):
+                return
+            i += 1
+
+    def prefix(self, query: str) -> Iterable[int]:
+        values, docs, maxes = self.blocks
+        for i in range(bisect_left(maxes, query), len(values)):
+            block_values, block_docs = values[i], docs[i]
+            for j in range(bisect_left(block_values, query), len(block_values)):
+                if not block_values[j].startswith(query):
+                    return
+                yield block_docs[j]
+
+
+class NgramIndex:
+    """
+    用户名、姓名和昵称的n-gram倒排索引
+
+    每个用户对应一个文档编号，倒排表保存包含某个n-gram的文档编号(array('I'))。
+    子串查询取查询中倒排表最短的n-gram作为候选，再用保存的小写字段值逐个核对，
+    删除和修改用户时同步从倒排表中去掉不再包含的编号，删空的倒排表直接删除；
+    前缀查询在分块的有序字段值列表上二分查找。
+    用户名含中文字符的文档记录在位图中，计数时直接统计位图中1的个数。
+    查询不区分大小写。
+    """
+
+    def __init__(self, user_list: Iterable[Dict] = ()):
+        self._users: List[Optional[Dict]] = []
+        self._values: List[Optional[Tuple[str, ...]]] = []
+        self._doc_of: Dict[int, int] = {}
+        self._postings: Dict[str, array] = {}
+        self._sorted = _SortedValues([])
+        self._cjk = bytearray()
+        self._build(user_list)
+
+    def __len__(self) -> int:
+        return len(self._doc_of)
+
+    @staticmethod
+    def _fields(user: Dict) -> Tuple[str, ...]:
+        return tuple(str(user.get(field) or '').lower() for field in SEARCH_FIELDS)
+
+    def _set_cjk(self, doc: int, flag: bool) -> None:
+        byte, bit = divmod(doc, 8)
+        if byte >= len(self._cjk):
+            self._cjk.extend(bytes(byte - len(self._cjk) + 1))
+        if flag:
+            self._cjk[byte] |= 1 << bit
+        else:
+            self._cjk[byte] &= ~(1 << bit) & 0xFF
+
+    def _post(self, doc: int, grams: Iterable[str]) -> None:
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array('I', (doc,))
+            else:
+                posting.append(doc)
+
+    def _unpost(self, doc: int, grams: Iterable[str]) -> None:
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                continue
+            try:
+                posting.remove(doc)
+            except ValueError:
+                continue
+            if not posting:
+                del postings[gram]
+
+    def _build(self, user_list: Iterable[Dict]) -> None:
+        pairs = []
+        for user in user_list:
+            doc = len(self._users)
+            values = self._fields(user)
+            self._users.append(user)
+            self._values.append(values)
+            self._doc_of[id(user)] = doc
+            self._post(doc, _doc_grams(values))
+            self._set_cjk(doc, contains_cjk(values[0]))
+            pairs.extend((value, doc) for value in values if value)
+        pairs.sort()
+        self._sorted = _SortedValues(pairs)
+
+    def add(self, user: Dict) -> None:
+        """
+        把新用户加入索引
+
+        Args:
+            user: 用户字典
+        """
+        doc = len(self._users)
+        values = self._fields(user)
+        self._users.append(user)
+        self._values.append(values)
+        self._doc_of[id(user)] = doc
+        self._post(doc, _doc_grams(values))
+        self._set_cjk(doc, contains_cjk(values[0]))
+        for value in values:
+            if value:
+                self._sorted.insert(value, doc)
+
+    def update(self, user: Dict) -> None:
+        """
+        用户的用户名、姓名或昵称修改后重新索引
+
+        只增删新旧字段值之间不同的n-gram和排序项。
+
+        Args:
+            user: 已在索引中的用户字典
+        """
+        doc = self._doc_of.get(id(user))
+        if doc is None:
+            self.add(user)
+            return
+        old = self._values[doc]
+        values = self._fields(user)
+        if values == old:
+            return
+        self._values[doc] = values
+        old_grams, grams = _doc_grams(old), _doc_grams(values)
+        self._post(doc, grams - old_grams)
+        self._unpost(doc, old_grams - grams)
+        self._set_cjk(doc, contains_cjk(values[0]))
+        # 每个非空字段在有序列表中各有一项
+        for value, before in zip(values, old):
+            if value != before:
+                if value:
+                    self._sorted.insert(value, doc)
+                if before:
+                    self._sorted.remove(before, doc)
+
+    def remove(self, user: Dict) -> None:
+        """
+        把用户从索引中删除
+
+        Args:
+            user: 已在索引中的用户字典
+        """
+        doc = self._doc_of.pop(id(user), None)
+        if doc is None:
+            return
+        values = self._values[doc]
+        self._users[doc] = None
+        self._values[doc] = None
+        self._set_cjk(doc, False)
+        self._unpost(doc, _doc_grams(values))
+        for value in values:
+            if value:
+                self._sorted.remove(value, doc)
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        grams = _query_grams(query)
+        if grams is None:
+            # 查询短于n-gram长度时，合并所有包含该查询的n-gram的倒排表；
+            # 遍历字典的快照，并发注册加入新的n-gram时不会出错
+            seen = set()
+            for gram, posting in list(self._postings.items()):
+                if query in gram:
+                    for doc in posting:
+                        if doc not in seen:
+                            seen.add(doc)
+                            yield doc
+            return
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return
+            postings.append(posting)
+        yield from min(postings, key=len)
+
+    def search(self, query: str, field: Optional[str] = None, prefix: bool = False,
+               limit: Optional[int] = 20) -> List[Dict]:
+        """
+        按子串或前缀查找用户
+
+        Args:
+            query: 查询字符串(不区分大小写)
+            field: 只在该字段中查找，默认查找username、name和nickname
+            prefix: 为True时按前缀匹配，否则按子串匹配
+            limit: 最多返回的用户数，None表示不限制
+
+        Returns:
+            List[Dict]: 匹配的用户字典列表
+
+        Raises:
+            ValueError: 当field不是可搜索的字段时
+        """
+        query = query.lower()
+        if field is None:
+            fields = range(len(SEARCH_FIELDS))
+        elif field in SEARCH_FIELDS:
+            position = SEARCH_FIELDS.index(field)
+            fields = range(position, position + 1)
+        else:
+            raise ValueError(f'不支持搜索的字段: {field}')
+        if not query:
+            return []
+
+        if prefix:
+            candidates = self._prefix_docs(query)
+        else:
+            candidates = self._candidates(query)
+
+        result = []
+        seen = set()
+        all_values = self._values
+        for doc in candidates:
+            values = all_values[doc]
+            if values is None or doc in seen:
+                continue
+            if prefix:
+                matched = any(values[i].startswith(query) for i in fields)
+            elif len(fields) == 1:
+                matched = query in values[fields[0]]
+            else:
+                # 字段值中不会出现\0，拼接后一次子串查找即可覆盖全部字段
+                matched = query in '\0'.join(values)
+            if not matched:
+                continue
+            seen.add(doc)
+            result.append(self._users[doc])
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def _prefix_docs(self, query: str) -> Iterable[int]:
+        return self._sorted.prefix(query)
+
+    def count_cjk_usernames(self) -> int:
+        """统计用户名含中文字符的用户数量(位图中1的个数)"""
+        return int.from_bytes(self._cjk, 'little').bit_count()
+
+    def cjk_usernames(self) -> List[str]:
+        """
+        获取所有含中文字符的用户名
+
+        Returns:
+            List[str]: 用户名列表，按加入索引的顺序排列
+        """
+        result = []
+        users = self._users
+        for byte_index, byte in enumerate(self._cjk):
+            while byte:
+                low = byte & -byte
+                result.append(users[byte_index * 8 + low.bit_length() - 1]['username'])
+                byte ^= low
+        return result
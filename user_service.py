@@ -0,0 +1,291 @@
+"""
+用户管理HTTP服务
+
+在user_management_full的内存存储之上提供注册、登录、修改密码和统计接口:
+
+    uvicorn user_service:app --port 8000
+
+读请求不加锁: 统计接口读取写入方每批提交后整体替换的只读快照，登录直接查用户名索引。
+写请求放入队列，由唯一的写入任务按微批次依次应用；密码哈希等耗时计算在进入队列前
+于线程池中完成，写入任务应用一个批次时不会让出事件循环，读请求不会看到写了一半的状态。
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+import user_management_full as m
+from user_domains import top_k
+from user_password import hasher
+
+# 写入任务每批最多应用的写请求数
+MAX_BATCH = 256
+
+logger = logging.getLogger(__name__)
+
+
+class RegisterRequest(BaseModel):
+    username: str
+    password: str
+    email: str
+    phone: str
+    nickname: Optional[str] = None
+    age: Optional[int] = None
+    gender: Optional[str] = None
+
+
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+
+class ChangePasswordRequest(BaseModel):
+    username: str
+    old_password: str
+    new_password: str
+
+
+class StoreState:
+    """
+    供读请求使用的只读状态
+
+    stats是统计值的快照，生成后不再修改；写入任务每提交一个批次就生成新快照并整体替换引用，
+    读请求拿到的引用在整个请求期间保持一致。
+
+    Attributes:
+        stats: 统计快照(与UserStats.snapshot()结构相同，另含total和batches)
+    """
+
+    def __init__(self):
+        self.stats: Dict = {}
+        self.batches = 0
+
+    def refresh(self) -> None:
+        """根据存储当前的计数器生成新快照"""
+        snapshot = m.user_store.get_stats().snapshot()
+        snapshot['total'] = snapshot['adults'] + snapshot['minors']
+        snapshot['batches'] = self.batches
+        self.stats = snapshot
+
+
+class WriteBatcher:
+    """
+    单写入任务的写请求合并器
+
+    请求方把(操作, 参数)放入队列并等待结果；写入任务取到第一个请求后把队列中已有的请求
+    一并取出(最多MAX_BATCH个)，按到达顺序应用，然后只刷新一次统计快照。
+    """
+
+    def __init__(self, state: StoreState, max_batch: int = MAX_BATCH):
+        self.state = state
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # 尚未完成的事件投递(线程池中的deliver_pending)
+        self._deliveries: set = set()
+
+    def start(self) -> None:
+        """在当前事件循环中启动写入任务"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name='user-writer')
+
+    async def stop(self) -> None:
+        """停止写入任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+    async def submit(self, op: str, *args) -> Any:
+        """
+        提交一个写请求并等待写入任务应用
+
+        Args:
+            op: 操作名(WriteBatcher中对应的_apply_<op>方法)
+            *args: 操作参数
+
+        Returns:
+            操作结果
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, args, future))
+        return await future
+
+    def submit_nowait(self, op: str, *args) -> None:
+        """提交一个不需要等待结果的写请求"""
+        self._queue.put_nowait((op, args, None))
+
+    async def _run(self) -> None:
+        while True:
+            batch: List[Tuple] = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            for op, args, future in batch:
+                try:
+                    result = getattr(self, f'_apply_{op}')(*args)
+                except Exception as e:
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+                    continue
+                if future is not None and not future.done():
+                    future.set_result(result)
+            self.state.batches += 1
+            # 批次已经应用，之后的失败只记录日志，写入任务继续运行，后续的submit不会一直等待
+            try:
+                self.state.refresh()
+            except Exception:
+                logger.exception('写入批次后刷新统计快照失败')
+            try:
+                # 本批次的事件在线程池中投递: 'block'订阅者队列满时不阻塞事件循环，
+                # 订阅者处理事件时再通过本服务写回也不会与写入任务互相等待
+                delivery = asyncio.get_running_loop().run_in_executor(None, m.change_feed.deliver_pending)
+            except Exception:
+                logger.exception('投递变更事件失败')
+                continue
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._delivered)
+
+    def _delivered(self, delivery: asyncio.Future) -> None:
+        self._deliveries.discard(delivery)
+        if not delivery.cancelled() and delivery.exception() is not None:
+            logger.error('投递变更事件失败', exc_info=delivery.exception())
+
+    @staticmethod
+    def _apply_register(request: RegisterRequest, password_hash: str) -> Dict:
+        # 用户名唯一性必须在写入时检查，两个同名注册可能在同一批次中
+        user = m._create_user(request.username, password_hash, request.email, request.phone,
+                              request.nickname, request.age, request.gender, deliver=False)
+        if user is None:
+            return {'success': False, 'message': '用户名已被使用'}
+        return {'success': True, 'message': '用户注册成功', 'user': user.public}
+
+    @staticmethod
+    def _apply_set_password(username: str, expected: str, password_hash: str, publish: bool) -> Dict:
+        # expected是验证旧密码时读到的哈希，其间密码已被修改时放弃本次修改
+        user = m.user_store.get(username)
+        if not user:
+            return {'success': False, 'message': '用户名不存在'}
+        if user['password'] != expected:
+            return {'success': False, 'message': '旧密码不正确'}
+        m.user_store.update(user, password=password_hash)
+        if publish:
+            m.change_feed.publish('update', username, user, ['password'], deliver=False)
+        return {'success': True, 'message': '密码修改成功'}
+
+
+async def _run_in_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(hasher.executor, func, *args)
+
+
+async def _migrate_password(username: str, password: str, stored: str) -> None:
+    password_hash = await _run_in_pool(hasher.hash, password)
+    hasher.cache.add(password, password_hash)
+    writer.submit_nowait('set_password', username, stored, password_hash, False)
+
+
+state = StoreState()
+writer = WriteBatcher(state)
+# 持有后台任务的引用，避免任务在完成前被回收
+_background_tasks = set()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时等待数据加载完成并生成第一个统计快照
+    await asyncio.to_thread(m.user_store.wait_loaded)
+    state.refresh()
+    writer.start()
+    yield
+    await writer.stop()
+
+
+app = FastAPI(title="用户管理服务", description="基于user_management_full内存存储的用户管理API", lifespan=lifespan)
+
+
+@app.post("/users/register")
+async def register(request: RegisterRequest):
+    error = m._check_registration(request.username, request.password, request.email, request.phone,
+                                  check_taken=False)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    password_hash = await _run_in_pool(hasher.hash, request.password)
+    result = await writer.submit('register', request, password_hash)
+    if not result['success']:
+        raise HTTPException(status_code=400, detail=result['message'])
+    return result
+
+
+@app.post("/users/login")
+async def login(request: LoginRequest):
+    if not request.username or not request.password:
+        raise HTTPException(status_code=400, detail="用户名和密码不能为空")
+    user = m.user_store.get(request.username)
+    if not user:
+        raise HTTPException(status_code=401, detail="用户名不存在")
+    stored = user['password']
+    if not await hasher.verify_async(request.password, stored):
+        raise HTTPException(status_code=401, detail="密码不正确")
+    if hasher.needs_rehash(stored):
+        # 明文或低迭代次数的密码在后台迁移，不阻塞本次登录
+        task = asyncio.create_task(_migrate_password(request.username, request.password, stored))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return {'success': True, 'message': '登录成功', 'user': user.public}
+
+
+@app.post("/users/change-password")
+async def change_password(request: ChangePasswordRequest):
+    if not request.username or not request.old_password or not request.new_password:
+        raise HTTPException(status_code=400, detail="所有字段不能为空")
+    if request.old_password == request.new_password:
+        raise HTTPException(status_code=400, detail="新密码不能与旧密码相同")
+    if not m.is_strong_password(request.new_password):
+        raise HTTPException(status_code=400, detail="新密码强度不足(需8位以上，包含大小写字母和数字)")
+    user = m.user_store.get(request.username)
+    if not user:
+        raise HTTPException(status_code=404, detail="用户名不存在")
+    stored = user['password']
+    if not await hasher.verify_async(request.old_password, stored):
+        raise HTTPException(status_code=401, detail="旧密码不正确")
+    password_hash = await _run_in_pool(hasher.hash, request.new_password)
+    result = await writer.submit('set_password', request.username, stored, password_hash, True)
+    if not result['success']:
+        raise HTTPException(status_code=409, detail=result['message'])
+    return result
+
+
+@app.get("/stats")
+async def stats():
+    return state.stats
+
+
+@app.get("/stats/age")
+async def stats_age():
+    snapshot = state.stats
+    return {'adults': snapshot['adults'], 'minors': snapshot['minors']}
+
+
+@app.get("/stats/gender")
+async def stats_gender():
+    return state.stats['gender']
+
+
+@app.get("/stats/domains")
+async def stats_domains(top: Optional[int] = None):
+    domains = state.stats['domains']
+    if top is None:
+        return domains
+    return [{'domain': domain, 'count': count} for domain, count in top_k(domains, top)]
+
+
+@app.get("/stats/chinese")
+async def stats_chinese():
+    return {'count': state.stats['chinese']}
@@ -0,0 +1,361 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import traceback
+import zlib
+from typing import Dict, Iterable, List, Optional, Union
+
+from user_validators import validators
+
+# 加载时每批发送给一个分片的用户数
+BATCH_SIZE = 5000
+# 每个分片最多积压的未确认批次，超过后先读取确认，避免双方都阻塞在管道写入上
+MAX_PENDING = 8
+
+
+def shard_of(username: str, shards: int) -> int:
+    """
+    计算用户名所属的分片
+
+    Args:
+        username: 用户名
+        shards: 分片数
+
+    Returns:
+        int: 分片编号(0到shards-1)
+    """
+    return zlib.crc32(str(username).encode('utf-8')) % shards
+
+
+def _serve_shard(conn) -> None:
+    # 工作进程入口: 模块级user_store就是本分片的存储，点查询和统计直接复用
+    # user_management_full中的函数。
+    # 各分片的变更流序号各自独立，不能写入同一个USER_CHANGE_LOG，分片进程中不启用持久化日志
+    # (fork启动时模块可能已在父进程中导入并打开了日志，也一并关闭)
+    os.environ.pop('USER_CHANGE_LOG', None)
+    import user_management_full as m
+    from user_password import hash_password
+
+    m.change_feed.close()
+    store = m.user_store
+    store.set_loader(None)
+    store.load([])
+
+    def extend(batch):
+        for user in batch:
+            store.add(user)
+        return len(batch)
+
+    def register(user):
+        if store.has_username(user['username']):
+            return {'success': False, 'message': '用户名已被使用'}
+        user = store.insert(dict(user, password=hash_password(user['password'])))
+        if user is None:
+            return {'success': False, 'message': '用户名已被使用'}
+        return {'success': True, 'message': '用户注册成功', 'user': user.public}
+
+    def get_user(username):
+        user = store.get(username)
+        return None if user is None else user.public
+
+    handlers = {
+        'extend': extend,
+        'register': register,
+        'login': m.login,
+        'change_password': m.change_password,
+        'get_user': get_user,
+        'stats': lambda: store.stats.snapshot(),
+        'count': lambda: len(store.users),
+        'usernames_by_domain': m.get_usernames_by_domain,
+    }
+    while True:
+        try:
+            op, args = conn.recv()
+        except EOFError:
+            return
+        if op == 'stop':
+            conn.send(('ok', None))
+            return
+        try:
+            conn.send(('ok', handlers[op](*args)))
+        except Exception:
+            conn.send(('error', traceback.format_exc()))
+
+
+class ShardedUserStore:
+    """
+    按用户名哈希分片的多进程用户存储
+
+    每个分片是一个独立的工作进程，各自持有UserStore(用户名、域名、手机号索引和统计计数器)，
+    通过管道接收命令。点操作(登录、注册、修改密码)按用户名的CRC32路由到单个分片，
+    统计查询同时发给所有分片并合并结果，密码哈希计算也分散在各分片进程中。
+
+    Attributes:
+        shards: 分片数
+    """
+
+    def __init__(self, shards: int = 4):
+        if shards < 1:
+            raise ValueError('分片数必须大于0')
+        self.shards = shards
+        self._next_id = 1
+        self._id_lock = threading.Lock()
+        self._conns = []
+        self._locks = []
+        self._processes = []
+        for index in range(shards):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_shard, args=(child_conn,),
+                                              name=f'user-shard-{index}', daemon=True)
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+        atexit.register(self.close)
+
+    def __enter__(self) -> 'ShardedUserStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @staticmethod
+    def _result(index: int, op: str, reply):
+        status, value = reply
+        if status != 'ok':
+            raise RuntimeError(f'分片{index}执行{op}失败:\n{value}')
+        return value
+
+    def _call(self, index: int, op: str, *args):
+        with self._locks[index]:
+            self._conns[index].send((op, args))
+            return self._result(index, op, self._conns[index].recv())
+
+    def _fanout(self, op: str, *args) -> List:
+        # 先把命令发给所有分片再依次收取结果，各分片并行执行
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            for conn in self._conns:
+                conn.send((op, args))
+            return [self._result(index, op, conn.recv()) for index, conn in enumerate(self._conns)]
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+    def _route(self, username: str) -> int:
+        return shard_of(username, self.shards)
+
+    def load(self, user_iter: Iterable[Dict], batch_size: int = BATCH_SIZE) -> int:
+        """
+        把用户按用户名分发到各分片
+
+        Args:
+            user_iter: 产出用户字典的可迭代对象
+            batch_size: 每批发送给一个分片的用户数
+
+        Returns:
+            int: 加载的用户数
+        """
+        batches = [[] for _ in range(self.shards)]
+        pending = [0] * self.shards
+        total = 0
+        max_id = 0
+
+        def send(index):
+            conn = self._conns[index]
+            if pending[index] >= MAX_PENDING:
+                self._result(index, 'extend', conn.recv())
+                pending[index] -= 1
+            conn.send(('extend', (batches[index],)))
+            pending[index] += 1
+            batches[index] = []
+
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            for user in user_iter:
+                index = self._route(user.get('username'))
+                batches[index].append(user)
+                total += 1
+                user_id = user.get('id')
+                if type(user_id) is int and user_id > max_id:
+                    max_id = user_id
+                if len(batches[index]) >= batch_size:
+                    send(index)
+            for index, batch in enumerate(batches):
+                if batch:
+                    send(index)
+            for index, conn in enumerate(self._conns):
+                for _ in range(pending[index]):
+                    self._result(index, 'extend', conn.recv())
+        finally:
+            for lock in self._locks:
+                lock.release()
+        # 新用户的id从已有的最大id之后分配，数据中的id不连续或不从1开始也不会重复
+        with self._id_lock:
+            self._next_id = max(self._next_id, max_id + 1)
+        return total
+
+    def load_file(self, filename: str) -> int:
+        """
+        流式读取JSON用户数据文件并分发到各分片
+
+        Args:
+            filename: 2-mocked-users.json格式的数据文件
+
+        Returns:
+            int: 加载的用户数
+        """
+        from user_loader import iter_users
+        return self.load(iter_users(filename))
+
+    def register_user(
+        self,
+        username: str,
+        password: str,
+        email: str,
+        phone: str,
+        nickname: Optional[str] = None,
+        age: Optional[int] = None,
+        gender: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Union[bool, str]]:
+        """
+        注册新用户，格式校验在当前进程完成，用户名唯一性由所属分片检查
+
+        参数和返回值与user_management_full.register_user相同。
+        """
+        if not username or not password or not email or not phone:
+            return {'success': False, 'message': '所有必填字段不能为空'}
+        if not validators.check('username', username):
+            return {'success': False, 'message': '用户名格式无效(4-20位字母数字下划线)'}
+        if not validators.check('email', email):
+            return {'success': False, 'message': '邮箱格式无效'}
+        if not validators.check('phone', phone):
+            return {'success': False, 'message': '手机号格式无效(需要11位数字)'}
+        if not validators.check('strong_password', password):
+            return {'success': False, 'message': '密码强度不足(需8位以上，包含大小写字母和数字)'}
+
+        with self._id_lock:
+            user_id = self._next_id
+            self._next_id += 1
+        new_user = {
+            'id': user_id,
+            'username': username,
+            'password': password,
+            'email': email,
+            'mobile': phone,
+            'age': age,
+            'gender': gender,
+            'nickname': nickname,
+            **kwargs
+        }
+        return self._call(self._route(username), 'register', new_user)
+
+    def login(self, username: str, password: str) -> Dict[str, Union[bool, str, Dict]]:
+        """用户登录验证，参数和返回值与user_management_full.login相同"""
+        if not username or not password:
+            return {'success': False, 'message': '用户名和密码不能为空'}
+        return self._call(self._route(username), 'login', username, password)
+
+    def change_password(self, username: str, old_password: str, new_password: str) -> Dict[str, Union[bool, str]]:
+        """修改用户密码，参数和返回值与user_management_full.change_password相同"""
+        if not username:
+            return {'success': False, 'message': '所有字段不能为空'}
+        return self._call(self._route(username), 'change_password', username, old_password, new_password)
+
+    def get_user(self, username: str) -> Optional[Dict]:
+        """
+        按用户名查找用户
+
+        Args:
+            username: 用户名
+
+        Returns:
+            Optional[Dict]: 不含密码的用户字典，不存在时返回None
+        """
+        return self._call(self._route(username), 'get_user', username)
+
+    def count_users(self) -> int:
+        """统计所有分片的用户总数"""
+        return sum(self._fanout('count'))
+
+    def stats(self) -> Dict:
+        """
+        合并所有分片的统计计数器
+
+        Returns:
+            Dict: 结构与UserStats.snapshot()相同
+        """
+        merged = {
+            'adults': 0,
+            'minors': 0,
+            'gender': {'adults': {'male': 0, 'female': 0}, 'minors': {'male': 0, 'female': 0}},
+            'domains': {},
+            'chinese': 0
+        }
+        for part in self._fanout('stats'):
+            merged['adults'] += part['adults']
+            merged['minors'] += part['minors']
+            merged['chinese'] += part['chinese']
+            for group, counts in part['gender'].items():
+                for gender, count in counts.items():
+                    merged['gender'][group][gender] += count
+            domains = merged['domains']
+            for domain, count in part['domains'].items():
+                domains[domain] = domains.get(domain, 0) + count
+        return merged
+
+    def count_adults(self) -> int:
+        """统计成年用户数量"""
+        return self.stats()['adults']
+
+    def count_minors(self) -> int:
+        """统计未成年用户数量"""
+        return self.stats()['minors']
+
+    def get_gender_distribution(self) -> Dict[str, Dict[str, int]]:
+        """获取性别分布统计(按成年/未成年分组)，结构与user_management_full中相同"""
+        return self.stats()['gender']
+
+    def count_users_per_domain(self) -> Dict[str, int]:
+        """统计每个域名的用户数量"""
+        return self.stats()['domains']
+
+    def count_users_with_chinese_chars(self) -> int:
+        """统计用户名包含中文字符的用户数量"""
+        return self.stats()['chinese']
+
+    def get_usernames_by_domain(self, domain: str) -> List[str]:
+        """
+        获取指定域名的所有用户名
+
+        Args:
+            domain: 要查询的域名
+
+        Returns:
+            List[str]: 属于该域名的用户名列表(按分片顺序拼接)
+        """
+        return [name for part in self._fanout('usernames_by_domain', domain) for name in part]
+
+    def close(self) -> None:
+        """停止所有分片进程"""
+        if not self._processes:
+            return
+        for index, conn in enumerate(self._conns):
+            try:
+                with self._locks[index]:
+                    conn.send(('stop', ()))
+                    conn.recv()
+            except (EOFError, OSError):
+                pass
+            conn.close()
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        atexit.unregister(self.close)
@@ -0,0 +1,513 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# 文件头魔数，末尾数字为格式版本
+MAGIC = b'USNAP001'
+# 快照文件默认后缀
+SNAPSHOT_SUFFIX = '.usnap'
+
+# 用户表的列定义(按2-mocked-users.json中的字段顺序)
+# int: 定长整数列; str: 偏移数组+UTF-8数据; code: 字符串驻留表+编码数组
+SCHEMA = [
+    ('id', 'int', 'q'),
+    ('name', 'str', None),
+    ('username', 'str', None),
+    ('email', 'str', None),
+    ('mobile', 'str', None),
+    ('age', 'int', 'i'),
+    ('gender', 'code', None),
+    ('address', 'str', None),
+    ('company', 'code', None),
+    ('password', 'str', None),
+    ('nickname', 'str', None),
+]
+_SCHEMA_NAMES = {name for name, _, _ in SCHEMA}
+_INT_RANGES = {'q': (-2 ** 63, 2 ** 63 - 1), 'i': (-2 ** 31, 2 ** 31 - 1)}
+
+# 列中每行的状态: 字段不存在 / 值为None / 有值
+MISSING, NULL, PRESENT = 0, 1, 2
+_MISSING = object()
+
+
+def _domain_of(email: str) -> str:
+    # 与user_management_full.extract_domain保持一致
+    return email.split('@')[-1].lower() if '@' in email else ''
+
+
+def _contains_chinese(text: str) -> bool:
+    return any('\u4e00' <= char <= '\u9fff' for char in text)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _Interner:
+    """字符串驻留表，相同字符串共用一个编码"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.table: List[str] = []
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.table)
+            self.table.append(value)
+        return code
+
+
+def write_snapshot(user_iter: Iterable[Dict], filename: str) -> int:
+    """
+    把用户数据写成列式二进制快照
+
+    每个字段存为一个连续数组；gender、company和邮箱域名驻留为编码，
+    并预先计算用户名是否含中文，统计时无需解析字符串。
+    不在SCHEMA中的字段或类型不符的值以JSON形式存入额外列，转换可无损往返。
+
+    Args:
+        user_iter: 产出用户字典的可迭代对象
+        filename: 输出文件路径
+
+    Returns:
+        int: 写入的用户数量
+    """
+    states = {name: bytearray() for name, _, _ in SCHEMA}
+    ints = {name: array(typecode) for name, kind, typecode in SCHEMA if kind == 'int'}
+    offsets = {name: array('Q', [0]) for name, kind, _ in SCHEMA if kind == 'str'}
+    blobs = {name: bytearray() for name, kind, _ in SCHEMA if kind == 'str'}
+    codes = {name: array('I') for name, kind, _ in SCHEMA if kind == 'code'}
+    interners = {name: _Interner() for name, kind, _ in SCHEMA if kind == 'code'}
+    domains = array('I')
+    domain_interner = _Interner()
+    cjk = bytearray()
+    extra_offsets = array('Q', [0])
+    extra_blob = bytearray()
+
+    rows = 0
+    for user in user_iter:
+        extra = {key: value for key, value in user.items() if key not in _SCHEMA_NAMES}
+        for name, kind, typecode in SCHEMA:
+            value = user.get(name, _MISSING)
+            if value is _MISSING or value is None:
+                state = MISSING if value is _MISSING else NULL
+            elif kind == 'int':
+                low, high = _INT_RANGES[typecode]
+                valid = type(value) is int and low <= value <= high
+                state = PRESENT if valid else MISSING
+            else:
+                state = PRESENT if isinstance(value, str) else MISSING
+            if state == MISSING and value is not _MISSING:
+                extra[name] = value
+            states[name].append(state)
+
+            present = state == PRESENT
+            if kind == 'int':
+                ints[name].append(value if present else 0)
+            elif kind == 'str':
+                if present:
+                    blobs[name] += value.encode('utf-8')
+                offsets[name].append(len(blobs[name]))
+            else:
+                codes[name].append(interners[name].code(value) if present else 0)
+
+        email = user.get('email')
+        domains.append(domain_interner.code(_domain_of(email) if isinstance(email, str) else ''))
+        username = user.get('username')
+        cjk.append(1 if isinstance(username, str) and _contains_chinese(username) else 0)
+        if extra:
+            extra_blob += json.dumps(extra, ensure_ascii=False).encode('utf-8')
+        extra_offsets.append(len(extra_blob))
+        rows += 1
+
+    blocks = []
+    columns = {}
+
+    def add_block(data) -> Dict[str, int]:
+        data = bytes(data)
+        offset = sum(_align(len(block)) for block in blocks)
+        blocks.append(data)
+        return {'offset': offset, 'length': len(data)}
+
+    for name, kind, typecode in SCHEMA:
+        column = {'kind': kind}
+        # 所有行都有值时省略状态数组
+        if any(state != PRESENT for state in states[name]):
+            column['state'] = add_block(states[name])
+        if kind == 'int':
+            column['typecode'] = typecode
+            column['values'] = add_block(ints[name])
+        elif kind == 'str':
+            column['offsets'] = add_block(offsets[name])
+            column['data'] = add_block(blobs[name])
+        else:
+            column['codes'] = add_block(codes[name])
+            column['table'] = interners[name].table
+        columns[name] = column
+
+    header = {
+        'rows': rows,
+        'byteorder': sys.byteorder,
+        'columns': columns,
+        'domain': {'codes': add_block(domains), 'table': domain_interner.table},
+        'username_cjk': add_block(cjk),
+        'extra': {'offsets': add_block(extra_offsets), 'data': add_block(extra_blob)},
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+    tmp_file = filename + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (_align(f.tell()) - f.tell()))
+        for block in blocks:
+            f.write(block)
+            f.write(b'\0' * (_align(len(block)) - len(block)))
+    os.replace(tmp_file, filename)
+    return rows
+
+
+class UserSnapshot:
+    """
+    以内存映射方式打开的列式用户快照
+
+    列直接映射为memoryview数组，统计查询逐列计算，不构造用户字典；
+    需要完整用户数据时再按行物化。
+
+    Attributes:
+        filename: 快照文件路径
+        rows: 用户数量
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._cache: Dict[str, memoryview] = {}
+        self._stats = None
+        if bytes(self._view[:8]) != MAGIC:
+            self.close()
+            raise ValueError(f'不是有效的用户快照文件: {filename}')
+        header_len, = struct.unpack('<Q', self._view[8:16])
+        self._header = json.loads(bytes(self._view[16:16 + header_len]).decode('utf-8'))
+        if self._header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError('快照文件的字节序与当前平台不一致')
+        self._data_start = _align(16 + header_len)
+        self.rows = self._header['rows']
+        self._columns = self._header['columns']
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _block(self, block: Dict[str, int], typecode: str = 'B') -> memoryview:
+        start = self._data_start + block['offset']
+        return self._view[start:start + block['length']].cast(typecode)
+
+    def _cached(self, key: str, block: Dict[str, int], typecode: str = 'B') -> memoryview:
+        view = self._cache.get(key)
+        if view is None:
+            view = self._cache[key] = self._block(block, typecode)
+        return view
+
+    def states(self, name: str) -> Optional[memoryview]:
+        """
+        获取列的行状态数组
+
+        Args:
+            name: 列名
+
+        Returns:
+            Optional[memoryview]: 每行的MISSING/NULL/PRESENT状态，所有行都有值时为None
+        """
+        column = self._columns[name]
+        if 'state' not in column:
+            return None
+        return self._cached(name + '.state', column['state'])
+
+    def values(self, name: str) -> memoryview:
+        """
+        获取整数列的值数组或编码列的编码数组
+
+        Args:
+            name: 列名
+
+        Returns:
+            memoryview: 按行排列的数组(无值的行为0)
+        """
+        column = self._columns[name]
+        if column['kind'] == 'int':
+            return self._cached(name, column['values'], column['typecode'])
+        return self._cached(name, column['codes'], 'I')
+
+    def table(self, name: str) -> List[str]:
+        """获取编码列的驻留字符串表"""
+        return self._columns[name]['table']
+
+    def domain_codes(self) -> memoryview:
+        """获取每行邮箱域名的编码数组"""
+        return self._cached('domain', self._header['domain']['codes'], 'I')
+
+    def domain_table(self) -> List[str]:
+        """获取邮箱域名驻留表(空字符串表示无效邮箱)"""
+        return self._header['domain']['table']
+
+    def _string(self, key: str, offsets_block: Dict, data_block: Dict, index: int) -> str:
+        offsets = self._cached(key + '.offsets', offsets_block, 'Q')
+        data = self._cached(key + '.data', data_block)
+        return bytes(data[offsets[index]:offsets[index + 1]]).decode('utf-8')
+
+    def string(self, name: str, index: int) -> str:
+        """
+        读取字符串列中的一个值
+
+        Args:
+            name: 列名
+            index: 行号
+
+        Returns:
+            str: 字段值(无值的行为空字符串)
+        """
+        column = self._columns[name]
+        return self._string(name, column['offsets'], column['data'], index)
+
+    def row(self, index: int) -> Dict:
+        """
+        物化一行为用户字典
+
+        Args:
+            index: 行号
+
+        Returns:
+            Dict: 用户字典，与写入时的数据相同
+        """
+        user = {}
+        for name, kind, _ in SCHEMA:
+            states = self.states(name)
+            state = PRESENT if states is None else states[index]
+            if state == MISSING:
+                continue
+            if state == NULL:
+                user[name] = None
+            elif kind == 'int':
+                user[name] = self.values(name)[index]
+            elif kind == 'str':
+                user[name] = self.string(name, index)
+            else:
+                user[name] = self.table(name)[self.values(name)[index]]
+        extra = self._header['extra']
+        text = self._string('extra', extra['offsets'], extra['data'], index)
+        if text:
+            user.update(json.loads(text))
+        return user
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(self.rows):
+            yield self.row(index)
+
+    def _adult_flags(self) -> Iterator[bool]:
+        ages = self.values('age')
+        states = self.states('age')
+        if states is None:
+            return (age >= 18 for age in ages)
+        return (state == PRESENT and age >= 18 for age, state in zip(ages, states))
+
+    def count_adults(self) -> int:
+        """统计成年用户数量"""
+        return sum(self._adult_flags())
+
+    def count_minors(self) -> int:
+        """统计未成年用户数量"""
+        return self.rows - self.count_adults()
+
+    def gender_distribution(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取性别分布统计(按成年/未成年分组)
+
+        Returns:
+            Dict: 与user_management_full.get_gender_distribution结构相同的字典
+        """
+        result = {
+            'adults': {'male': 0, 'female': 0},
+            'minors': {'male': 0, 'female': 0}
+        }
+        genders = [value.lower() for value in self.table('gender')]
+        states = self.states('gender')
+        if states is None:
+            states = bytes([PRESENT]) * self.rows
+        for adult, code, state in zip(self._adult_flags(), self.values('gender'), states):
+            if state != PRESENT:
+                continue
+            gender = genders[code]
+            if gender in ('male', 'female'):
+                result['adults' if adult else 'minors'][gender] += 1
+        return result
+
+    def domain_counts(self) -> Dict[str, int]:
+        """
+        统计每个域名的用户数量
+
+        Returns:
+            Dict[str, int]: 域名到用户数量的映射字典
+        """
+        counts = [0] * len(self.domain_table())
+        for code in self.domain_codes():
+            counts[code] += 1
+        return {domain: count for domain, count in zip(self.domain_table(), counts)
+                if domain and count}
+
+    def chinese_flags(self) -> memoryview:
+        """获取每行用户名是否含中文字符的标记数组"""
+        return self._cached('username_cjk', self._header['username_cjk'])
+
+    def count_chinese(self) -> int:
+        """统计用户名包含中文字符的用户数量"""
+        return sum(self.chinese_flags())
+
+    def age_buckets(self) -> Dict[str, int]:
+        """
+        统计各年龄分段的用户数量
+
+        Returns:
+            Dict[str, int]: 分段名称到用户数量的映射，缺失年龄计入'未知'
+        """
+        from user_batch_stats import HAS_NUMPY, BatchStats, count_age_buckets
+        if HAS_NUMPY:
+            return BatchStats.from_snapshot(self).age_buckets()
+        ages = self.values('age')
+        states = self.states('age')
+        if states is not None:
+            ages = (age if state == PRESENT else None for age, state in zip(ages, states))
+        return count_age_buckets(ages)
+
+    @property
+    def stats(self) -> 'SnapshotStats':
+        """与UserStats接口一致的只读统计视图，安装了numpy时使用向量化计算"""
+        if self._stats is None:
+            from user_batch_stats import HAS_NUMPY, BatchStats
+            self._stats = SnapshotStats(BatchStats.from_snapshot(self) if HAS_NUMPY else self)
+        return self._stats
+
+    def close(self) -> None:
+        """释放内存映射"""
+        for view in self._cache.values():
+            view.release()
+        self._cache.clear()
+        self._stats = None
+        self._view.release()
+        self._mmap.close()
+
+
+class SnapshotStats:
+    """
+    基于列式快照计算的统计值
+
+    提供与UserStats相同的属性，创建时逐列计算一次。
+    数据源可以是UserSnapshot本身，也可以是user_batch_stats.BatchStats。
+    """
+
+    def __init__(self, source):
+        self.adults = source.count_adults()
+        self.minors = source.rows - self.adults
+        self.gender = source.gender_distribution()
+        self.domains = source.domain_counts()
+        self.chinese = source.count_chinese()
+
+    def snapshot(self) -> Dict:
+        """
+        导出当前统计值
+
+        Returns:
+            Dict: 各统计值的副本
+        """
+        return {
+            'adults': self.adults,
+            'minors': self.minors,
+            'gender': {group: dict(counts) for group, counts in self.gender.items()},
+            'domains': dict(self.domains),
+            'chinese': self.chinese
+        }
+
+
+def snapshot_path(filename: str) -> str:
+    """
+    获取JSON用户文件对应的快照文件路径
+
+    Args:
+        filename: JSON用户文件路径
+
+    Returns:
+        str: 同名的.usnap文件路径
+    """
+    return os.path.splitext(filename)[0] + SNAPSHOT_SUFFIX
+
+
+def json_to_snapshot(src: str, dst: Optional[str] = None) -> int:
+    """
+    把JSON用户文件转换为列式快照
+
+    Args:
+        src: JSON用户文件路径
+        dst: 快照文件路径，默认与src同名
+
+    Returns:
+        int: 转换的用户数量
+    """
+    from user_loader import iter_users
+    return write_snapshot(iter_users(src), dst or snapshot_path(src))
+
+
+def snapshot_to_json(src: str, dst: str) -> int:
+    """
+    把列式快照转换回JSON用户文件
+
+    Args:
+        src: 快照文件路径
+        dst: JSON用户文件路径
+
+    Returns:
+        int: 转换的用户数量
+    """
+    snapshot = UserSnapshot(src)
+    try:
+        with open(dst, 'w', encoding='utf-8') as f:
+            json.dump(list(snapshot), f, ensure_ascii=False, indent=2)
+        return snapshot.rows
+    finally:
+        snapshot.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用户数据列式快照转换工具')
+    subparsers = parser.add_subparsers(dest='command', help='可用命令')
+
+    to_snapshot_parser = subparsers.add_parser('to-snapshot', help='JSON转换为快照')
+    to_snapshot_parser.add_argument('src', help='JSON用户文件')
+    to_snapshot_parser.add_argument('dst', nargs='?', help='快照文件(默认与JSON同名的.usnap)')
+
+    to_json_parser = subparsers.add_parser('to-json', help='快照转换为JSON')
+    to_json_parser.add_argument('src', help='快照文件')
+    to_json_parser.add_argument('dst', help='JSON用户文件')
+
+    args = parser.parse_args()
+
+    if args.command == 'to-snapshot':
+        count = json_to_snapshot(args.src, args.dst)
+        print(f"已写入{count}个用户到 {args.dst or snapshot_path(args.src)}")
+    elif args.command == 'to-json':
+        count = snapshot_to_json(args.src, args.dst)
+        print(f"已写入{count}个用户到 {args.dst}")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
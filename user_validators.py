@@ -0,0 +1,128 @@
+import re
+import string
+from typing import Callable, Dict, List, Optional
+
+# 校验规则: 接收待校验的值，返回是否有效
+Rule = Callable[[str], bool]
+
+# 预编译的正则，避免每次调用都经过re模块的模式缓存查找
+_USERNAME_RE = re.compile(r'^\w{4,20}$')
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_CN_MOBILE_RE = re.compile(r'^1[3-9]\d{9}$')
+
+_LOWERCASE = frozenset(string.ascii_lowercase)
+_UPPERCASE = frozenset(string.ascii_uppercase)
+_DIGITS = frozenset(string.digits)
+
+
+class ValidatorRegistry:
+    """
+    可插拔的校验规则注册表
+
+    规则按名称注册，用户管理库、命令行工具和Pydantic模型都通过同一个注册表校验，
+    替换某条规则后所有调用方同时生效。
+    """
+
+    def __init__(self):
+        self._rules: Dict[str, Rule] = {}
+
+    def register(self, name: str, rule: Optional[Rule] = None):
+        """
+        注册或替换校验规则，可作为装饰器使用
+
+        Args:
+            name: 规则名称
+            rule: 校验函数，省略时返回装饰器
+
+        Returns:
+            注册的校验函数或装饰器
+
+        Examples:
+            >>> @validators.register('username')
+            ... def my_username_rule(value): ...
+        """
+        if rule is None:
+            def decorator(func: Rule) -> Rule:
+                self._rules[name] = func
+                return func
+            return decorator
+        self._rules[name] = rule
+        return rule
+
+    def get(self, name: str) -> Rule:
+        """
+        获取校验规则
+
+        Args:
+            name: 规则名称
+
+        Returns:
+            Rule: 校验函数
+
+        Raises:
+            ValueError: 当规则未注册时
+        """
+        try:
+            return self._rules[name]
+        except KeyError:
+            raise ValueError(f'未注册的校验规则: {name}') from None
+
+    def check(self, name: str, value: str) -> bool:
+        """
+        用指定规则校验一个值
+
+        Args:
+            name: 规则名称
+            value: 待校验的值
+
+        Returns:
+            bool: 有效返回True，否则返回False
+        """
+        return self.get(name)(value)
+
+    def names(self) -> List[str]:
+        """返回所有已注册的规则名称"""
+        return sorted(self._rules)
+
+
+validators = ValidatorRegistry()
+
+
+@validators.register('username')
+def is_valid_username(username: str) -> bool:
+    """用户名为4-20位字母数字下划线"""
+    return _USERNAME_RE.match(username) is not None
+
+
+@validators.register('email')
+def is_valid_email(email: str) -> bool:
+    """邮箱格式有效"""
+    return _EMAIL_RE.match(email) is not None
+
+
+@validators.register('phone')
+def is_valid_phone(phone: str) -> bool:
+    """手机号为11位数字"""
+    return phone.isdigit() and len(phone) == 11
+
+
+@validators.register('cn_mobile')
+def is_valid_cn_mobile(phone: str) -> bool:
+    """中国大陆手机号(1开头，第二位3-9，共11位)"""
+    return _CN_MOBILE_RE.match(phone) is not None
+
+
+@validators.register('strong_password')
+def is_strong_password(password: str) -> bool:
+    """
+    密码8位以上，包含大小写字母和数字
+
+    只遍历一次密码构造字符集合，再与三类字符集合求交，
+    代替原先的四次正则扫描。
+    """
+    if len(password) < 8:
+        return False
+    chars = set(password)
+    return not (chars.isdisjoint(_LOWERCASE)
+                or chars.isdisjoint(_UPPERCASE)
+                or chars.isdisjoint(_DIGITS))
@@ -14,19 +14,26 @@ users = [
 ]
 import json
 import re
+from user_journal import UserJournal
 
-# 初始化用户列表
+# 用户数据日志，注册和修改只追加事件，不再整体重写数据文件
+journal = None
+
+# 初始化用户列表(读取快照并重放日志)
 def load_users(filename="2-mocked-users.json"):
+    global journal
+    journal = UserJournal(filename)
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return journal.load()
     except FileNotFoundError:
         return []
 
-# 保存用户数据
+# 保存用户数据(把当前用户列表压缩为新快照并清空日志)
 def save_users(users, filename="2-mocked-users.json"):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+    if journal is None or journal.filename != filename:
+        UserJournal(filename).compact(users)
+    else:
+        journal.compact(users)
 
 # 1. 用户注册
 def register_user(users):
@@ -65,7 +72,7 @@ def register_user(users):
     }
     
     users.append(new_user)
-    save_users(users)
+    journal.register(new_user)
     print("注册成功！")
     return True
 
@@ -102,7 +109,7 @@ def change_password(users, current_user):
     for i, user in enumerate(users):
         if user['username'] == current_user['username']:
             users[i]['password'] = new_password
-            save_users(users)
+            journal.update(user['username'], password=new_password)
             print("密码修改成功！")
             return True
     return False